@@ -13,7 +13,6 @@ from naptha_sdk.client.naptha import Naptha
 from naptha_sdk.module_manager import create_env_file
 from naptha_sdk.schemas import AgentDeployment, ChatCompletionRequest, EnvironmentDeployment, \
     OrchestratorDeployment, OrchestratorRunInput, EnvironmentRunInput, KBDeployment, KBRunInput, MemoryDeployment, MemoryRunInput, ToolDeployment, ToolRunInput, NodeConfigUser, SecretInput
-from naptha_sdk.storage.storage_client import StorageClient
 from naptha_sdk.storage.schemas import (
     CreateStorageRequest, DeleteStorageRequest, ListStorageRequest, 
     ReadStorageRequest, UpdateStorageRequest, SearchStorageRequest, StorageType
@@ -464,7 +463,7 @@ async def run(
 
 async def storage_interaction(naptha, storage_type, operation, path, data=None, schema=None, options=None, file=None):
     """Handle storage interactions using StorageClient"""
-    storage_client = StorageClient(naptha.node.node)
+    storage_client = naptha.storage_client
     print(f"Storage interaction: {storage_type}, {operation}, {path}, {data}, {schema}, {options}, {file}")
 
     try:
@@ -784,6 +783,7 @@ async def main():
     completions_parser.add_argument("prompt", help="Input prompt for the model")
     completions_parser.add_argument("-m", "--model", help="Model to use for inference", default="phi3:mini")
     completions_parser.add_argument("-p", "--parameters", type=str, help='Additional model parameters in "key=value" format')
+    completions_parser.add_argument("--stream", action="store_true", help="Print the completion as it is generated")
 
     # Models command
     models_parser = inference_subparser.add_parser("models", help="List available models")
@@ -973,7 +973,14 @@ async def main():
                         messages=[{"role": "user", "content": args.prompt}],
                         model=args.model,
                     )
-                    await naptha.inference_client.run_inference(request)
+                    if args.stream:
+                        async for chunk in naptha.inference_client.stream_inference(request):
+                            for choice in chunk.choices:
+                                print(choice.delta.content or "", end="", flush=True)
+                        print()
+                    else:
+                        response = await naptha.inference_client.run_inference(request)
+                        print("Response: ", response.choices[0].message.content)
             elif args.command == "storage":
                 await storage_interaction(
                     naptha, 
@@ -0,0 +1,173 @@
+import asyncio
+from contextlib import asynccontextmanager
+import math
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import grpc
+from websockets.exceptions import ConnectionClosedError, InvalidHandshake
+
+from naptha_sdk.schemas import NodeConfig
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+# DEADLINE_EXCEEDED is left out on purpose: a long run that hits its deadline says nothing about the port
+UNAVAILABLE_GRPC_CODES = (grpc.StatusCode.UNAVAILABLE,)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether an error means the server behind a port could not be reached.
+
+    Timeouts are not counted, since a slow call on a healthy server times out too.
+    """
+    if isinstance(error, grpc.aio.AioRpcError):
+        return error.code() in UNAVAILABLE_GRPC_CODES
+    if isinstance(error, asyncio.TimeoutError):
+        return False
+    return isinstance(error, (OSError, ConnectionClosedError, InvalidHandshake))
+
+
+class PortStats:
+    def __init__(self):
+        self.outstanding = 0
+        self.latency_ewma: Optional[float] = None
+        self.last_sample = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+
+class PortBalancer:
+    """Spreads calls across the communication servers of a node.
+
+    Ports are picked with power-of-two-choices (or least outstanding requests),
+    scored by the number of in-flight calls and an EWMA of call latency. Ports that
+    fail several calls in a row are ejected for a while and come back after the
+    ejection time. If every port is ejected, all ports are used again.
+    """
+
+    def __init__(
+        self,
+        ports: List[int],
+        strategy: str = "p2c",
+        ewma_alpha: float = 0.3,
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        latency_decay_time: float = 10.0,
+    ):
+        """
+        Args:
+            ports: Ports of the node communication servers
+            strategy: Either 'p2c' (power of two choices) or 'least_outstanding'
+            ewma_alpha: Weight of the latest latency sample in the EWMA
+            failure_threshold: Consecutive connection failures before a port is ejected
+            ejection_time: Seconds an ejected port is skipped
+            latency_decay_time: Seconds after which a port's latency sample counts as stale and
+                its score drifts back towards the average, so slow ports get retried
+        """
+        if not ports:
+            raise ValueError("No ports found for node")
+        if strategy not in ("p2c", "least_outstanding"):
+            raise ValueError("Invalid balancing strategy. Strategy must be either 'p2c' or 'least_outstanding'.")
+        self.ports = list(ports)
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.latency_decay_time = latency_decay_time
+        self.stats: Dict[int, PortStats] = {port: PortStats() for port in self.ports}
+
+    def healthy_ports(self, exclude: Iterable[int] = ()) -> List[int]:
+        now = time.monotonic()
+        candidates = [port for port in self.ports if port not in exclude] or self.ports
+        healthy = [port for port in candidates if self.stats[port].ejected_until <= now]
+        return healthy or candidates
+
+    def _score(self, port: int) -> float:
+        stats = self.stats[port]
+        known = [other.latency_ewma for other in self.stats.values() if other.latency_ewma is not None]
+        average = sum(known) / len(known) if known else 1.0
+        if stats.latency_ewma is None:
+            # Ports without samples are scored as average so they still get probed
+            latency = average
+        else:
+            weight = math.exp(-(time.monotonic() - stats.last_sample) / self.latency_decay_time)
+            latency = weight * stats.latency_ewma + (1 - weight) * average
+        return (stats.outstanding + 1) * latency
+
+    def select(self, exclude: Iterable[int] = ()) -> int:
+        """Pick the port for the next call, avoiding excluded ports when possible"""
+        candidates = self.healthy_ports(exclude)
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == "p2c":
+            candidates = random.sample(candidates, 2)
+        else:
+            random.shuffle(candidates)
+        return min(candidates, key=self._score)
+
+    def record_success(self, port: int, latency: float):
+        stats = self.stats[port]
+        stats.consecutive_failures = 0
+        stats.last_sample = time.monotonic()
+        if stats.latency_ewma is None:
+            stats.latency_ewma = latency
+        else:
+            stats.latency_ewma = self.ewma_alpha * latency + (1 - self.ewma_alpha) * stats.latency_ewma
+
+    def record_failure(self, port: int):
+        stats = self.stats[port]
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.failure_threshold:
+            logger.warning(f"Ejecting port {port} for {self.ejection_time}s after {stats.consecutive_failures} consecutive failures")
+            stats.ejected_until = time.monotonic() + self.ejection_time
+            stats.consecutive_failures = 0
+
+    @asynccontextmanager
+    async def acquire(self, port: Optional[int] = None, record_latency: bool = True):
+        """Reserve a port for one call and record its outcome
+
+        Args:
+            port: Port to use instead of selecting one
+            record_latency: Whether to record the duration of the call as a latency sample. Streaming
+                calls pass False and call record_success themselves when the first message arrives
+        """
+        port = self.select() if port is None else port
+        stats = self.stats[port]
+        stats.outstanding += 1
+        start = time.monotonic()
+        try:
+            yield port
+        except BaseException as e:
+            if is_connection_error(e):
+                self.record_failure(port)
+            raise
+        else:
+            if record_latency:
+                self.record_success(port, time.monotonic() - start)
+        finally:
+            stats.outstanding -= 1
+
+
+_balancers: Dict[Tuple[str, str, Tuple[int, ...]], PortBalancer] = {}
+
+
+def node_ports(node: NodeConfig) -> List[int]:
+    """Ports of a node's communication servers, from NodeConfig.ports or NodeConfig.servers"""
+    if node.ports:
+        return list(node.ports)
+    return [
+        server.port
+        for server in node.servers
+        if server.communication_protocol == node.node_communication_protocol
+    ]
+
+
+def get_port_balancer(node: NodeConfig) -> PortBalancer:
+    """Get the process-wide balancer for a node, so stats are shared by all clients of that node"""
+    ports = node_ports(node)
+    key = (node.ip, node.node_communication_protocol, tuple(sorted(ports)))
+    if key not in _balancers:
+        _balancers[key] = PortBalancer(ports)
+    return _balancers[key]
@@ -0,0 +1,98 @@
+import asyncio
+from collections import Counter
+import inspect
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from naptha_sdk.schemas import BestOfKResult, ChatCompletionRequest, ModelResponse
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Given the candidate slots, filled with responses as they arrive, return (best index, confidence)
+Scorer = Callable[[List[Optional[ModelResponse]]], Union[Tuple[int, float], Awaitable[Tuple[int, float]]]]
+
+
+def normalize_answer(response: ModelResponse) -> str:
+    return " ".join(response.choices[0].message.content.split()).lower()
+
+
+def majority_vote(responses: List[Optional[ModelResponse]]) -> Tuple[int, float]:
+    """Pick the most common answer. Confidence is its share of all candidates, so it only grows as responses arrive"""
+    answers = [normalize_answer(response) if response is not None else None for response in responses]
+    counts = Counter(answer for answer in answers if answer is not None)
+    answer, count = counts.most_common(1)[0]
+    return answers.index(answer), count / len(responses)
+
+
+def expand_candidates(
+    inference_input: Union[ChatCompletionRequest, Dict, List[Union[ChatCompletionRequest, Dict]]],
+    k: Optional[int]
+) -> List[ChatCompletionRequest]:
+    if isinstance(inference_input, list):
+        if not inference_input:
+            raise ValueError("Invalid candidates. At least one candidate request must be given.")
+        return [ChatCompletionRequest(**candidate) if isinstance(candidate, dict) else candidate for candidate in inference_input]
+    if k is None or k < 1:
+        raise ValueError("Invalid number of candidates. k must be at least 1 when a single request is given.")
+    if isinstance(inference_input, dict):
+        inference_input = ChatCompletionRequest(**inference_input)
+    return [inference_input] * k
+
+
+async def best_of_k(
+    run: Callable[[ChatCompletionRequest], Awaitable[ModelResponse]],
+    candidates: List[ChatCompletionRequest],
+    scorer: Scorer = majority_vote,
+    threshold: Optional[float] = None,
+) -> BestOfKResult:
+    """Run candidate requests concurrently and return the best response.
+
+    The scorer is called each time a response arrives. Once its confidence reaches
+    threshold the remaining calls are cancelled and the best response so far is
+    returned; without a threshold every candidate is awaited. Failed candidates
+    are left out, and the last error is raised if all of them fail.
+
+    Args:
+        run: Coroutine function that sends one request
+        candidates: Requests to run, e.g. the same request k times or one per model
+        scorer: Sync or async function returning the best index and a confidence
+        threshold: Confidence at which to stop early
+    """
+    if not candidates:
+        raise ValueError("Invalid candidates. At least one candidate request must be given.")
+    responses: List[Optional[ModelResponse]] = [None] * len(candidates)
+    tasks = {asyncio.create_task(run(candidate)): index for index, candidate in enumerate(candidates)}
+    pending = set(tasks)
+    best, confidence, errors, last_error = None, 0.0, 0, None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors += 1
+                    last_error = task.exception()
+                    logger.info(f"Candidate {tasks[task]} failed: {last_error}")
+                    continue
+                responses[tasks[task]] = task.result()
+            if all(response is None for response in responses):
+                continue
+            score = scorer(responses)
+            best, confidence = await score if inspect.isawaitable(score) else score
+            if threshold is not None and confidence >= threshold:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if best is None:
+        if last_error is not None:
+            raise last_error
+        raise ValueError("No candidate returned a response to score")
+    return BestOfKResult(
+        response=responses[best],
+        index=best,
+        confidence=confidence,
+        responses=responses,
+        completed=sum(response is not None for response in responses),
+        errors=errors,
+    )
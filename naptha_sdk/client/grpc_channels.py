@@ -0,0 +1,110 @@
+import asyncio
+from typing import Dict, Optional
+
+import grpc
+
+from naptha_sdk.client import grpc_server_pb2_grpc
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class GrpcChannelRegistry:
+    """Process-wide cache of gRPC channels and stubs keyed by node address.
+
+    Channels are created once per address with keepalive and message size options
+    and reused across calls. A channel that has shut down is replaced on the next
+    lookup. Channels are bound to the event loop that created them, so a new
+    channel is created when an address is used from a different loop.
+    """
+
+    def __init__(
+        self,
+        keepalive_time_ms: int = 30000,
+        keepalive_timeout_ms: int = 10000,
+        keepalive_permit_without_calls: bool = True,
+        max_message_length: int = 100 * 1024 * 1024,
+    ):
+        """
+        Args:
+            keepalive_time_ms: Interval between keepalive pings on an idle channel
+            keepalive_timeout_ms: Time to wait for a keepalive ping ack before closing the connection
+            keepalive_permit_without_calls: Whether to send keepalive pings with no calls in flight
+            max_message_length: Maximum send and receive message size in bytes
+        """
+        self.keepalive_time_ms = keepalive_time_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        self.keepalive_permit_without_calls = keepalive_permit_without_calls
+        self.max_message_length = max_message_length
+        self._channels: Dict[str, grpc.aio.Channel] = {}
+        self._stubs: Dict[str, grpc_server_pb2_grpc.GrpcServerStub] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+
+    @property
+    def options(self):
+        return [
+            ("grpc.keepalive_time_ms", self.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            ("grpc.keepalive_permit_without_calls", int(self.keepalive_permit_without_calls)),
+            ("grpc.http2.max_pings_without_data", 0),
+            ("grpc.max_send_message_length", self.max_message_length),
+            ("grpc.max_receive_message_length", self.max_message_length),
+        ]
+
+    def get_channel(self, address: str) -> grpc.aio.Channel:
+        """Get the cached channel for an address, creating it if needed"""
+        loop = asyncio.get_running_loop()
+        channel = self._channels.get(address)
+        if channel is not None:
+            if self._loops[address] is not loop:
+                self._forget(address)
+                channel = None
+            elif channel.get_state(try_to_connect=False) == grpc.ChannelConnectivity.SHUTDOWN:
+                logger.info(f"gRPC channel to {address} was shut down. Reconnecting.")
+                self._forget(address)
+                channel = None
+
+        if channel is None:
+            logger.info(f"Opening gRPC channel to {address}")
+            channel = grpc.aio.insecure_channel(address, options=self.options)
+            self._channels[address] = channel
+            self._loops[address] = loop
+        return channel
+
+    def get_stub(self, address: str) -> grpc_server_pb2_grpc.GrpcServerStub:
+        """Get a stub bound to the cached channel for an address"""
+        channel = self.get_channel(address)
+        if address not in self._stubs:
+            self._stubs[address] = grpc_server_pb2_grpc.GrpcServerStub(channel)
+        return self._stubs[address]
+
+    async def check_health(self, address: str, timeout: float = 5.0) -> bool:
+        """Return whether the channel to an address becomes ready within timeout seconds"""
+        channel = self.get_channel(address)
+        try:
+            await asyncio.wait_for(channel.channel_ready(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.info(f"gRPC channel to {address} not ready after {timeout}s, state {channel.get_state()}")
+            return False
+
+    async def close(self, address: str, grace: Optional[float] = None):
+        """Close the channel to an address, letting in-flight calls finish within grace seconds"""
+        channel = self._channels.get(address)
+        loop = self._loops.get(address)
+        self._forget(address)
+        if channel is not None and loop is asyncio.get_running_loop():
+            await channel.close(grace)
+
+    async def close_all(self, grace: Optional[float] = None):
+        """Close every cached channel"""
+        for address in list(self._channels):
+            await self.close(address, grace)
+
+    def _forget(self, address: str):
+        self._channels.pop(address, None)
+        self._stubs.pop(address, None)
+        self._loops.pop(address, None)
+
+
+grpc_channels = GrpcChannelRegistry()
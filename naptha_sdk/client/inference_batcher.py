@@ -0,0 +1,121 @@
+import asyncio
+from typing import Dict, List, Tuple, Union
+
+from httpx import HTTPStatusError
+
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.schemas import ChatCompletionRequest, ModelResponse
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+
+class InferenceBatcher:
+    """Collects chat completions for the same model and sends them to the node together.
+
+    Requests are queued per model. A queue is flushed when it reaches max_batch_size
+    or max_wait seconds after its first request arrived, whichever comes first. A
+    flushed batch goes out in one call to the node's batch endpoint. If the node
+    has no batch endpoint, the batch is sent as a pipelined burst of single requests
+    over the shared connection pool. Each caller gets back its own response or error.
+    """
+
+    def __init__(
+        self,
+        client: InferenceClient,
+        max_batch_size: int = 16,
+        max_wait: float = 0.01,
+        max_concurrent_batches: int = 4,
+    ):
+        """
+        Args:
+            client: The inference client used to send batches
+            max_batch_size: Maximum number of requests in one batch
+            max_wait: Maximum seconds a request waits for others to join its batch
+            max_concurrent_batches: Maximum number of batches in flight at once
+        """
+        if max_batch_size < 1:
+            raise ValueError("Invalid batch size. Batch size must be at least 1.")
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._batch_slots = asyncio.Semaphore(max_concurrent_batches)
+        self._queues: Dict[str, List[Tuple[ChatCompletionRequest, asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+        self._in_flight = set()
+        self._batch_supported = None
+
+    async def run_inference(self, inference_input: Union[ChatCompletionRequest, Dict]) -> ModelResponse:
+        """
+        Queue a chat completion and wait for its response
+
+        Args:
+            inference_input: The inference input to run inference on
+        """
+        if isinstance(inference_input, dict):
+            inference_input = ChatCompletionRequest(**inference_input)
+        model = inference_input.model
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(model, [])
+        queue.append((inference_input, future))
+
+        if len(queue) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = asyncio.create_task(self._flush_after_wait(model))
+        return await future
+
+    async def flush(self):
+        """Send every queued request now and wait for all batches in flight"""
+        for model in list(self._queues):
+            self._flush(model)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _flush_after_wait(self, model: str):
+        await asyncio.sleep(self.max_wait)
+        self._timers.pop(model, None)
+        self._flush(model)
+
+    def _flush(self, model: str):
+        timer = self._timers.pop(model, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        batch = self._queues.pop(model, [])
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[ChatCompletionRequest, asyncio.Future]]):
+        requests = [request for request, _ in batch]
+        async with self._batch_slots:
+            try:
+                results = await self._run_batch(requests)
+            except Exception as e:
+                results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _run_batch(self, requests: List[ChatCompletionRequest]) -> List[Union[ModelResponse, Exception]]:
+        if len(requests) > 1 and self._batch_supported is not False:
+            try:
+                results = await self.client.run_inference_batch(requests)
+                self._batch_supported = True
+                return results
+            except HTTPStatusError as e:
+                if e.response.status_code not in BATCH_UNSUPPORTED_STATUSES:
+                    raise
+                logger.info(f"Node at {self.client.node_url} does not support batched inference. Pipelining requests.")
+                self._batch_supported = False
+        return await asyncio.gather(
+            *[self.client.run_inference(request) for request in requests],
+            return_exceptions=True
+        )
@@ -0,0 +1,218 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import inspect
+import json
+import math
+import sqlite3
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+from naptha_sdk.schemas import ChatCompletionRequest, ModelResponse
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Fields that change how a response is delivered, not what it contains
+TRANSPORT_FIELDS = {"stream", "stream_options"}
+
+
+def request_cache_key(request: ChatCompletionRequest, exclude: set = frozenset()) -> str:
+    """Canonical hash of a chat completion request, independent of field order and unset fields"""
+    canonical = request.model_dump(mode="json", exclude_none=True, exclude=TRANSPORT_FIELDS | set(exclude))
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def is_deterministic(request: ChatCompletionRequest) -> bool:
+    """Whether a request should always get the same response, so it is safe to cache"""
+    return request.temperature == 0 or request.seed is not None
+
+
+class InMemoryCache:
+    """LRU cache of serialized responses held in memory, with an optional TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            max_entries: Maximum number of responses kept before the least recently used is evicted
+            ttl: Seconds a response stays valid, or None to keep it until evicted
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class SQLiteCache:
+    """On-disk cache of serialized responses in a SQLite database, with an optional TTL.
+
+    Database calls run in a worker thread so they do not block the event loop.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        """
+        Args:
+            path: Path of the SQLite database file
+            ttl: Seconds a response stays valid, or None to keep it forever
+        """
+        self.path = path
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = asyncio.Lock()
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL, value TEXT)"
+            )
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT stored_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        stored_at, value = row
+        if self.ttl is not None and time.time() - stored_at > self.ttl:
+            with self._conn:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        return value
+
+    def _set(self, key: str, value: str):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, time.time(), value)
+            )
+
+    async def get(self, key: str) -> Optional[str]:
+        async with self._lock:
+            return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str):
+        async with self._lock:
+            await asyncio.to_thread(self._set, key, value)
+
+    async def clear(self):
+        async with self._lock:
+            await asyncio.to_thread(self._conn.execute, "DELETE FROM responses")
+            await asyncio.to_thread(self._conn.commit)
+
+    def close(self):
+        self._conn.close()
+
+
+EmbedFunction = Callable[[str], Union[List[float], Awaitable[List[float]]]]
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SemanticCache:
+    """Serves responses for prompts that are near-duplicates of a cached prompt.
+
+    Prompts are embedded with a caller-supplied function. A cached response is
+    only reused for requests with the same model and parameters whose prompt
+    embedding has at least the given cosine similarity.
+    """
+
+    def __init__(self, embed: EmbedFunction, threshold: float = 0.95, max_entries: int = 1024):
+        """
+        Args:
+            embed: Function, sync or async, that turns prompt text into an embedding vector
+            threshold: Minimum cosine similarity for a cached response to be reused
+            max_entries: Maximum number of prompts kept before the oldest is evicted
+        """
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[Tuple[List[float], str]]]" = OrderedDict()
+        self._size = 0
+
+    async def _embed(self, request: ChatCompletionRequest) -> List[float]:
+        text = "\n".join(f"{message.role}: {message.content}" for message in request.messages)
+        embedding = self.embed(text)
+        if inspect.isawaitable(embedding):
+            embedding = await embedding
+        return list(embedding)
+
+    async def get(self, request: ChatCompletionRequest) -> Optional[str]:
+        entries = self._entries.get(request_cache_key(request, exclude={"messages"}))
+        if not entries:
+            return None
+        embedding = await self._embed(request)
+        similarity, value = max(
+            ((cosine_similarity(embedding, cached), value) for cached, value in entries),
+            key=lambda match: match[0]
+        )
+        return value if similarity >= self.threshold else None
+
+    async def set(self, request: ChatCompletionRequest, value: str):
+        group = request_cache_key(request, exclude={"messages"})
+        self._entries.setdefault(group, []).append((await self._embed(request), value))
+        self._entries.move_to_end(group)
+        self._size += 1
+        while self._size > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._entries[oldest].pop(0)
+            self._size -= 1
+            if not self._entries[oldest]:
+                del self._entries[oldest]
+
+
+class ResponseCache:
+    """Response cache consulted by InferenceClient for deterministic requests.
+
+    Exact matches are looked up by canonical request hash in the backend. If a
+    semantic tier is configured, it is tried after an exact miss.
+    """
+
+    def __init__(self, backend=None, semantic: Optional[SemanticCache] = None):
+        """
+        Args:
+            backend: Exact-match backend, InMemoryCache by default. Any object with async get(key) and set(key, value)
+            semantic: Optional near-duplicate tier
+        """
+        self.backend = backend if backend is not None else InMemoryCache()
+        self.semantic = semantic
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    async def lookup(self, request: ChatCompletionRequest) -> Optional[ModelResponse]:
+        value = await self.backend.get(request_cache_key(request))
+        if value is not None:
+            self.hits += 1
+            return ModelResponse.model_validate_json(value)
+        if self.semantic is not None:
+            value = await self.semantic.get(request)
+            if value is not None:
+                self.semantic_hits += 1
+                return ModelResponse.model_validate_json(value)
+        self.misses += 1
+        return None
+
+    async def store(self, request: ChatCompletionRequest, response: ModelResponse):
+        value = response.model_dump_json()
+        await self.backend.set(request_cache_key(request), value)
+        if self.semantic is not None:
+            await self.semantic.set(request, value)
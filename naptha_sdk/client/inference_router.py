@@ -0,0 +1,267 @@
+import asyncio
+from collections import deque
+import random
+import time
+from typing import Dict, List, Optional, Set, Union
+
+from httpx import HTTPStatusError, TransportError
+
+from naptha_sdk.client.best_of_k import Scorer, best_of_k, expand_candidates, majority_vote
+from naptha_sdk.client.model_catalogue import ModelCatalogue
+from naptha_sdk.client.prefix_affinity import PrefixAffinity, prefix_hashes
+from naptha_sdk.client.rate_limiter import PRIORITY_INTERACTIVE
+from naptha_sdk.schemas import BestOfKResult, ChatCompletionRequest, ModelResponse
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed inference call may succeed on another node"""
+    if isinstance(error, HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (TransportError, OSError, asyncio.TimeoutError))
+
+
+class NodeLatency:
+    """Recent latencies, in-flight calls and failures of one node"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.percentile(0.5)
+
+    @property
+    def p99(self) -> Optional[float]:
+        return self.percentile(0.99)
+
+
+class InferenceRouter:
+    """Routes chat completions across every node that serves the requested model.
+
+    Nodes come from a ModelCatalogue. Each request goes to the node with the lowest
+    p50 latency weighted by its in-flight calls; nodes without samples are scored
+    as average so they get probed. With hedging on, a duplicate request goes to the
+    next best node when the first has not answered within the hedge delay, and
+    whichever answers first wins while the other is cancelled. A cancelled call
+    that is shared with identical requests through the node client's coalescing
+    keeps running for them. Retryable errors
+    (connection failures, 429 and 5xx) fail over to the next node, and nodes that
+    fail several calls in a row are skipped for a while.
+
+    Requests that share a conversation prefix with an earlier request stick to the
+    node that served it, so the node can reuse the prefix from its KV cache, as
+    long as that node is healthy and not much busier than the best alternative.
+
+    Latency samples are the time the node took to answer, so responses served from
+    a node client's cache and time spent waiting on its rate limiter are left out.
+    """
+
+    def __init__(
+        self,
+        catalogue: ModelCatalogue,
+        hedge_after: Union[float, str, None] = None,
+        max_attempts: int = 3,
+        window: int = 100,
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        affinity: Optional[PrefixAffinity] = None,
+        affinity_slack: float = 2.0,
+    ):
+        """
+        Args:
+            catalogue: Catalogue of the nodes and the models they serve
+            hedge_after: When to send a hedged duplicate. Seconds, a latency percentile of the
+                chosen node such as 'p95', or None to disable hedging
+            max_attempts: Maximum number of nodes tried for one request, hedges included
+            window: Number of recent latencies kept per node
+            failure_threshold: Consecutive failures before a node is skipped
+            ejection_time: Seconds a failing node is skipped
+            affinity: Prefix to node map used for sticky routing. A new one is created if not given
+            affinity_slack: How many times the best node's score the sticky node may have and still be used
+        """
+        if isinstance(hedge_after, str) and not (hedge_after.startswith("p") and hedge_after[1:].isdigit()):
+            raise ValueError("Invalid hedge delay. Hedge delay must be either seconds, a percentile such as 'p95' or None.")
+        self.catalogue = catalogue
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.affinity = affinity if affinity is not None else PrefixAffinity()
+        self.affinity_slack = affinity_slack
+        self.nodes: Dict[str, NodeLatency] = {}
+        self._observed: Set[str] = set()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def _node(self, node_url: str) -> NodeLatency:
+        if node_url not in self.nodes:
+            self.nodes[node_url] = NodeLatency(self.window)
+        return self.nodes[node_url]
+
+    def _observe(self, node_url: str):
+        """Record the latencies of completions the node client sends"""
+        if node_url not in self._observed:
+            self._observed.add(node_url)
+            self.catalogue.clients[node_url].latency_listeners.append(self._node(node_url).samples.append)
+
+    def _score(self, node_url: str) -> float:
+        known = [node.p50 for node in self.nodes.values() if node.samples]
+        node = self._node(node_url)
+        latency = node.p50 if node.samples else (sum(known) / len(known) if known else 1.0)
+        return (node.outstanding + 1) * latency
+
+    def rank(self, candidates: List[str], exclude: Set[str] = frozenset()) -> List[str]:
+        """Order candidate nodes from best to worst, leaving out excluded and ejected ones"""
+        now = time.monotonic()
+        remaining = [node_url for node_url in candidates if node_url not in exclude]
+        healthy = [node_url for node_url in remaining if self._node(node_url).ejected_until <= now]
+        ranked = healthy or remaining
+        random.shuffle(ranked)
+        return sorted(ranked, key=self._score)
+
+    def _sticky_node(self, hashes: List[str], ranked: List[str]) -> Optional[str]:
+        node_url = self.affinity.lookup(hashes, ranked)
+        if node_url is None or self._score(node_url) > self.affinity_slack * self._score(ranked[0]):
+            return None
+        return node_url
+
+    def _hedge_delay(self, node_url: str) -> Optional[float]:
+        if self.hedge_after is None or isinstance(self.hedge_after, (int, float)):
+            return self.hedge_after
+        return self._node(node_url).percentile(int(self.hedge_after[1:]) / 100)
+
+    async def _call(self, node_url: str, inference_input: ChatCompletionRequest, priority: int, use_cache: bool) -> ModelResponse:
+        node = self._node(node_url)
+        self._observe(node_url)
+        try:
+            response = await self.catalogue.clients[node_url].run_inference(inference_input, priority, use_cache=use_cache)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                node.consecutive_failures += 1
+                if node.consecutive_failures >= self.failure_threshold:
+                    logger.warning(f"Skipping node {node_url} for {self.ejection_time}s after {node.consecutive_failures} consecutive failures")
+                    node.ejected_until = time.monotonic() + self.ejection_time
+                    node.consecutive_failures = 0
+            raise
+        node.consecutive_failures = 0
+        return response
+
+    async def run_inference(
+        self,
+        inference_input: Union[ChatCompletionRequest, Dict],
+        priority: int = PRIORITY_INTERACTIVE,
+        use_cache: bool = True,
+        sticky: bool = True
+    ) -> ModelResponse:
+        """
+        Run inference on the best node serving the requested model
+
+        Args:
+            inference_input: The inference input to run inference on
+            priority: Admission priority passed to the node's rate limiter, lower values go first
+            use_cache: Whether the response may come from the node client's cache or be shared with an identical request in flight
+            sticky: Whether to prefer the node that served the longest shared prefix
+        """
+        if isinstance(inference_input, dict):
+            inference_input = ChatCompletionRequest(**inference_input)
+        candidates = await self.catalogue.nodes_for_model(inference_input.model)
+        if not candidates:
+            raise ValueError(f"No known node serves model {inference_input.model}")
+
+        tried: List[str] = []
+        hedge_nodes: Set[str] = set()
+        pending: Dict[asyncio.Task, str] = {}
+        last_error = None
+        hedged = False
+
+        hashes = prefix_hashes(inference_input.messages)
+
+        def launch() -> bool:
+            ranked = self.rank(candidates, exclude=tried)
+            if not ranked or len(tried) >= self.max_attempts:
+                return False
+            node_url = (self._sticky_node(hashes, ranked) if sticky and not tried else None) or ranked[0]
+            tried.append(node_url)
+            # Count the call as in flight right away, so concurrent requests see it when ranking
+            node = self._node(node_url)
+            node.outstanding += 1
+            task = asyncio.create_task(self._call(node_url, inference_input, priority, use_cache))
+            task.add_done_callback(lambda _: setattr(node, "outstanding", node.outstanding - 1))
+            pending[task] = node_url
+            return True
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if not hedged and len(pending) == 1:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        self.hedges += 1
+                        hedge_nodes.add(tried[-1])
+                    continue
+                for task in done:
+                    node_url = pending.pop(task)
+                    if task.exception() is None:
+                        if node_url in hedge_nodes:
+                            self.hedge_wins += 1
+                        self.affinity.record(hashes, node_url)
+                        return task.result()
+                    last_error = task.exception()
+                    if not is_retryable(last_error):
+                        raise last_error
+                    logger.info(f"Inference on {node_url} failed, trying another node: {last_error}")
+                    if not pending and launch():
+                        self.failovers += 1
+                        hedged = True
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def best_of_k(
+        self,
+        inference_input: Union[ChatCompletionRequest, Dict, List[Union[ChatCompletionRequest, Dict]]],
+        k: Optional[int] = None,
+        scorer: Scorer = majority_vote,
+        threshold: Optional[float] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> BestOfKResult:
+        """
+        Run k candidates concurrently across nodes and return the best response
+
+        Candidates skip sticky routing, the response cache and request coalescing, so
+        concurrent samples spread over the nodes serving each model instead of queueing
+        on one. See InferenceClient.best_of_k for the arguments.
+        """
+        candidates = expand_candidates(inference_input, k)
+        return await best_of_k(
+            lambda candidate: self.run_inference(candidate, priority, use_cache=False, sticky=False),
+            candidates, scorer, threshold
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """p50 and p99 latency, sample count and in-flight calls per node"""
+        return {
+            node_url: {"p50": node.p50, "p99": node.p99, "samples": len(node.samples), "outstanding": node.outstanding}
+            for node_url, node in self.nodes.items()
+        }
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from httpx import HTTPError
+
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.schemas import NodeConfigUser
+from naptha_sdk.utils import get_logger, node_to_url
+
+logger = get_logger(__name__)
+
+
+def parse_model_list(response) -> List[str]:
+    """Model names from a /inference/models response, either an OpenAI style {"data": [...]} or a plain list"""
+    if isinstance(response, dict):
+        response = response.get("data", response.get("models", []))
+    return [model["id"] if isinstance(model, dict) else model for model in response]
+
+
+class NodeModels:
+    def __init__(self, models: Optional[List[str]] = None, etag: Optional[str] = None, fetched_at: float = 0.0):
+        self.models = models
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+class ModelCatalogue:
+    """Cached list of the models served by each known node.
+
+    Each node's list is kept for ttl seconds. After that it is revalidated with an
+    If-None-Match request, so an unchanged list costs a 304 with no body. Lookups
+    return the cached lists straight away and refresh stale ones in the background;
+    only nodes that have never been listed are fetched before answering. Nodes
+    can be seeded with the models the hub reports for them.
+    """
+
+    def __init__(self, clients: Iterable[InferenceClient] = (), transport: Optional[HTTPTransport] = None, ttl: float = 300.0):
+        """
+        Args:
+            clients: Inference clients of the nodes to include
+            transport: Transport for clients created by add_node. A new one is created if not given
+            ttl: Seconds a node's model list is used before it is revalidated
+        """
+        self.transport = transport if transport is not None else HTTPTransport()
+        self._owns_transport = transport is None
+        self.ttl = ttl
+        self.clients: Dict[str, InferenceClient] = {}
+        self._entries: Dict[str, NodeModels] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        for client in clients:
+            self.add_client(client)
+
+    def add_client(self, client: InferenceClient, models: Optional[List[str]] = None):
+        """Include a node, optionally seeded with the models it is known to serve"""
+        self.clients[client.node_url] = client
+        entry = self._entries.setdefault(client.node_url, NodeModels())
+        if models is not None and entry.models is None:
+            entry.models = list(models)
+
+    def add_node(self, node: NodeConfigUser, models: Optional[List[str]] = None) -> InferenceClient:
+        """Include a node by address, creating an inference client on the shared transport"""
+        node_url = node_to_url(node)
+        client = self.clients.get(node_url) or InferenceClient(node, transport=self.transport)
+        self.add_client(client, models)
+        return client
+
+    def add_hub_nodes(self, nodes: List[Dict]):
+        """Include nodes as returned by Hub.list_nodes, seeded with the models the hub lists for them"""
+        for node in nodes:
+            if "models" in node.get("provider_types", ["models"]):
+                node_config = NodeConfigUser(
+                    ip=node["ip"],
+                    user_communication_port=node.get("user_communication_port"),
+                    user_communication_protocol=node.get("user_communication_protocol", "http"),
+                )
+                self.add_node(node_config, node.get("models"))
+
+    def _is_stale(self, node_url: str) -> bool:
+        return time.monotonic() - self._entries[node_url].fetched_at > self.ttl
+
+    async def _fetch(self, node_url: str):
+        client = self.clients[node_url]
+        entry = self._entries[node_url]
+        headers = {'Authorization': f'Bearer {client.access_token}'}
+        if entry.etag is not None:
+            headers['If-None-Match'] = entry.etag
+        try:
+            response = await client.transport.client.get(f"{node_url}/inference/models", headers=headers)
+            if response.status_code == 304:
+                entry.fetched_at = time.monotonic()
+                return
+            response.raise_for_status()
+            entry.models = parse_model_list(json.loads(response.text))
+            entry.etag = response.headers.get("ETag")
+            entry.fetched_at = time.monotonic()
+        except (HTTPError, json.JSONDecodeError) as e:
+            logger.info(f"Failed to list models on {node_url}, keeping the cached list: {e}")
+
+    def _refresh_node(self, node_url: str) -> asyncio.Task:
+        task = self._refreshing.get(node_url)
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(self._fetch(node_url))
+            self._refreshing[node_url] = task
+        return task
+
+    async def refresh(self, force: bool = False):
+        """Revalidate stale model lists, or all of them with force=True"""
+        tasks = [self._refresh_node(node_url) for node_url in self.clients if force or self._is_stale(node_url)]
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _ensure_fresh(self):
+        missing = []
+        for node_url, entry in self._entries.items():
+            if entry.models is None:
+                missing.append(self._refresh_node(node_url))
+            elif self._is_stale(node_url):
+                self._refresh_node(node_url)
+        if missing:
+            await asyncio.gather(*missing)
+
+    async def models(self) -> Dict[str, List[str]]:
+        """Map of node URL to the models it serves"""
+        await self._ensure_fresh()
+        return {node_url: list(entry.models) for node_url, entry in self._entries.items() if entry.models is not None}
+
+    async def nodes_for_model(self, model: str) -> List[str]:
+        """URLs of the nodes that serve a model"""
+        await self._ensure_fresh()
+        return self.cached_nodes_for_model(model)
+
+    def cached_nodes_for_model(self, model: str) -> List[str]:
+        """URLs of the nodes that serve a model according to the cache, without any network call"""
+        return [node_url for node_url, entry in self._entries.items() if entry.models and model in entry.models]
+
+    async def close(self):
+        """Close the HTTP transport if it is owned by the catalogue"""
+        loop = asyncio.get_running_loop()
+        for task in self._refreshing.values():
+            if not task.done() and task.get_loop() is loop:
+                task.cancel()
+        if self._owns_transport:
+            await self.transport.aclose()
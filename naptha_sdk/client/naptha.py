@@ -5,14 +5,21 @@ import json
 import os
 import time
 from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional
 
+from naptha_sdk.client.grpc_channels import grpc_channels
 from naptha_sdk.client.hub import Hub
+from naptha_sdk.client.inference_router import InferenceRouter
+from naptha_sdk.client.model_catalogue import ModelCatalogue
 from naptha_sdk.client.node import UserClient
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.client.ws_session import close_ws_sessions
 from naptha_sdk.configs import setup_module_deployment
 from naptha_sdk.inference import InferenceClient
 from naptha_sdk.module_manager import AGENT_DIR, add_files_to_package, add_dependencies_to_pyproject, git_add_commit, \
     init_agent_package, publish_ipfs_package, render_agent_code, write_code_to_package
-from naptha_sdk.schemas import User
+from naptha_sdk.schemas import ModuleRunResult, SecretInput, User
+from naptha_sdk.storage.storage_client import StorageClient
 from naptha_sdk.scrape import scrape_init, scrape_func, scrape_func_params
 from naptha_sdk.user import get_public_key
 from naptha_sdk.utils import get_logger, url_to_node
@@ -21,10 +28,21 @@ logger = get_logger(__name__)
 
 load_dotenv(override=True)
 
+
+async def close_all():
+    """Close the gRPC channels and WebSocket sessions shared by every client on the running event loop.
+
+    They are process-wide, so Naptha leaves them open on exit. Call this once when the
+    application shuts down, after every Naptha and NodeClient is done.
+    """
+    await close_ws_sessions()
+    await grpc_channels.close_all()
+
+
 class Naptha:
     """The entry point into Naptha."""
 
-    def __init__(self):
+    def __init__(self, transport: Optional[HTTPTransport] = None):
         self.public_key = get_public_key(os.getenv("PRIVATE_KEY")) if os.getenv("PRIVATE_KEY") else None
         self.user = User(id=f"user:{self.public_key}")
         self.hub_username = os.getenv("HUB_USERNAME", None)
@@ -35,8 +53,12 @@ class Naptha:
         if node_url is None:
             raise ValueError("NODE_URL is not set. Make sure your project has a .env file with a NODE_URL variable.")
 
-        self.node = UserClient(url_to_node(node_url))
-        self.inference_client = InferenceClient(url_to_node(node_url))
+        self.transport = transport if transport is not None else HTTPTransport()
+        self.node = UserClient(url_to_node(node_url), transport=self.transport)
+        self.inference_client = InferenceClient(url_to_node(node_url), transport=self.transport)
+        self.model_catalogue = ModelCatalogue([self.inference_client], transport=self.transport)
+        self.inference_router = InferenceRouter(self.model_catalogue)
+        self.storage_client = StorageClient(url_to_node(node_url), transport=self.transport)
         self.hub = Hub(self.hub_url, self.public_key)  
 
     async def __aenter__(self):
@@ -47,6 +69,18 @@ class Naptha:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async exit method for context manager"""
         await self.hub.close()
+        await self.transport.aclose()
+
+    def run_many(self, module_type: str, run_inputs: Iterable, secrets: List[SecretInput] = [], concurrency: int = 16) -> AsyncIterator[ModuleRunResult]:
+        """Run a batch of modules on the node concurrently. See UserClient.run_many."""
+        return self.node.run_many(module_type, run_inputs, secrets=secrets, concurrency=concurrency)
+
+    async def add_inference_nodes_from_hub(self):
+        """Add every node listed on the hub to the model catalogue used by the inference router"""
+        async with self.hub:
+            await self.hub.signin(self.hub_username, os.getenv("HUB_PASSWORD"))
+            nodes = await self.hub.list_nodes()
+        self.model_catalogue.add_hub_nodes(nodes)
 
     async def create_agent(self, name):
         async with self.hub:
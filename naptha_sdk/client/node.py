@@ -1,49 +1,90 @@
-from copy import deepcopy
+import asyncio
+from collections import OrderedDict
 from google.protobuf.json_format import MessageToDict
-import grpc
-import httpx
-from httpx import HTTPStatusError, RemoteProtocolError
+from httpx import HTTPError, HTTPStatusError, RemoteProtocolError, TransportError
 import json
 import random
 import time
 import traceback
-from typing import Dict, Any, Union, List
+from typing import AsyncIterator, Dict, Any, Iterable, Optional, Tuple, Union, List
 import uuid
 import websockets
 from google.protobuf import struct_pb2
+from pydantic import BaseModel
 
 from naptha_sdk.client import grpc_server_pb2
-from naptha_sdk.client import grpc_server_pb2_grpc
+from naptha_sdk.client.balancer import get_port_balancer, is_connection_error, node_ports
+from naptha_sdk.client.grpc_channels import grpc_channels
+from naptha_sdk.client.transport import HTTPTransport, iter_sse_data
+from naptha_sdk.client.ws_session import WebSocketSessionUnsupported, get_ws_session, mark_ws_session_unsupported
 from naptha_sdk.schemas import AgentRun, AgentRunInput, EnvironmentRun, EnvironmentRunInput, OrchestratorRun, \
-    OrchestratorRunInput, AgentDeployment, EnvironmentDeployment, OrchestratorDeployment, KBDeployment, KBRunInput, KBRun, MemoryDeployment, MemoryRunInput, MemoryRun, ToolRunInput, ToolRun, NodeConfig, NodeConfigUser, ToolDeployment, SecretInput
+    OrchestratorRunInput, AgentDeployment, EnvironmentDeployment, OrchestratorDeployment, KBDeployment, KBRunInput, KBRun, MemoryDeployment, MemoryRunInput, MemoryRun, ModuleRunDelta, ModuleRunResult, ToolRunInput, ToolRun, NodeConfig, NodeConfigUser, ToolDeployment, SecretInput, \
+    deployment_hash, serialize_deployment
 from naptha_sdk.utils import get_logger, node_to_url
 
 logger = get_logger(__name__)
 HTTP_TIMEOUT = 300
+TERMINAL_RUN_STATUSES = ('completed', 'error')
+DEPLOYMENT_HASH_HEADER = 'X-Deployment-Hash'
+# Status a node returns when a request refers to a deployment hash it does not hold
+DEPLOYMENT_NOT_FOUND_STATUS = 412
 
 class NodeClient:
-    def __init__(self, node: NodeConfig):
+    def __init__(self, node: NodeConfig, multiplex_ws: bool = True):
+        """
+        Args:
+            node: The node to connect to
+            multiplex_ws: Whether to send WebSocket requests over a shared long-lived session
+                instead of opening a new connection per message
+        """
         self.node = node
         self.node_communication_protocol = node.node_communication_protocol
+        self.balancer = get_port_balancer(node)
         self.node_url = self.node_to_url(node)
         self.connections = {}
+        self.multiplex_ws = multiplex_ws
 
         self.access_token = None
         logger.info(f"Node URL: {self.node_url}")
 
-    def node_to_url(self, node: NodeConfig):
-        ports = node.ports
+    def node_to_url(self, node: NodeConfig, port: Optional[int] = None):
+        ports = node_ports(node)
         if len(ports) == 0:
             raise ValueError("No ports found for node")
+        port = port if port is not None else self.balancer.select()
         if node.node_communication_protocol == 'ws':
-            return f"ws://{node.ip}:{random.choice(ports)}"
+            return f"ws://{node.ip}:{port}"
         elif node.node_communication_protocol == 'wss':
             return f"wss://{node.ip}"
         elif node.node_communication_protocol == 'grpc':
-            return f"{node.ip}:{random.choice(ports)}"
+            return f"{node.ip}:{port}"
         else:
             raise ValueError("Invalid node communication protocol. Node communication protocol must be either 'ws' or 'grpc'.")
 
+    async def _call(self, call, failover: bool = False):
+        """Await call(node_url) on the port picked by the balancer.
+
+        With failover, calls that cannot reach the server are retried on the node's
+        other ports. Only use it for idempotent calls.
+        """
+        tried = set()
+        while True:
+            port = self.balancer.select(exclude=tried)
+            tried.add(port)
+            try:
+                async with self.balancer.acquire(port):
+                    return await call(self.node_to_url(self.node, port))
+            except Exception as e:
+                if not failover or not is_connection_error(e) or len(tried) >= len(self.balancer.ports):
+                    raise
+                logger.warning(f"Port {port} of node {self.node.ip} is unreachable, failing over to another port: {e}")
+
+    async def close(self):
+        """Close the cached gRPC channels to this node's ports"""
+        if self.node_communication_protocol == 'grpc':
+            for port in self.balancer.ports:
+                await grpc_channels.close(self.node_to_url(self.node, port))
+
     async def check_user(self, user_input: Dict[str, str]) -> Dict[str, Any]:
         if self.node.node_communication_protocol == 'ws':
             return await self.check_user_ws(user_input)
@@ -53,13 +94,13 @@ class NodeClient:
             raise ValueError("Invalid node communication protocol. Node communication protocol must be either 'ws' or 'grpc'.")
 
     async def check_user_ws(self, user_input: Dict[str, str]):
-        response = await self.send_receive_ws(user_input, "user/check")
+        response = await self.send_receive_ws(user_input, "user/check", failover=True)
         logger.info(f"Check user response: {response}")
         return response
 
     async def check_user_grpc(self, user_input: Dict[str, str]):
-        async with grpc.aio.insecure_channel(self.node_url) as channel:
-            stub = grpc_server_pb2_grpc.GrpcServerStub(channel)
+        async def check_user(node_url):
+            stub = grpc_channels.get_stub(node_url)
             request = grpc_server_pb2.CheckUserRequest(
                 user_id=user_input.get('user_id', ''),
                 public_key=user_input.get('public_key', '')
@@ -67,6 +108,7 @@ class NodeClient:
             response = await stub.CheckUser(request)
             logger.info(f"Check user response: {response}")
             return MessageToDict(response, preserving_proto_field_name=True)
+        return await self._call(check_user, failover=True)
 
     async def register_user(self, user_input: Dict[str, str]) -> Dict[str, Any]:
         if self.node.node_communication_protocol == 'ws':
@@ -77,13 +119,13 @@ class NodeClient:
             raise ValueError("Invalid node communication protocol. Node communication protocol must be either 'ws' or 'grpc'.")
         
     async def register_user_ws(self, user_input: Dict[str, str]):
-        response = await self.send_receive_ws(user_input, "user/register")
+        response = await self.send_receive_ws(user_input, "user/register", failover=True)
         logger.info(f"Register user response: {response}")
         return response
 
     async def register_user_grpc(self, user_input: Dict[str, str]):
-        async with grpc.aio.insecure_channel(self.node_url) as channel:
-            stub = grpc_server_pb2_grpc.GrpcServerStub(channel)
+        async def register_user(node_url):
+            stub = grpc_channels.get_stub(node_url)
             request = grpc_server_pb2.RegisterUserRequest(
                 public_key=user_input.get('public_key', '')
             )
@@ -92,6 +134,7 @@ class NodeClient:
                 'id': response.id,
                 'public_key': response.public_key,
             }
+        return await self._call(register_user, failover=True)
 
     async def run_module(self, module_type: str, run_input: Union[AgentRunInput, KBRunInput, ToolRunInput, MemoryRunInput, EnvironmentRunInput]):
         if self.node.node_communication_protocol in ['ws', 'wss']:
@@ -102,8 +145,7 @@ class NodeClient:
             raise ValueError("Invalid node communication protocol. Node communication protocol must be either 'ws' or 'grpc'.")
 
     async def run_module_ws(self, module_type: str, run_input: Union[AgentRunInput, KBRunInput, ToolRunInput, MemoryRunInput, EnvironmentRunInput]):
-        run_input_dict = deepcopy(run_input)
-        run_input_dict = run_input_dict.model_dict()
+        run_input_dict = run_input.model_dict()
         response = await self.send_receive_ws(run_input_dict, f"{module_type}/run")
         
         output_types = {
@@ -123,104 +165,128 @@ class NodeClient:
             raise Exception(response['message'])
 
     async def run_module_grpc(self, module_type: str, run_input):
-        async with grpc.aio.insecure_channel(self.node_url) as channel:
-            stub = grpc_server_pb2_grpc.GrpcServerStub(channel)
-
-            # Convert inputs to a Struct
-            input_struct = struct_pb2.Struct()
-            if run_input.inputs:
-                input_data = (
-                    run_input.inputs.dict() if hasattr(run_input.inputs, "dict") else run_input.inputs
-                )
-                input_struct.update(input_data)
-
-            # Use NodeConfigInput from the proto
-            node_config = grpc_server_pb2.NodeConfigInput(
-                ip=run_input.deployment.node.ip,
-                user_communication_port=run_input.deployment.node.user_communication_port,
-                user_communication_protocol=run_input.deployment.node.user_communication_protocol,
-            )
-
-            # Create the module proto message
-            module = grpc_server_pb2.Module(
-                id=run_input.deployment.module.get("id", ""),
-                name=run_input.deployment.module.get("name", ""),
-                description=run_input.deployment.module.get("description", ""),
-                author=run_input.deployment.module.get("author", ""),
-                module_url=run_input.deployment.module.get("module_url", ""),
-                module_type=module_type,
-                module_version=run_input.deployment.module.get("module_version", ""),
-                module_entrypoint=run_input.deployment.module.get("module_entrypoint", ""),
-                execution_type=run_input.deployment.module.get("execution_type", ""),
+        module_run = None
+        async for module_run in self.stream_module(module_type, run_input):
+            pass
+        if module_run is None:
+            raise Exception(f"Node at {self.node_url} returned no response for {module_type} run")
+        return module_run
+
+    async def stream_module(self, module_type: str, run_input) -> AsyncIterator[Union[AgentRun, KBRun, ToolRun, EnvironmentRun]]:
+        """Run a module over gRPC and yield the run each time the node streams an update.
+
+        Partial results are available on the yielded run's results as soon as the node
+        sends them, so callers can start downstream work before the run completes.
+        """
+        # Convert inputs to a Struct
+        input_struct = struct_pb2.Struct()
+        if run_input.inputs:
+            input_data = (
+                run_input.inputs.model_dump(mode="json") if isinstance(run_input.inputs, BaseModel) else run_input.inputs
             )
-
-            # Create config struct for deployment
-            config_struct = struct_pb2.Struct()
-            if run_input.deployment.config:
-                config_data = (
-                    run_input.deployment.config.dict()
-                    if hasattr(run_input.deployment.config, "dict")
-                    else run_input.deployment.config
-                )
-                config_struct.update(config_data)
-
-            # Map module types to the appropriate deployment proto message
-            deployment_classes = {
-                "agent": grpc_server_pb2.AgentDeployment,
-                "kb": grpc_server_pb2.BaseDeployment,
-                "tool": grpc_server_pb2.ToolDeployment,
-                "environment": grpc_server_pb2.BaseDeployment,
-            }
-            DeploymentClass = deployment_classes[module_type]
-            deployment = DeploymentClass(
-                node_input=node_config,
-                name=run_input.deployment.name,
-                module=module,
-                config=config_struct,
-                initialized=False,
+            input_struct.update(input_data)
+
+        # Use NodeConfigInput from the proto
+        node_config = grpc_server_pb2.NodeConfigInput(
+            ip=run_input.deployment.node.ip,
+            user_communication_port=run_input.deployment.node.user_communication_port,
+            user_communication_protocol=run_input.deployment.node.user_communication_protocol,
+        )
+
+        # Create the module proto message
+        module = grpc_server_pb2.Module(
+            id=run_input.deployment.module.get("id", ""),
+            name=run_input.deployment.module.get("name", ""),
+            description=run_input.deployment.module.get("description", ""),
+            author=run_input.deployment.module.get("author", ""),
+            module_url=run_input.deployment.module.get("module_url", ""),
+            module_type=module_type,
+            module_version=run_input.deployment.module.get("module_version", ""),
+            module_entrypoint=run_input.deployment.module.get("module_entrypoint", ""),
+            execution_type=run_input.deployment.module.get("execution_type", ""),
+        )
+
+        # Create config struct for deployment
+        config_struct = struct_pb2.Struct()
+        if run_input.deployment.config:
+            config_data = (
+                run_input.deployment.config.model_dump(mode="json")
+                if isinstance(run_input.deployment.config, BaseModel)
+                else run_input.deployment.config
             )
+            config_struct.update(config_data)
+
+        # Map module types to the appropriate deployment proto message
+        deployment_classes = {
+            "agent": grpc_server_pb2.AgentDeployment,
+            "kb": grpc_server_pb2.BaseDeployment,
+            "tool": grpc_server_pb2.ToolDeployment,
+            "environment": grpc_server_pb2.BaseDeployment,
+        }
+        DeploymentClass = deployment_classes[module_type]
+        deployment = DeploymentClass(
+            node_input=node_config,
+            name=run_input.deployment.name,
+            module=module,
+            config=config_struct,
+            initialized=False,
+        )
+
+        # Build the request with the new signature field included
+        request_args = {
+            "module_type": module_type,
+            "consumer_id": run_input.consumer_id,
+            "inputs": input_struct,
+            f"{module_type}_deployment": deployment,
+            "signature": run_input.signature,  # new field from the updated proto
+        }
+        request = grpc_server_pb2.ModuleRunRequest(**request_args)
 
-            # Build the request with the new signature field included
-            request_args = {
-                "module_type": module_type,
-                "consumer_id": run_input.consumer_id,
-                "inputs": input_struct,
-                f"{module_type}_deployment": deployment,
-                "signature": run_input.signature,  # new field from the updated proto
-            }
-            request = grpc_server_pb2.ModuleRunRequest(**request_args)
-
-            final_response = None
-            async for response in stub.RunModule(request, timeout=1800):
-                final_response = response
-                logger.info(f"Got response: {response}")
-
-            output_types = {
-                "agent": AgentRun,
-                "kb": KBRun,
-                "tool": ToolRun,
-                "environment": EnvironmentRun,
-            }
+        output_types = {
+            "agent": AgentRun,
+            "kb": KBRun,
+            "tool": ToolRun,
+            "environment": EnvironmentRun,
+        }
+        def to_run(response):
+            logger.debug(f"Got {module_type} run update: {response.status}, {len(response.results)} results")
             return output_types[module_type](
                 consumer_id=run_input.consumer_id,
                 inputs=run_input.inputs,
                 deployment=run_input.deployment,
                 orchestrator_runs=[],
-                status=final_response.status,
-                error=final_response.error,
-                id=final_response.id,
-                results=list(final_response.results),
-                error_message=final_response.error_message,
-                created_time=final_response.created_time,
-                start_processing_time=final_response.start_processing_time,
-                completed_time=final_response.completed_time,
-                duration=final_response.duration,
-                signature=final_response.signature,  # map the signature from response
+                status=response.status,
+                error=response.error,
+                id=response.id,
+                results=list(response.results),
+                error_message=response.error_message,
+                created_time=response.created_time,
+                start_processing_time=response.start_processing_time,
+                completed_time=response.completed_time,
+                duration=response.duration,
+                signature=response.signature,  # map the signature from response
             )
+
+        # The port counts as outstanding for the whole run, but its latency sample is the
+        # time to the first update rather than the length of the run
+        async with self.balancer.acquire(record_latency=False) as port:
+            stub = grpc_channels.get_stub(self.node_to_url(self.node, port))
+            start = time.monotonic()
+            call = stub.RunModule(request, timeout=1800)
+            first = True
+            try:
+                async for response in call:
+                    if first:
+                        self.balancer.record_success(port, time.monotonic() - start)
+                        first = False
+                    yield to_run(response)
+            finally:
+                # Stops the run on the node if the caller stopped iterating early
+                call.cancel()
     
-    async def connect_ws(self, action: str):
+    async def connect_ws(self, action: str, node_url: Optional[str] = None):
         client_id = str(uuid.uuid4())
-        full_url = f"{self.node_url}/ws/{action}/{client_id}"
+        full_url = f"{node_url or self.node_url}/ws/{action}/{client_id}"
         logger.info(f"Connecting to WebSocket: {full_url}")
         ws = await websockets.connect(full_url)
         self.connections[client_id] = ws
@@ -234,26 +300,75 @@ class NodeClient:
         if self.current_client_id == client_id:
             self.current_client_id = None
 
-    async def send_receive_ws(self, data, action: str):
-        client_id = await self.connect_ws(action)
-        
-        try:
-            if isinstance(data, AgentRunInput) or isinstance(data, OrchestratorRunInput):
-                message = data.model_dump()
-            else:
-                message = data
-            await self.connections[client_id].send(json.dumps(message))
+    async def send_receive_ws(self, data, action: str, failover: bool = False):
+        if isinstance(data, AgentRunInput) or isinstance(data, OrchestratorRunInput):
+            data = data.model_dump()
+
+        async def send_receive(node_url):
+            session = get_ws_session(node_url) if self.multiplex_ws else None
+            if session is not None:
+                try:
+                    return await session.request(action, data)
+                except WebSocketSessionUnsupported as e:
+                    logger.info(f"{e}. Falling back to one connection per message.")
+                    mark_ws_session_unsupported(node_url)
+
+            client_id = await self.connect_ws(action, node_url)
             
-            response = await self.connections[client_id].recv()
-            return json.loads(response)
-        finally:
-            await self.disconnect_ws(client_id)
+            try:
+                message = data
+                await self.connections[client_id].send(json.dumps(message))
+                
+                response = await self.connections[client_id].recv()
+                return json.loads(response)
+            finally:
+                await self.disconnect_ws(client_id)
+
+        return await self._call(send_receive, failover=failover)
 
 class UserClient:
-    def __init__(self, node: NodeConfigUser):
+    def __init__(
+        self,
+        node: NodeConfigUser,
+        transport: Optional[HTTPTransport] = None,
+        completion_mode: str = "auto",
+        poll_interval: float = 0.1,
+        max_poll_interval: float = 5.0,
+        cache_deployments: bool = False,
+        dedupe_deployments: bool = True,
+        max_known_deployments: int = 256,
+    ):
+        """
+        Args:
+            node: The node to connect to
+            transport: Shared HTTP transport. A new one is created if not given
+            completion_mode: How to wait for runs to finish. 'stream' uses server-sent events,
+                'poll' polls the node and 'auto' streams when the node supports it and polls otherwise
+            poll_interval: Initial delay in seconds between status checks when polling
+            max_poll_interval: Maximum delay in seconds between status checks when polling
+            cache_deployments: Reuse the serialized deployment across runs with the same deployment object.
+                Only enable it if deployments are not modified after their first run
+            dedupe_deployments: Send a deployment once and refer to it by content hash in later requests,
+                once the node has acknowledged holding it
+            max_known_deployments: Number of node-acknowledged deployment hashes to remember
+        """
+        if completion_mode not in ("auto", "stream", "poll"):
+            raise ValueError("Invalid completion mode. Completion mode must be either 'auto', 'stream' or 'poll'.")
         self.node = node
         self.node_url = node_to_url(node)
         self.connections = {}
+        self.transport = transport if transport is not None else HTTPTransport()
+        self._owns_transport = transport is None
+        self.completion_mode = completion_mode
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.cache_deployments = cache_deployments
+        self.dedupe_deployments = dedupe_deployments
+        self.max_known_deployments = max_known_deployments
+        self._known_deployments: "OrderedDict[str, None]" = OrderedDict()
+        # Whether the node acknowledges deployment hashes, None until its first response
+        self._node_dedupes: Optional[bool] = None
+        self._stream_supported = None
         
         self.access_token = None
         logger.info(f"Node URL: {self.node_url}")
@@ -271,20 +386,20 @@ class UserClient:
 
         endpoint = f"{self.node_url}/{module_type}/create"
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.access_token}',
-                }
-                response = await client.post(
-                    endpoint,
-                    json=module_request.model_dump(),
-                    headers=headers
-                )
-                response.raise_for_status()
+            client = self.transport.client
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {self.access_token}',
+            }
+            response = await client.post(
+                endpoint,
+                json=module_request.model_dump(),
+                headers=headers
+            )
+            response.raise_for_status()
 
-                # Convert response to appropriate return type
-                return response.json()
+            # Convert response to appropriate return type
+            return response.json()
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
             raise
@@ -296,6 +411,17 @@ class UserClient:
             print(f"An unexpected error occurred: {e}")
             raise
 
+    async def close(self):
+        """Close the HTTP transport if it is owned by this client"""
+        if self._owns_transport:
+            await self.transport.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
     async def _run_and_poll(self, run_input: Union[AgentRunInput, EnvironmentRunInput, OrchestratorRunInput, KBRunInput, ToolRunInput, Dict], module_type: str, secrets: List[SecretInput] = []) -> Union[AgentRun, EnvironmentRun, OrchestratorRun, KBRun, ToolRun, Dict]:
         """Generic method to run and poll either an agent, orchestrator, environment, tool or KB.
         
@@ -310,23 +436,16 @@ class UserClient:
         print(f"{module_type.title()} run started: {run}")
 
         current_results_len = 0
-        while True:
-            run = await getattr(self, f'check_{module_type}_run')(run)
-
+        async for run in self.watch_run(run, module_type):
             output = f"{run.status} {getattr(run, f'deployment').module['module_type']} {getattr(run, f'deployment').module['name']}"
             print(output)
 
             results = run.results
             status = run.status
 
-            if len(results) > current_results_len:
-                print("Output: ", results[-1])
-                current_results_len += 1
-
-            if status in ['completed', 'error']:
-                break
-
-            time.sleep(3)
+            for result in results[current_results_len:]:
+                print("Output: ", result)
+            current_results_len = len(results)
 
         if status == 'completed':
             print(results)
@@ -335,6 +454,93 @@ class UserClient:
             print(error_msg)
         return run
 
+    async def watch_run(
+        self,
+        module_run: Union[AgentRun, OrchestratorRun, EnvironmentRun, KBRun, MemoryRun, ToolRun],
+        module_type: str,
+        poller: Optional["RunBatchPoller"] = None
+    ) -> AsyncIterator[Union[AgentRun, OrchestratorRun, EnvironmentRun, KBRun, MemoryRun, ToolRun]]:
+        """Yield updated copies of a module run until it completes or errors.
+
+        Status and result deltas are streamed from the node over SSE when the node
+        supports it. Otherwise the run is polled with exponential backoff and jitter.
+
+        Args:
+            module_run: The run returned when the module was started
+            module_type: Either 'agent', 'orchestrator', 'environment', 'tool', 'kb' or 'memory'
+            poller: Optional shared poller that checks many runs in one request per tick
+        """
+        if module_run.status in TERMINAL_RUN_STATUSES:
+            yield module_run
+            return
+
+        if self.completion_mode != "poll" and self._stream_supported is not False:
+            async for module_run in self._stream_run(module_run, module_type):
+                yield module_run
+            if module_run.status in TERMINAL_RUN_STATUSES:
+                return
+
+        if poller is not None:
+            yield await poller.wait(module_run)
+            return
+
+        async for module_run in self._poll_run(module_run, module_type):
+            yield module_run
+
+    async def wait_for_run(
+        self,
+        module_run: Union[AgentRun, OrchestratorRun, EnvironmentRun, KBRun, MemoryRun, ToolRun],
+        module_type: str,
+        poller: Optional["RunBatchPoller"] = None
+    ) -> Union[AgentRun, OrchestratorRun, EnvironmentRun, KBRun, MemoryRun, ToolRun]:
+        """Wait for a module run to complete or error and return the final run"""
+        async for module_run in self.watch_run(module_run, module_type, poller=poller):
+            pass
+        return module_run
+
+    async def _stream_run(self, module_run, module_type: str):
+        """Apply run deltas pushed by the node over SSE until the run finishes or the stream ends"""
+        endpoint = f"{self.node_url}/{module_type}/run/{module_run.id}/events"
+        headers = {
+            'Accept': 'text/event-stream',
+            'Authorization': f'Bearer {self.access_token}',
+        }
+        try:
+            async with self.transport.client.stream("GET", endpoint, headers=headers) as response:
+                if response.status_code in (404, 405, 501):
+                    if self.completion_mode == "stream":
+                        response.raise_for_status()
+                    logger.info(f"Node at {self.node_url} does not stream run events. Falling back to polling.")
+                    self._stream_supported = False
+                    return
+                response.raise_for_status()
+                self._stream_supported = True
+                async for data in iter_sse_data(response):
+                    module_run = ModuleRunDelta(**json.loads(data)).apply(module_run)
+                    yield module_run
+                    if module_run.status in TERMINAL_RUN_STATUSES:
+                        return
+        except (HTTPError, json.JSONDecodeError) as e:
+            if self.completion_mode == "stream":
+                raise
+            logger.info(f"Run event stream interrupted, falling back to polling: {e}")
+
+    async def _poll_run(self, module_run, module_type: str):
+        """Poll a run with exponential backoff and jitter until it finishes"""
+        delay = self.poll_interval
+        while True:
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            previous = (module_run.status, len(module_run.results))
+            module_run = await getattr(self, f'check_{module_type}_run')(module_run)
+            yield module_run
+            if module_run.status in TERMINAL_RUN_STATUSES:
+                return
+            # Back off while the run is idle and check again quickly once it makes progress
+            if (module_run.status, len(module_run.results)) == previous:
+                delay = min(delay * 2, self.max_poll_interval)
+            else:
+                delay = self.poll_interval
+
     async def run_agent_and_poll(self, agent_run_input: AgentRunInput, secrets: List[SecretInput] = []) -> AgentRun:
         """Run an agent module and poll for results until completion."""
         return await self._run_and_poll(agent_run_input, 'agent', secrets)
@@ -359,22 +565,75 @@ class UserClient:
         """Run a memory module and poll for results until completion."""
         return await self._run_and_poll(memory_input, 'memory', secrets)
 
+    async def run_many(
+        self,
+        module_type: str,
+        run_inputs: Iterable[Union[AgentRunInput, OrchestratorRunInput, EnvironmentRunInput, KBRunInput, MemoryRunInput, ToolRunInput, Dict]],
+        secrets: List[SecretInput] = [],
+        concurrency: int = 16
+    ) -> AsyncIterator[ModuleRunResult]:
+        """Run a batch of modules concurrently and yield results in completion order.
+
+        At most `concurrency` runs are in flight at once and all of them share this
+        client's connection pool. Failures are reported per item on
+        ModuleRunResult.error instead of aborting the batch.
+
+        Args:
+            module_type: Either 'agent', 'orchestrator', 'environment', 'tool', 'kb' or 'memory'
+            run_inputs: Iterable of run inputs, consumed lazily as slots free up
+            secrets: Secrets passed with every run
+            concurrency: Maximum number of runs in flight
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        poller = RunBatchPoller(self, module_type)
+
+        async def run_one(index, run_input):
+            try:
+                run = await self._run_module(run_input, module_type, secrets)
+                run = await self.wait_for_run(run, module_type, poller=poller)
+                return ModuleRunResult(index=index, run_input=run_input, run=run)
+            except Exception as e:
+                logger.error(f"Run {index} of {module_type} batch failed: {e}")
+                return ModuleRunResult(index=index, run_input=run_input, error=e)
+
+        run_inputs = enumerate(run_inputs)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < concurrency:
+                    try:
+                        index, run_input = next(run_inputs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.create_task(run_one(index, run_input)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
     async def check_user(self, user_input: Dict[str, Any]) -> Dict[str, Any]:
         """
         Check if a user exists on a node
         """
         endpoint = self.node_url + "/user/check"
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
-                    'Content-Type': 'application/json', 
-                }
-                response = await client.post(
-                    endpoint, 
-                    json=user_input,
-                    headers=headers
-                )
-                response.raise_for_status()
+            client = self.transport.client
+            headers = {
+                'Content-Type': 'application/json', 
+            }
+            response = await client.post(
+                endpoint, 
+                json=user_input,
+                headers=headers
+            )
+            response.raise_for_status()
             return json.loads(response.text)
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
@@ -393,16 +652,16 @@ class UserClient:
         """
         endpoint = self.node_url + "/user/register"
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
-                    'Content-Type': 'application/json', 
-                }
-                response = await client.post(
-                    endpoint, 
-                    json=user_input,
-                    headers=headers
-                )
-                response.raise_for_status()
+            client = self.transport.client
+            headers = {
+                'Content-Type': 'application/json', 
+            }
+            response = await client.post(
+                endpoint, 
+                json=user_input,
+                headers=headers
+            )
+            response.raise_for_status()
             return json.loads(response.text)
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
@@ -443,38 +702,52 @@ class UserClient:
             run_input = input_class(**run_input)
 
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.access_token}',
-                }
+            client = self.transport.client
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {self.access_token}',
+            }
+            # Serialize the deployment once, for both the body and its hash
+            deployment_json = None
+            if self._hash_deployments:
+                deployment_json = serialize_deployment(run_input.deployment, cache=self.cache_deployments, as_json=True)
+            ref, by_reference = self._deployment_ref(run_input.deployment, deployment_json)
+            if ref is not None:
+                headers[DEPLOYMENT_HASH_HEADER] = ref
+            response = await client.post(
+                endpoint,
+                content=self._run_request_body(
+                    run_input, module_type, secrets, include_deployment=not by_reference, deployment_json=deployment_json
+                ),
+                headers=headers
+            )
+            if by_reference and response.status_code == DEPLOYMENT_NOT_FOUND_STATUS:
+                logger.info(f"Node no longer holds deployment {ref}. Resending it in full.")
+                self._forget_deployment(ref)
                 response = await client.post(
                     endpoint,
-                    json={
-                        f"{module_type}_run_input": run_input.model_dict(),
-                        "secrets": [SecretInput(**secret).model_dict() for secret in secrets]
-                    },
+                    content=self._run_request_body(run_input, module_type, secrets, deployment_json=deployment_json),
                     headers=headers
                 )
 
-                # Try to get error details even for error responses
-                if response.status_code >= 400:
-                    error_detail = response.json() if response.text else str(response)
-                    logger.error(f"Server error response: {error_detail}")
-                    raise Exception(f"Server returned error response: {error_detail}")
+            # Try to get error details even for error responses
+            if response.status_code >= 400:
+                error_detail = response.json() if response.text else str(response)
+                logger.error(f"Server error response: {error_detail}")
+                raise Exception(f"Server returned error response: {error_detail}")
                     
-                response.raise_for_status()
+            response.raise_for_status()
                 
-                # Convert response to appropriate return type
-                return_class = {
-                    'agent': AgentRun,
-                    'orchestrator': OrchestratorRun,
-                    'environment': EnvironmentRun,
-                    'kb': KBRun,
-                    'memory': MemoryRun,
-                    'tool': ToolRun
-                }[module_type]
-                return return_class(**json.loads(response.text))
+            # Convert response to appropriate return type
+            return_class = {
+                'agent': AgentRun,
+                'orchestrator': OrchestratorRun,
+                'environment': EnvironmentRun,
+                'kb': KBRun,
+                'memory': MemoryRun,
+                'tool': ToolRun
+            }[module_type]
+            return return_class(**self._with_deployment(response, ref, run_input.deployment))
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
             raise
@@ -486,6 +759,59 @@ class UserClient:
             print(f"An unexpected error occurred: {e}")
             raise
 
+    def _run_request_body(
+        self,
+        run_input,
+        module_type: str,
+        secrets: List[SecretInput],
+        include_deployment: bool = True,
+        deployment_json: Optional[str] = None,
+    ) -> str:
+        """JSON body for a run request, serialized in one pass without an intermediate dict"""
+        secrets_json = json.dumps([SecretInput(**secret).model_dict() for secret in secrets])
+        run_input_json = run_input.model_json(
+            cache_deployment=self.cache_deployments, include_deployment=include_deployment, deployment_json=deployment_json
+        )
+        return f'{{"{module_type}_run_input":{run_input_json},"secrets":{secrets_json}}}'
+
+    @property
+    def _hash_deployments(self) -> bool:
+        """Whether to hash deployments, which stops once the node has shown it ignores the hashes"""
+        return self.dedupe_deployments and self._node_dedupes is not False
+
+    def _deployment_ref(self, deployment, deployment_json: Optional[str] = None) -> Tuple[Optional[str], bool]:
+        """Content hash of a deployment and whether the node has acknowledged holding it"""
+        if not self._hash_deployments:
+            return None, False
+        ref = deployment_hash(deployment, cache=self.cache_deployments, deployment_json=deployment_json)
+        if ref in self._known_deployments:
+            self._known_deployments.move_to_end(ref)
+            return ref, True
+        return ref, False
+
+    def _forget_deployment(self, ref: str):
+        self._known_deployments.pop(ref, None)
+
+    def _with_deployment(self, response, ref: Optional[str], deployment) -> Dict:
+        """Parse a run from a response, remembering an acknowledged deployment hash.
+
+        A node that holds the deployment may leave it out of the response, in which
+        case the deployment sent with the request is filled back in.
+        """
+        if ref is not None and response.headers.get(DEPLOYMENT_HASH_HEADER) is None and self._node_dedupes is None:
+            logger.info(f"Node at {self.node_url} does not acknowledge deployment hashes. Sending deployments in full.")
+            self._node_dedupes = False
+        if ref is not None and response.headers.get(DEPLOYMENT_HASH_HEADER) == ref:
+            self._node_dedupes = True
+            self._known_deployments[ref] = None
+            self._known_deployments.move_to_end(ref)
+            if len(self._known_deployments) > self.max_known_deployments:
+                self._known_deployments.popitem(last=False)
+        run = json.loads(response.text)
+        if run.get("deployment") is None:
+            run["deployment"] = deployment
+        return run
+
     async def run_agent(self, agent_run_input: AgentRunInput, secrets: List[SecretInput] = []) -> AgentRun:
         """Run an agent module on a node"""
         return await self._run_module(agent_run_input, 'agent', secrets)
@@ -522,12 +848,19 @@ class UserClient:
             module_type: Either 'agent', 'orchestrator', 'environment', 'tool', 'kb' or 'memory'
         """
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                response = await client.post(
-                    f"{self.node_url}/{module_type}/check", 
-                    json=module_run.model_dump()
-                )
-                response.raise_for_status()
+            client = self.transport.client
+            endpoint = f"{self.node_url}/{module_type}/check"
+            ref, by_reference = self._deployment_ref(module_run.deployment)
+            headers = {DEPLOYMENT_HASH_HEADER: ref} if ref is not None else {}
+            response = await client.post(
+                endpoint,
+                json=module_run.model_dump(exclude={"deployment"} if by_reference else None),
+                headers=headers
+            )
+            if by_reference and response.status_code == DEPLOYMENT_NOT_FOUND_STATUS:
+                self._forget_deployment(ref)
+                response = await client.post(endpoint, json=module_run.model_dump(), headers=headers)
+            response.raise_for_status()
             
             return_class = {
                 'agent': AgentRun,
@@ -537,12 +870,50 @@ class UserClient:
                 'memory': MemoryRun,
                 'tool': ToolRun
             }[module_type]
-            return return_class(**json.loads(response.text))
+            return return_class(**self._with_deployment(response, ref, module_run.deployment))
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
             raise  
         except Exception as e:
             logger.info(f"An unexpected error occurred: {e}")
+            raise
+
+    async def check_runs(
+        self,
+        run_ids: List[str],
+        module_type: str,
+        results_offsets: Optional[Dict[str, int]] = None
+    ) -> Dict[str, ModuleRunDelta]:
+        """Check the status of many module runs in one request.
+
+        Only run IDs are sent, together with the number of results the caller already
+        has for each run, and the node replies with a compact delta per run.
+
+        Args:
+            run_ids: IDs of the runs to check
+            module_type: Either 'agent', 'orchestrator', 'environment', 'tool', 'kb' or 'memory'
+            results_offsets: Number of results already received for each run ID
+
+        Returns:
+            A ModuleRunDelta for each run ID the node knows about, keyed by run ID
+        """
+        results_offsets = results_offsets or {}
+        payload = {
+            "runs": [{"id": run_id, "results_offset": results_offsets.get(run_id, 0)} for run_id in run_ids]
+        }
+        try:
+            client = self.transport.client
+            response = await client.post(
+                f"{self.node_url}/{module_type}/check/batch",
+                json=payload,
+                headers={'Authorization': f'Bearer {self.access_token}'}
+            )
+            response.raise_for_status()
+            deltas = [ModuleRunDelta(**delta) for delta in response.json()["runs"]]
+            return {delta.id: delta for delta in deltas}
+        except HTTPStatusError as e:
+            logger.info(f"HTTP error occurred: {e}")
+            raise
 
     # Update existing methods to use the new generic one
     async def check_agent_run(self, agent_run: AgentRun) -> AgentRun:
@@ -565,21 +936,21 @@ class UserClient:
     
     async def _send_request(self, method: str, endpoint: str, data: dict = {}, params: dict = {}) -> str:
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
-                    'Content-Type': 'application/json',
-                }
-
-                if method == "GET":
-                    response = await client.get(endpoint, headers=headers)
-                elif method == "POST":
-                    response = await client.post(endpoint, json=data, headers=headers, params=params)
-                else:
-                    raise ValueError(f"Unsupported HTTP method: {method}")
+            client = self.transport.client
+            headers = {
+                'Content-Type': 'application/json',
+            }
 
-                response.raise_for_status()
+            if method == "GET":
+                response = await client.get(endpoint, headers=headers)
+            elif method == "POST":
+                response = await client.post(endpoint, json=data, headers=headers, params=params)
+            else:
+                raise ValueError(f"Unsupported HTTP method: {method}")
 
-                return response.json()
+            response.raise_for_status()
+
+            return response.json()
         except HTTPStatusError as e:
             logger.error(f"HTTP error occurred: {e}")
             raise
@@ -587,3 +958,124 @@ class UserClient:
             logger.error(f"An error occurred: {e}")
             raise
 
+
+
+def is_transient_check_error(error: BaseException) -> bool:
+    """Whether a failed status check may succeed on the next poll"""
+    if isinstance(error, HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, TransportError)
+
+
+class RunBatchPoller:
+    """Polls many in-flight runs of one module type together.
+
+    Every tick sends a single check_runs request for all registered runs instead of
+    one check request per run. Nodes without the batch route are checked with
+    concurrent check_run calls instead. A failed check fails only its own run, and
+    runs the node stops reporting fail with LookupError after max_missing_checks ticks.
+    A tick whose batch check fails with a 5xx or a connection error is retried with
+    backoff, and the runs only fail after max_failed_ticks such ticks in a row.
+    """
+
+    def __init__(self, client: UserClient, module_type: str, max_missing_checks: int = 3, max_failed_ticks: int = 3):
+        self.client = client
+        self.module_type = module_type
+        self.max_missing_checks = max_missing_checks
+        self.max_failed_ticks = max_failed_ticks
+        self._runs = {}
+        self._waiters = {}
+        self._missing = {}
+        self._task = None
+        self._batch_supported = True
+
+    async def wait(self, module_run):
+        """Register a run and wait until it completes or errors"""
+        if module_run.status in TERMINAL_RUN_STATUSES:
+            return module_run
+        waiter = asyncio.get_running_loop().create_future()
+        self._runs[module_run.id] = module_run
+        self._waiters[module_run.id] = waiter
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        try:
+            return await waiter
+        finally:
+            self._runs.pop(module_run.id, None)
+            self._waiters.pop(module_run.id, None)
+            self._missing.pop(module_run.id, None)
+
+    def _finish(self, run_id: str, module_run=None, error: Optional[BaseException] = None):
+        self._runs.pop(run_id, None)
+        self._missing.pop(run_id, None)
+        waiter = self._waiters.get(run_id)
+        if waiter is not None and not waiter.done():
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(module_run)
+
+    async def _poll(self):
+        delay = self.client.poll_interval
+        failed_ticks = 0
+        while self._runs:
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            runs = dict(self._runs)
+            try:
+                updated = await self._check(runs)
+            except Exception as e:
+                failed_ticks += 1
+                if is_transient_check_error(e) and failed_ticks < self.max_failed_ticks:
+                    logger.warning(f"Checking {self.module_type} runs on {self.client.node_url} failed, retrying: {e}")
+                    delay = min(delay * 2, self.client.max_poll_interval)
+                    continue
+                for waiter in self._waiters.values():
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                self._runs.clear()
+                return
+            failed_ticks = 0
+
+            progress = False
+            for run_id, previous in runs.items():
+                if run_id not in self._runs:
+                    continue
+                module_run = updated.get(run_id)
+                if module_run is None:
+                    self._missing[run_id] = self._missing.get(run_id, 0) + 1
+                    if self._missing[run_id] >= self.max_missing_checks:
+                        self._finish(run_id, error=LookupError(
+                            f"Node at {self.client.node_url} no longer reports {self.module_type} run {run_id}"
+                        ))
+                    continue
+                self._missing.pop(run_id, None)
+                if isinstance(module_run, BaseException):
+                    self._finish(run_id, error=module_run)
+                    continue
+                if (module_run.status, len(module_run.results)) != (previous.status, len(previous.results)):
+                    progress = True
+                self._runs[run_id] = module_run
+                if module_run.status in TERMINAL_RUN_STATUSES:
+                    self._finish(run_id, module_run)
+            delay = self.client.poll_interval if progress else min(delay * 2, self.client.max_poll_interval)
+
+    async def _check(self, runs):
+        if self._batch_supported:
+            try:
+                deltas = await self.client.check_runs(
+                    list(runs),
+                    self.module_type,
+                    results_offsets={run_id: len(module_run.results) for run_id, module_run in runs.items()}
+                )
+                return {run_id: deltas[run_id].apply(module_run) for run_id, module_run in runs.items() if run_id in deltas}
+            except HTTPStatusError as e:
+                if e.response.status_code not in (404, 405, 501):
+                    raise
+                logger.info(f"Node at {self.client.node_url} does not support batched run checks. Checking runs individually.")
+                self._batch_supported = False
+
+        checked = await asyncio.gather(
+            *[self.client.check_run(module_run, self.module_type) for module_run in runs.values()],
+            return_exceptions=True
+        )
+        return {run_id: result for run_id, result in zip(runs, checked) if result is not None}
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import hashlib
+import json
+from typing import Iterable, List, Optional
+
+from naptha_sdk.schemas import ChatMessage
+
+PREFIX_HASH_HEADER = "X-Prefix-Hash"
+# Hex characters kept per prefix hash, enough to tell prefixes apart while keeping the header short
+PREFIX_HASH_LENGTH = 16
+# Most recent message boundaries that always get a hash, on top of the power-of-two depths
+PREFIX_HASH_RECENT = 8
+
+
+def prefix_depths(count: int, recent: int = PREFIX_HASH_RECENT) -> List[int]:
+    """Message counts that get a prefix hash: every power of two and the last recent counts"""
+    depths = {1 << i for i in range(count.bit_length()) if 1 << i <= count}
+    depths.update(range(max(count - recent + 1, 1), count + 1))
+    return sorted(depths)
+
+
+def prefix_hashes(messages: List[ChatMessage], recent: int = PREFIX_HASH_RECENT) -> List[str]:
+    """Cumulative hashes of a conversation at a bounded set of message boundaries.
+
+    A hash covering the first k messages is kept when k is a power of two or one of
+    the last recent boundaries, so long conversations produce O(log n) hashes and the
+    X-Prefix-Hash header stays small. Two requests that share their first k messages
+    share every hash at or below depth k, and hashes are ordered from the shortest prefix.
+    """
+    depths = set(prefix_depths(len(messages), recent))
+    hashes = []
+    digest = hashlib.sha256()
+    for depth, message in enumerate(messages, start=1):
+        digest.update(json.dumps({"role": message.role, "content": message.content}, sort_keys=True).encode())
+        if depth in depths:
+            hashes.append(digest.copy().hexdigest()[:PREFIX_HASH_LENGTH])
+    return hashes
+
+
+class PrefixAffinity:
+    """Sticky map from conversation prefixes to the node that last served them.
+
+    Requests are matched on their longest known prefix, so follow-up turns and
+    agents sharing a long system prompt go back to the node that already holds the
+    prefix in its KV cache.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Args:
+            max_entries: Maximum number of prefixes remembered before the least recently used is evicted
+        """
+        self.max_entries = max_entries
+        self._nodes: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, hashes: List[str], candidates: Optional[Iterable[str]] = None) -> Optional[str]:
+        """Node that served the longest known prefix, limited to candidates if given"""
+        allowed = set(candidates) if candidates is not None else None
+        for prefix_hash in reversed(hashes):
+            node_url = self._nodes.get(prefix_hash)
+            if node_url is not None and (allowed is None or node_url in allowed):
+                self._nodes.move_to_end(prefix_hash)
+                self.hits += 1
+                return node_url
+        self.misses += 1
+        return None
+
+    def record(self, hashes: List[str], node_url: str):
+        """Remember that node_url served every prefix of a request"""
+        for prefix_hash in hashes:
+            self._nodes[prefix_hash] = node_url
+            self._nodes.move_to_end(prefix_hash)
+        while len(self._nodes) > self.max_entries:
+            self._nodes.popitem(last=False)
@@ -0,0 +1,200 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Tuple
+
+from naptha_sdk.schemas import ChatCompletionRequest
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+# Completion budget assumed for requests that do not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(request: ChatCompletionRequest) -> int:
+    """Rough token cost of a request, from the prompt length and the completion budget"""
+    prompt_chars = sum(len(message.role) + len(message.content) for message in request.messages)
+    return prompt_chars // CHARS_PER_TOKEN + (request.max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket whose refill rate can be lowered and raised at runtime.
+
+    A take larger than the capacity is allowed once the bucket is full and leaves
+    it in debt, so large requests are charged in full without blocking forever.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens the bucket holds
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= amount
+
+
+class InferenceRateLimiter:
+    """Client-side admission control for inference requests to one node.
+
+    Requests are limited per node and per model, by request count and by estimated
+    tokens. Waiting requests are admitted in priority order, lowest value first, so
+    interactive calls go ahead of batch traffic. Limits adapt to the node: a 429
+    halves the rates of the node and model buckets, a Retry-After pauses admission
+    for that long, and successful responses raise the rates back step by step.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        model_limits: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        burst_seconds: float = 5.0,
+        decrease_factor: float = 0.5,
+        increase_fraction: float = 0.05,
+        min_rate_fraction: float = 0.05,
+        max_retries: int = 3,
+    ):
+        """
+        Args:
+            requests_per_minute: Request limit for the node, or None for no limit
+            tokens_per_minute: Estimated token limit for the node, or None for no limit
+            model_limits: Per model (requests_per_minute, tokens_per_minute) limits
+            burst_seconds: Seconds of traffic a full bucket allows in a burst
+            decrease_factor: Factor applied to rates after a 429
+            increase_fraction: Fraction of the configured rate restored after each successful response
+            min_rate_fraction: Lowest fraction of the configured rate that a 429 can reduce a limit to
+            max_retries: Times a request rejected with 429 is admitted again before giving up
+        """
+        self.burst_seconds = burst_seconds
+        self.decrease_factor = decrease_factor
+        self.increase_fraction = increase_fraction
+        self.min_rate_fraction = min_rate_fraction
+        self.max_retries = max_retries
+        self.node_buckets = self._buckets(requests_per_minute, tokens_per_minute)
+        self.model_buckets = {
+            model: self._buckets(*limits) for model, limits in (model_limits or {}).items()
+        }
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._queue: List[Tuple[int, int, str, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._loop = None
+        self._wakeup = None
+        self._dispatcher = None
+
+    def _buckets(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float]) -> Dict[str, TokenBucket]:
+        buckets = {}
+        if requests_per_minute:
+            rate = requests_per_minute / 60
+            buckets["requests"] = TokenBucket(rate, max(rate * self.burst_seconds, 1.0))
+        if tokens_per_minute:
+            rate = tokens_per_minute / 60
+            buckets["tokens"] = TokenBucket(rate, max(rate * self.burst_seconds, 1.0))
+        return buckets
+
+    def _buckets_for(self, model: str) -> List[Tuple[TokenBucket, str]]:
+        buckets = list(self.node_buckets.items()) + list(self.model_buckets.get(model, {}).items())
+        return [(bucket, kind) for kind, bucket in buckets]
+
+    def _wait_time(self, model: str, tokens: int, now: float) -> float:
+        wait = max(self.paused_until - now, 0.0)
+        for bucket, kind in self._buckets_for(model):
+            wait = max(wait, bucket.wait_time(1 if kind == "requests" else tokens, now))
+        return wait
+
+    async def acquire(self, model: str, tokens: int, priority: int = PRIORITY_INTERACTIVE):
+        """Wait until a request for model costing tokens may be sent
+
+        Args:
+            model: Model the request is for
+            tokens: Estimated tokens of the request, see estimate_tokens
+            priority: Lower values are admitted first, e.g. PRIORITY_INTERACTIVE or PRIORITY_BATCH
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = []
+            self._wakeup = asyncio.Event()
+            self._dispatcher = None
+        future = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._order), model, tokens, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wakeup.set()
+        await future
+
+    async def _dispatch(self):
+        while self._queue:
+            _, _, model, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            wait = self._wait_time(model, tokens, now)
+            if wait <= 0:
+                heapq.heappop(self._queue)
+                for bucket, kind in self._buckets_for(model):
+                    bucket.take(1 if kind == "requests" else tokens, now)
+                future.set_result(None)
+                continue
+            # Sleep until the head can go, or until a new request arrives that may outrank it
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def record_success(self, model: str):
+        """Raise rates back towards their configured limits after a successful response"""
+        for bucket, _ in self._buckets_for(model):
+            bucket.rate = min(bucket.max_rate, bucket.rate + bucket.max_rate * self.increase_fraction)
+
+    def record_throttled(self, model: str, retry_after: Optional[float] = None):
+        """Lower rates after the node rejected a request with 429 and honour its Retry-After"""
+        self.throttled += 1
+        for bucket, _ in self._buckets_for(model):
+            bucket.rate = max(bucket.max_rate * self.min_rate_fraction, bucket.rate * self.decrease_factor)
+            bucket.tokens = min(bucket.tokens, 0.0)
+        if retry_after is not None:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        logger.info(f"Node throttled {model}, retry after {retry_after}s")
@@ -0,0 +1,180 @@
+import json
+from typing import Annotated, Any, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+SCALAR_CHARS = set("-+.0123456789eEtruefalsn")
+WHITESPACE = set(" \t\r\n")
+
+
+class StructuredOutputError(Exception):
+    """Raised when streamed output is not valid JSON or does not match the output model"""
+
+
+class IncrementalJSONObjectParser:
+    """Parses a JSON object as text arrives and returns each top-level member once it is complete.
+
+    Only the top level is tracked incrementally; nested values are passed to
+    json.loads once their closing bracket arrives. Output that cannot be the
+    start of a JSON object is rejected as soon as the offending character is seen.
+    A leading Markdown code fence is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key = None
+        self.token_start = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    def _error(self, message: str):
+        raise StructuredOutputError(f"{message} at position {self.pos}: {self.buffer[max(self.pos - 20, 0):self.pos + 1]!r}")
+
+    def _complete_value(self, end: int) -> Tuple[str, Any]:
+        text = self.buffer[self.token_start:end]
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"Invalid JSON value for {self.key!r}: {e}")
+        self.state = "after_value"
+        return self.key, value
+
+    def _scan_string(self, c: str) -> bool:
+        """Advance through a string and return whether c closed it"""
+        if self.escape:
+            self.escape = False
+        elif c == "\\":
+            self.escape = True
+        elif c == '"':
+            return True
+        return False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add streamed text and return the top-level members completed by it"""
+        self.buffer += text
+        members = []
+        while self.pos < len(self.buffer):
+            c = self.buffer[self.pos]
+            state = self.state
+            if state == "start":
+                if c == "`":
+                    self.state = "fence"
+                elif c == "{":
+                    self.state = "key_or_end"
+                elif c not in WHITESPACE:
+                    self._error("Expected a JSON object")
+            elif state == "fence":
+                if c == "\n":
+                    self.state = "start"
+            elif state in ("key_or_end", "key_required"):
+                if c == '"':
+                    self.token_start = self.pos
+                    self.state = "key"
+                elif c == "}" and state == "key_or_end":
+                    self.state = "done"
+                elif c not in WHITESPACE:
+                    self._error("Expected a property name")
+            elif state == "key":
+                if self._scan_string(c):
+                    self.key = json.loads(self.buffer[self.token_start:self.pos + 1])
+                    self.state = "colon"
+            elif state == "colon":
+                if c == ":":
+                    self.state = "value"
+                elif c not in WHITESPACE:
+                    self._error("Expected ':'")
+            elif state == "value":
+                if c not in WHITESPACE:
+                    self.token_start = self.pos
+                    if c in "{[":
+                        self.depth = 1
+                        self.state = "container"
+                    elif c == '"':
+                        self.state = "string"
+                    elif c in SCALAR_CHARS:
+                        self.state = "scalar"
+                    else:
+                        self._error("Expected a JSON value")
+            elif state == "string":
+                if self._scan_string(c):
+                    members.append(self._complete_value(self.pos + 1))
+            elif state == "container":
+                if self.in_string:
+                    self.in_string = not self._scan_string(c)
+                elif c == '"':
+                    self.in_string = True
+                elif c in "{[":
+                    self.depth += 1
+                elif c in "}]":
+                    self.depth -= 1
+                    if self.depth == 0:
+                        members.append(self._complete_value(self.pos + 1))
+            elif state == "scalar":
+                if c in WHITESPACE or c in ",}":
+                    members.append(self._complete_value(self.pos))
+                    continue
+                if c not in SCALAR_CHARS:
+                    self._error("Invalid character in JSON value")
+            elif state == "after_value":
+                if c == ",":
+                    self.state = "key_required"
+                elif c == "}":
+                    self.state = "done"
+                elif c not in WHITESPACE:
+                    self._error("Expected ',' or '}'")
+            elif state == "done":
+                if c not in WHITESPACE and c != "`":
+                    self._error("Unexpected text after the JSON object")
+            self.pos += 1
+        return members
+
+
+class StructuredOutputValidator:
+    """Validates top-level members of a JSON object against the fields of a pydantic model one at a time"""
+
+    def __init__(self, output_model: Type[BaseModel]):
+        self.output_model = output_model
+        self.forbid_extra = output_model.model_config.get("extra") == "forbid"
+        self.fields: Dict[str, Tuple[str, TypeAdapter]] = {}
+        for name, field in output_model.model_fields.items():
+            # Annotating with the FieldInfo keeps constraints such as ge, max_length and pattern
+            adapter = TypeAdapter(Annotated[field.annotation, field])
+            self.fields[field.alias or name] = (name, adapter)
+        self.values: Dict[str, Any] = {}
+
+    def validate_field(self, key: str, value: Any) -> Tuple[str, Any]:
+        """Validate one member and return the field name and validated value"""
+        if key not in self.fields:
+            if self.forbid_extra:
+                raise StructuredOutputError(f"Unexpected field {key!r} for {self.output_model.__name__}")
+            self.values[key] = value
+            return key, value
+        name, adapter = self.fields[key]
+        try:
+            validated = adapter.validate_python(value)
+        except ValidationError as e:
+            raise StructuredOutputError(f"Invalid value for {self.output_model.__name__}.{name}: {e}")
+        self.values[key] = value
+        return name, validated
+
+    def finish(self) -> BaseModel:
+        """Validate the whole object once the stream has ended"""
+        try:
+            return self.output_model.model_validate(self.values)
+        except ValidationError as e:
+            raise StructuredOutputError(f"Output does not match {self.output_model.__name__}: {e}")
+
+
+def json_schema_response_format(output_model: Type[BaseModel]) -> Dict:
+    """response_format asking the model for JSON matching output_model"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": output_model.__name__, "schema": output_model.model_json_schema()},
+    }
@@ -0,0 +1,100 @@
+import asyncio
+import importlib.util
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+HTTP_TIMEOUT = 300
+
+
+class HTTPTransport:
+    """Pooled HTTP transport shared by the clients that talk to a node.
+
+    Keeps a single httpx.AsyncClient with keep-alive connection pooling so that
+    repeated calls to the same node reuse TCP/TLS connections instead of opening
+    a new connection per request.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        timeout: float = HTTP_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            max_connections: Maximum number of concurrent connections in the pool
+            max_keepalive_connections: Maximum number of idle connections kept alive
+            keepalive_expiry: Seconds an idle connection is kept before being closed
+            http2: Whether to negotiate HTTP/2 (requires the h2 package)
+            timeout: Default request timeout in seconds
+            transport: Optional low-level httpx transport, e.g. httpx.MockTransport in tests
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the h2 package is not installed. Falling back to HTTP/1.1. Install with `pip install httpx[http2]`.")
+            http2 = False
+
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled client for the running event loop.
+
+        Pooled connections are bound to the event loop that opened them, so a new
+        client is created when the transport is used from a different loop (e.g.
+        across separate asyncio.run calls).
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Close all pooled connections"""
+        if self._client is not None and not self._client.is_closed:
+            if self._loop is asyncio.get_running_loop():
+                await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield the data payload of each server-sent event in a streaming response"""
+    data_lines = []
+    async for line in response.aiter_lines():
+        if line == "":
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+        elif line.startswith("data:"):
+            data = line[5:]
+            data_lines.append(data[1:] if data.startswith(" ") else data)
+    if data_lines:
+        yield "\n".join(data_lines)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import random
+from typing import Any, Dict, Optional, Tuple
+import uuid
+
+import websockets
+from websockets.exceptions import ConnectionClosed, InvalidHandshake, InvalidStatusCode
+
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+# Seconds to wait for a reply by default, the same as the gRPC run deadline
+REQUEST_TIMEOUT = 1800
+# Handshake statuses meaning the node has no session endpoint, as opposed to a transient failure
+UNSUPPORTED_STATUSES = (403, 404)
+
+
+class WebSocketSessionUnsupported(Exception):
+    """Raised when a node rejects the multiplexed session endpoint"""
+
+
+class WebSocketSession:
+    """Long-lived WebSocket connection to a node that multiplexes many requests.
+
+    Each request is wrapped in an envelope with a correlation ID,
+    {"id": ..., "action": ..., "data": ...}, and the node replies with
+    {"id": ..., "data": ...}. Replies are matched to waiting callers by ID, so many
+    requests can be in flight over one connection. Heartbeats use WebSocket
+    ping/pong frames, and the number of in-flight requests is bounded to apply
+    backpressure. A dropped connection fails the requests in flight and the next
+    request reconnects with exponential backoff. Only a 403 or 404 handshake marks
+    the endpoint as unsupported; other handshake failures are retried.
+    """
+
+    def __init__(
+        self,
+        node_url: str,
+        max_in_flight: int = 64,
+        ping_interval: float = 20.0,
+        ping_timeout: float = 20.0,
+        max_reconnect_attempts: int = 5,
+        max_reconnect_delay: float = 10.0,
+        request_timeout: float = REQUEST_TIMEOUT,
+    ):
+        """
+        Args:
+            node_url: Base WebSocket URL of the node, e.g. ws://localhost:7002
+            max_in_flight: Maximum number of requests awaiting a reply at once
+            ping_interval: Seconds between heartbeat pings
+            ping_timeout: Seconds to wait for a pong before the connection is considered dead
+            max_reconnect_attempts: Connection attempts before giving up on a request
+            max_reconnect_delay: Maximum delay in seconds between connection attempts
+            request_timeout: Seconds to wait for a reply when request() is not given a timeout
+        """
+        self.node_url = node_url
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.max_reconnect_delay = max_reconnect_delay
+        self.request_timeout = request_timeout
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._connect_lock = asyncio.Lock()
+        self._ws = None
+        self._reader = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and self._ws.open
+
+    async def request(self, action: str, data: Any, timeout: Optional[float] = None) -> Any:
+        """Send a request over the session and wait for the matching reply
+
+        Args:
+            action: Action the node should perform, e.g. agent/run
+            data: JSON serializable request payload
+            timeout: Seconds to wait for the reply, request_timeout by default
+        """
+        async with self._in_flight:
+            ws = await self._ensure_connected()
+            request_id = str(uuid.uuid4())
+            reply = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = reply
+            try:
+                await ws.send(json.dumps({"id": request_id, "action": action, "data": data}))
+                return await asyncio.wait_for(reply, timeout if timeout is not None else self.request_timeout)
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def _ensure_connected(self):
+        async with self._connect_lock:
+            if self.connected:
+                return self._ws
+
+            delay = 0.1
+            for attempt in range(1, self.max_reconnect_attempts + 1):
+                full_url = f"{self.node_url}/ws/session/{uuid.uuid4()}"
+                try:
+                    logger.info(f"Connecting WebSocket session: {full_url}")
+                    self._ws = await websockets.connect(
+                        full_url,
+                        ping_interval=self.ping_interval,
+                        ping_timeout=self.ping_timeout,
+                    )
+                    break
+                except InvalidStatusCode as e:
+                    if e.status_code in UNSUPPORTED_STATUSES:
+                        raise WebSocketSessionUnsupported(f"Node at {self.node_url} rejected the session endpoint: {e}")
+                    error = e
+                except (InvalidHandshake, OSError) as e:
+                    error = e
+                if attempt == self.max_reconnect_attempts:
+                    raise ConnectionError(f"Failed to connect WebSocket session to {self.node_url}: {error}")
+                logger.info(f"WebSocket session connection failed, retrying: {error}")
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+            self._reader = asyncio.create_task(self._read_replies(self._ws))
+            return self._ws
+
+    async def _read_replies(self, ws):
+        try:
+            async for message in ws:
+                try:
+                    reply = json.loads(message)
+                except json.JSONDecodeError:
+                    logger.error(f"Invalid message on WebSocket session: {message}")
+                    continue
+                waiter = self._pending.get(reply.get("id"))
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(reply.get("data"))
+        except ConnectionClosed as e:
+            logger.info(f"WebSocket session to {self.node_url} closed: {e}")
+        finally:
+            if self._ws is ws:
+                self._ws = None
+            for waiter in self._pending.values():
+                if not waiter.done():
+                    waiter.set_exception(ConnectionError(f"WebSocket session to {self.node_url} closed"))
+
+    async def close(self):
+        """Close the connection and fail any requests still in flight"""
+        ws = self._ws
+        if ws is not None:
+            await ws.close()
+        if self._reader is not None:
+            await self._reader
+            self._reader = None
+
+
+_sessions: Dict[str, Tuple[asyncio.AbstractEventLoop, WebSocketSession]] = {}
+_unsupported_urls = set()
+
+
+def get_ws_session(node_url: str) -> Optional[WebSocketSession]:
+    """Get the shared session for a node URL, or None if the node does not support sessions.
+
+    A session belongs to the event loop that created it, so a new one is created
+    when called from a different loop.
+    """
+    if node_url in _unsupported_urls:
+        return None
+    loop = asyncio.get_running_loop()
+    if node_url not in _sessions or _sessions[node_url][0] is not loop:
+        _sessions[node_url] = (loop, WebSocketSession(node_url))
+    return _sessions[node_url][1]
+
+
+def mark_ws_session_unsupported(node_url: str):
+    """Remember that a node only supports one WebSocket connection per message"""
+    _unsupported_urls.add(node_url)
+    _sessions.pop(node_url, None)
+
+
+async def close_ws_sessions():
+    """Close all sessions opened from the running event loop"""
+    loop = asyncio.get_running_loop()
+    for node_url in [node_url for node_url, (session_loop, _) in _sessions.items() if session_loop is loop]:
+        _, session = _sessions.pop(node_url)
+        await session.close()
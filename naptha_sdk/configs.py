@@ -28,15 +28,15 @@ async def load_node_metadata(deployment, node_url, is_subdeployment):
     return deployment
 
 async def check_register_user(deployment, user_id=None):
-    node = UserClient(deployment["node"])
-    user = await node.check_user(user_input={"public_key": user_id.split(":")[-1]})
-
-    if user['is_registered'] == True:
-        print("Found user...", user)
-    else:
-        print("No user found. Registering user...")
-        user = await node.register_user(user_input=user)
-        print(f"User registered: {user}.")
+    async with UserClient(deployment["node"]) as node:
+        user = await node.check_user(user_input={"public_key": user_id.split(":")[-1]})
+
+        if user['is_registered'] == True:
+            print("Found user...", user)
+        else:
+            print("No user found. Registering user...")
+            user = await node.register_user(user_input=user)
+            print(f"User registered: {user}.")
 
 async def load_module_config_data(module_type, deployment, load_persona_data=False):
 
@@ -1,48 +1,254 @@
 import json
-from typing import Dict, Union
-import httpx
-from httpx import HTTPStatusError, RemoteProtocolError
-from naptha_sdk.schemas import ChatCompletionRequest, NodeConfigUser, ModelResponse
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from pydantic import BaseModel
+from httpx import HTTPStatusError, RemoteProtocolError, Response
+from naptha_sdk.client.best_of_k import Scorer, best_of_k, expand_candidates, majority_vote
+from naptha_sdk.client.inference_cache import ResponseCache, is_deterministic, request_cache_key
+from naptha_sdk.client.prefix_affinity import PREFIX_HASH_HEADER, prefix_hashes
+from naptha_sdk.client.rate_limiter import PRIORITY_INTERACTIVE, InferenceRateLimiter, estimate_tokens, parse_retry_after
+from naptha_sdk.client.single_flight import SingleFlight
+from naptha_sdk.client.structured_output import IncrementalJSONObjectParser, StructuredOutputError, \
+    StructuredOutputValidator, json_schema_response_format
+from naptha_sdk.client.transport import HTTPTransport, iter_sse_data
+from naptha_sdk.schemas import BestOfKResult, ChatCompletionChunk, ChatCompletionRequest, ChatMessage, ChoiceDelta, Choices, \
+    ChunkChoices, NodeConfigUser, ModelResponse
 from naptha_sdk.utils import get_logger, node_to_url
 
 logger = get_logger(__name__)
 HTTP_TIMEOUT = 300
+T = TypeVar("T")
 
 
 class InferenceClient:
-    def __init__(self, node: NodeConfigUser):
+    def __init__(
+        self,
+        node: NodeConfigUser,
+        transport: Optional[HTTPTransport] = None,
+        cache: Optional[ResponseCache] = None,
+        coalesce: Optional[str] = "deterministic",
+        rate_limiter: Optional[InferenceRateLimiter] = None,
+        prefix_hints: bool = True,
+    ):
+        """
+        Args:
+            node: The node to connect to
+            transport: Shared HTTP transport. A new one is created if not given
+            cache: Response cache consulted for deterministic requests (temperature 0 or a fixed seed)
+            coalesce: Which identical concurrent requests share one call to the node. 'deterministic'
+                only shares deterministic requests, 'all' also shares sampled ones and None disables it
+            rate_limiter: Admission control applied before each request is sent to the node
+            prefix_hints: Send cumulative message prefix hashes in the X-Prefix-Hash header, so nodes
+                with KV caching can recognise a prefix they have already processed
+        """
+        if coalesce not in ("deterministic", "all", None):
+            raise ValueError("Invalid coalesce mode. Coalesce mode must be either 'deterministic', 'all' or None.")
         self.node = node
         self.node_url = node_to_url(node)
+        self.transport = transport if transport is not None else HTTPTransport()
+        self._owns_transport = transport is None
+        self.cache = cache
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.rate_limiter = rate_limiter
+        self.prefix_hints = prefix_hints
+        # Called with the duration of each completion sent to the node, excluding cache hits and admission waits
+        self.latency_listeners: List[Callable[[float], None]] = []
         
         self.access_token = None
         logger.info(f"Node URL: {self.node_url}")
 
-    async def run_inference(self, inference_input: Union[ChatCompletionRequest, Dict]) -> Dict:
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """Counts of calls sent to the node and of requests coalesced onto an identical call in flight"""
+        return self.single_flight.metrics
+
+    async def close(self):
+        """Close the HTTP transport if it is owned by this client"""
+        if self._owns_transport:
+            await self.transport.aclose()
+
+    async def run_inference(
+        self,
+        inference_input: Union[ChatCompletionRequest, Dict],
+        priority: int = PRIORITY_INTERACTIVE,
+        use_cache: bool = True
+    ) -> ModelResponse:
         """
         Run inference on a node
         
         Args:
             inference_input: The inference input to run inference on
+            priority: Admission priority when a rate limiter is set, lower values go first
+            use_cache: Whether the response may come from the cache or be shared with an identical request in flight
         """
         if isinstance(inference_input, dict):
             inference_input = ChatCompletionRequest(**inference_input)
 
+        deterministic = is_deterministic(inference_input)
+        cacheable = use_cache and self.cache is not None and not inference_input.stream and deterministic
+        if cacheable:
+            cached = await self.cache.lookup(inference_input)
+            if cached is not None:
+                return cached
+
+        async def call():
+            response = await self._post_inference(inference_input, priority)
+            if cacheable:
+                await self.cache.store(inference_input, response)
+            return response
+
+        if not use_cache or inference_input.stream or self.coalesce is None or (self.coalesce == "deterministic" and not deterministic):
+            return await call()
+        return await self.single_flight.do(request_cache_key(inference_input), call)
+
+    async def best_of_k(
+        self,
+        inference_input: Union[ChatCompletionRequest, Dict, List[Union[ChatCompletionRequest, Dict]]],
+        k: Optional[int] = None,
+        scorer: Scorer = majority_vote,
+        threshold: Optional[float] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> BestOfKResult:
+        """
+        Run k candidates concurrently on the node and return the best response
+
+        Candidates bypass the response cache and request coalescing, so each one is a
+        separate sample. Use InferenceRouter.best_of_k to spread them across nodes.
+
+        Args:
+            inference_input: One request to sample k times, or a list of candidate requests
+            k: Number of samples when a single request is given
+            scorer: Sync or async function taking the responses so far and returning (best index, confidence)
+            threshold: Confidence at which to return early and cancel the remaining candidates
+            priority: Admission priority when a rate limiter is set, lower values go first
+        """
+        candidates = expand_candidates(inference_input, k)
+        return await best_of_k(
+            lambda candidate: self.run_inference(candidate, priority, use_cache=False),
+            candidates, scorer, threshold
+        )
+
+    async def _post_inference(self, inference_input: ChatCompletionRequest, priority: int = PRIORITY_INTERACTIVE) -> ModelResponse:
+        async def send() -> ModelResponse:
+            start = time.monotonic()
+            response = await self._send_inference(inference_input)
+            for listener in self.latency_listeners:
+                listener(time.monotonic() - start)
+            return response
+
+        return await self._rate_limited(send, [inference_input], priority)
+
+    async def _rate_limited(self, send: Callable[[], Awaitable[T]], inference_inputs: List[ChatCompletionRequest], priority: int) -> T:
+        """
+        Send a request once the rate limiter admits it, retrying after 429 responses
+
+        Args:
+            send: Coroutine function sending the request, raising HTTPStatusError on error statuses
+            inference_inputs: The requests it carries, each admitted and charged separately
+            priority: Admission priority, lower values go first
+        """
+        if self.rate_limiter is None:
+            return await send()
+
+        models = list(dict.fromkeys(inference_input.model for inference_input in inference_inputs))
+        retries = 0
+        while True:
+            for inference_input in inference_inputs:
+                await self.rate_limiter.acquire(inference_input.model, estimate_tokens(inference_input), priority)
+            try:
+                response = await send()
+            except HTTPStatusError as e:
+                if e.response.status_code != 429:
+                    raise
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                for model in models:
+                    self.rate_limiter.record_throttled(model, retry_after)
+                if retries >= self.rate_limiter.max_retries:
+                    raise
+                retries += 1
+                continue
+            for model in models:
+                self.rate_limiter.record_success(model)
+            return response
+
+    def _prefix_headers(self, inference_input: ChatCompletionRequest) -> Dict[str, str]:
+        if not self.prefix_hints or not inference_input.messages:
+            return {}
+        return {PREFIX_HASH_HEADER: ",".join(prefix_hashes(inference_input.messages))}
+
+    async def _send_inference(self, inference_input: ChatCompletionRequest) -> ModelResponse:
         endpoint = f"{self.node_url}/inference/chat/completions"
 
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
+            client = self.transport.client
+            headers = {
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {self.access_token}',
+                **self._prefix_headers(inference_input),
+            }
+            response = await client.post(
+                endpoint,
+                json=inference_input.model_dump(),
+                headers=headers
+            )
+            logger.debug(f"Response: {response.text}")
+            response.raise_for_status()
+            return ModelResponse(**json.loads(response.text))
+        except HTTPStatusError as e:
+            logger.info(f"HTTP error occurred: {e}")
+            raise
+        except RemoteProtocolError as e:
+            error_msg = f"Inference failed to connect to the server at {self.node_url}. Please check if the server URL is correct and the server is running. Error details: {str(e)}"
+            logger.error(error_msg)
+            raise
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+            raise
+
+    async def run_inference_batch(
+        self,
+        inference_inputs: List[Union[ChatCompletionRequest, Dict]],
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> List[Union[ModelResponse, Exception]]:
+        """
+        Run several chat completions on a node in one request
+
+        Returns one entry per input, in order, holding either the ModelResponse or the
+        error the node reported for that input.
+
+        Args:
+            inference_inputs: The inference inputs to run inference on
+            priority: Admission priority when a rate limiter is set, lower values go first
+        """
+        inference_inputs = [
+            ChatCompletionRequest(**inference_input) if isinstance(inference_input, dict) else inference_input
+            for inference_input in inference_inputs
+        ]
+        endpoint = f"{self.node_url}/inference/chat/completions/batch"
+
+        async def send() -> Response:
+            response = await self.transport.client.post(
+                endpoint,
+                json={"requests": [inference_input.model_dump() for inference_input in inference_inputs]},
+                headers={
                     'Content-Type': 'application/json',
                     'Authorization': f'Bearer {self.access_token}',
                 }
-                response = await client.post(
-                    endpoint,
-                    json=inference_input.model_dump(),
-                    headers=headers
-                )
-                print("Response: ", response.text)
-                response.raise_for_status()
-                return ModelResponse(**json.loads(response.text))
+            )
+            response.raise_for_status()
+            return response
+
+        try:
+            response = await self._rate_limited(send, inference_inputs, priority)
+            results = json.loads(response.text)["responses"]
+            if len(results) != len(inference_inputs):
+                raise ValueError(f"Node returned {len(results)} responses for {len(inference_inputs)} requests")
+            return [
+                ModelResponse(**result["response"]) if result.get("response") is not None
+                else Exception(result.get("error", "Inference failed"))
+                for result in results
+            ]
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
             raise
@@ -50,8 +256,85 @@ class InferenceClient:
             error_msg = f"Inference failed to connect to the server at {self.node_url}. Please check if the server URL is correct and the server is running. Error details: {str(e)}"
             logger.error(error_msg)
             raise
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+
+    def stream_inference(self, inference_input: Union[ChatCompletionRequest, Dict]) -> "InferenceStream":
+        """
+        Run inference on a node and stream the completion as it is generated
+
+        Iterate over the returned stream to get ChatCompletionChunk deltas. Once the
+        stream is consumed, its response attribute holds the assembled ModelResponse,
+        including usage if the node reports it.
+
+        Args:
+            inference_input: The inference input to run inference on
+        """
+        if isinstance(inference_input, dict):
+            inference_input = ChatCompletionRequest(**inference_input)
+        stream_options = {"include_usage": True, **(inference_input.stream_options or {})}
+        inference_input = inference_input.model_copy(update={"stream": True, "stream_options": stream_options})
+        return InferenceStream(self, inference_input)
+
+    def stream_structured(self, inference_input: Union[ChatCompletionRequest, Dict], output_model: Type[BaseModel]) -> "StructuredStream":
+        """
+        Stream a JSON completion and validate it against a pydantic model field by field
+
+        Iterate over the returned stream to get (field name, validated value) pairs as
+        soon as each top-level field is complete. If the output stops being valid JSON
+        or a field fails validation, the stream is closed, which aborts generation, and
+        StructuredOutputError is raised. After iteration, result holds the validated model.
+
+        Args:
+            inference_input: The inference input to run inference on. If it has no response_format,
+                one asking for output_model's JSON schema is added
+            output_model: Pydantic model the output must match
+        """
+        if isinstance(inference_input, dict):
+            inference_input = ChatCompletionRequest(**inference_input)
+        if inference_input.response_format is None:
+            inference_input = inference_input.model_copy(update={"response_format": json_schema_response_format(output_model)})
+        return StructuredStream(self.stream_inference(inference_input), output_model)
+
+    async def _stream_chunks(self, inference_input: ChatCompletionRequest) -> AsyncIterator[ChatCompletionChunk]:
+        endpoint = f"{self.node_url}/inference/chat/completions"
+        client = self.transport.client
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+            'Authorization': f'Bearer {self.access_token}',
+            **self._prefix_headers(inference_input),
+        }
+
+        async def open_stream() -> Response:
+            response = await client.send(
+                client.build_request("POST", endpoint, json=inference_input.model_dump(), headers=headers),
+                stream=True
+            )
+            if response.status_code >= 400:
+                await response.aread()
+                await response.aclose()
+                response.raise_for_status()
+            return response
+
+        try:
+            response = await self._rate_limited(open_stream, [inference_input], PRIORITY_INTERACTIVE)
+            try:
+                if not response.headers.get("content-type", "").startswith("text/event-stream"):
+                    # Node does not stream, so the whole completion arrives as one chunk
+                    await response.aread()
+                    yield response_to_chunk(ModelResponse(**json.loads(response.text)))
+                    return
+                async for data in iter_sse_data(response):
+                    if data.strip() == "[DONE]":
+                        return
+                    yield ChatCompletionChunk(**json.loads(data))
+            finally:
+                await response.aclose()
+        except HTTPStatusError as e:
+            logger.info(f"HTTP error occurred: {e}")
+            raise
+        except RemoteProtocolError as e:
+            error_msg = f"Inference failed to connect to the server at {self.node_url}. Please check if the server URL is correct and the server is running. Error details: {str(e)}"
+            logger.error(error_msg)
             raise
 
     async def list_models(self, return_wildcard_routes: bool = False) -> Dict:
@@ -64,19 +347,19 @@ class InferenceClient:
         endpoint = f"{self.node_url}/inference/models"
         
         try:
-            async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-                headers = {
-                    'Authorization': f'Bearer {self.access_token}',
-                }
-                params = {"return_wildcard_routes": return_wildcard_routes}
+            client = self.transport.client
+            headers = {
+                'Authorization': f'Bearer {self.access_token}',
+            }
+            params = {"return_wildcard_routes": return_wildcard_routes}
                 
-                response = await client.get(
-                    endpoint,
-                    params=params,
-                    headers=headers
-                )
-                response.raise_for_status()
-                return json.loads(response.text)
+            response = await client.get(
+                endpoint,
+                params=params,
+                headers=headers
+            )
+            response.raise_for_status()
+            return json.loads(response.text)
         except HTTPStatusError as e:
             logger.info(f"HTTP error occurred: {e}")
             raise
@@ -86,4 +369,130 @@ class InferenceClient:
             raise
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
-            raise
\ No newline at end of file
+            raise
+
+
+class InferenceStream:
+    """Async iterator over the chunks of a streamed chat completion.
+
+    The chunks are also accumulated, so after iteration response holds the full
+    ModelResponse and time_to_first_token the seconds until the first content arrived.
+    """
+
+    def __init__(self, client: InferenceClient, inference_input: ChatCompletionRequest):
+        self.client = client
+        self.inference_input = inference_input
+        self.response: Optional[ModelResponse] = None
+        self.time_to_first_token: Optional[float] = None
+        self._chunks: List[ChatCompletionChunk] = []
+        self._iterator = None
+
+    def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+
+    async def _iterate(self) -> AsyncIterator[ChatCompletionChunk]:
+        start = time.monotonic()
+        async for chunk in self.client._stream_chunks(self.inference_input):
+            if self.time_to_first_token is None and any(choice.delta.content for choice in chunk.choices):
+                self.time_to_first_token = time.monotonic() - start
+            self._chunks.append(chunk)
+            yield chunk
+        self.response = assemble_response(self._chunks)
+
+    async def collect(self) -> ModelResponse:
+        """Consume the rest of the stream and return the assembled response"""
+        async for _ in self:
+            pass
+        return self.response
+
+    async def aclose(self):
+        """Stop the stream early and release the connection"""
+        if self._iterator is not None:
+            await self._iterator.aclose()
+
+
+class StructuredStream:
+    """Async iterator over the validated top-level fields of a streamed JSON completion"""
+
+    def __init__(self, stream: InferenceStream, output_model: Type[BaseModel]):
+        self.stream = stream
+        self.output_model = output_model
+        self.result: Optional[BaseModel] = None
+        self._iterator = None
+
+    @property
+    def response(self) -> Optional[ModelResponse]:
+        return self.stream.response
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, Any]]:
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+
+    async def _iterate(self) -> AsyncIterator[Tuple[str, Any]]:
+        parser = IncrementalJSONObjectParser()
+        validator = StructuredOutputValidator(self.output_model)
+        try:
+            async for chunk in self.stream:
+                content = "".join(choice.delta.content or "" for choice in chunk.choices if choice.index == 0)
+                for key, value in parser.feed(content):
+                    yield validator.validate_field(key, value)
+        except StructuredOutputError:
+            await self.stream.aclose()
+            raise
+        if not parser.done:
+            raise StructuredOutputError(f"Stream ended before the JSON object was complete: {parser.buffer[-40:]!r}")
+        self.result = validator.finish()
+
+    async def collect(self) -> BaseModel:
+        """Consume the rest of the stream and return the validated model"""
+        async for _ in self:
+            pass
+        return self.result
+
+
+def assemble_response(chunks: List[ChatCompletionChunk]) -> ModelResponse:
+    """Merge streamed chunks into a single ModelResponse"""
+    if not chunks:
+        raise ValueError("Cannot assemble a response from an empty stream")
+    contents: Dict[int, List[str]] = {}
+    roles: Dict[int, str] = {}
+    finish_reasons: Dict[int, str] = {}
+    usage = None
+    for chunk in chunks:
+        usage = chunk.usage or usage
+        for choice in chunk.choices:
+            contents.setdefault(choice.index, [])
+            if choice.delta.role:
+                roles[choice.index] = choice.delta.role
+            if choice.delta.content:
+                contents[choice.index].append(choice.delta.content)
+            if choice.finish_reason:
+                finish_reasons[choice.index] = choice.finish_reason
+    choices = [
+        Choices(
+            message=ChatMessage(role=roles.get(index, "assistant"), content="".join(parts)),
+            finish_reason=finish_reasons.get(index, "stop"),
+            index=index,
+        )
+        for index, parts in sorted(contents.items())
+    ]
+    first = chunks[0]
+    return ModelResponse(id=first.id, choices=choices, created=first.created, model=first.model,
+                         object="chat.completion", usage=usage)
+
+
+def response_to_chunk(response: ModelResponse) -> ChatCompletionChunk:
+    """Wrap a complete ModelResponse as a single chunk"""
+    choices = [
+        ChunkChoices(
+            delta=ChoiceDelta(role=choice.message.role, content=choice.message.content),
+            finish_reason=choice.finish_reason,
+            index=choice.index,
+        )
+        for choice in response.choices
+    ]
+    return ChatCompletionChunk(id=response.id, choices=choices, created=response.created, model=response.model,
+                               usage=response.usage)
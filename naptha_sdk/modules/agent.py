@@ -7,8 +7,8 @@ logger = get_logger(__name__)
 class Agent:
     async def create(self, deployment: AgentDeployment, *args, **kwargs):
         logger.info(f"Creating agent on worker node {deployment.node}")
-        node = UserClient(deployment.node)
-        agent_deployment = await node.create(module_type="agent", module_request=deployment)
+        async with UserClient(deployment.node) as node:
+            agent_deployment = await node.create(module_type="agent", module_request=deployment)
         return agent_deployment
 
     async def run(self, module_run_input: AgentRunInput, *args, **kwargs):
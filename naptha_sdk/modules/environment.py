@@ -7,8 +7,8 @@ logger = logging.getLogger(__name__)
 class Environment:
     async def create(self, deployment: EnvironmentDeployment, *args, **kwargs):
         logger.info(f"Creating environment on worker node {deployment.node}")
-        node = UserClient(deployment.node)
-        environment_deployment = await node.create(module_type="environment", module_request=deployment)
+        async with UserClient(deployment.node) as node:
+            environment_deployment = await node.create(module_type="environment", module_request=deployment)
         return environment_deployment
 
     async def run(self, module_run_input: EnvironmentRunInput):
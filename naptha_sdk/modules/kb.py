@@ -7,8 +7,8 @@ logger = logging.getLogger(__name__)
 class KnowledgeBase:
     async def create(self, deployment: KBDeployment, *args, **kwargs):
         logger.info(f"Creating knowledge base on worker node {deployment.node}")
-        node = UserClient(deployment.node)
-        kb_deployment = await node.create(module_type="kb", module_request=deployment)
+        async with UserClient(deployment.node) as node:
+            kb_deployment = await node.create(module_type="kb", module_request=deployment)
         return kb_deployment
 
     async def run(self, module_run_input: KBRunInput, *args, **kwargs):
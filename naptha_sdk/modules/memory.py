@@ -8,8 +8,8 @@ logger = get_logger(__name__)
 class Memory:
     async def create(self, deployment: MemoryDeployment, *args, **kwargs):
         logger.info(f"Creating memory on worker node {deployment.node}")
-        node = UserClient(deployment.node)
-        memory_deployment = await node.create(module_type="memory", module_request=deployment)
+        async with UserClient(deployment.node) as node:
+            memory_deployment = await node.create(module_type="memory", module_request=deployment)
         return memory_deployment
 
     async def run(self, module_run_input: Union[AgentRun, MemoryRunInput]):
@@ -7,8 +7,8 @@ logger = get_logger(__name__)
 class Orchestrator:
     async def create(self, deployment: OrchestratorDeployment, *args, **kwargs):
         logger.info(f"Creating orchestrator on worker node {deployment.node}")
-        node = UserClient(deployment.node)
-        orchestrator_deployment = await node.create(module_type="orchestrator", module_request=deployment)
+        async with UserClient(deployment.node) as node:
+            orchestrator_deployment = await node.create(module_type="orchestrator", module_request=deployment)
         return orchestrator_deployment
 
     async def run(self, module_run_input: OrchestratorRunInput, *args, **kwargs):
@@ -8,8 +8,8 @@ logger = get_logger(__name__)
 class Tool:
     async def create(self, deployment: ToolDeployment, *args, **kwargs):
         logger.info(f"Creating tool on worker node {deployment.node}")
-        node = UserClient(deployment.node)
-        tool_deployment = await node.create(module_type="tool", module_request=deployment)
+        async with UserClient(deployment.node) as node:
+            tool_deployment = await node.create(module_type="tool", module_request=deployment)
         return tool_deployment
 
     async def run(self, module_run_input: Union[AgentRun, ToolRunInput]):
@@ -1,7 +1,8 @@
+from collections import OrderedDict
+import hashlib
 from enum import Enum
-from typing import Dict, List, Optional, Union, Any
-from datetime import datetime
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Tuple, Union, Any
+from pydantic import BaseModel, ConfigDict, Field
 from naptha_sdk.storage.schemas import StorageConfig
 
 class User(BaseModel):
@@ -85,11 +86,7 @@ class EnvironmentConfig(BaseModel):
     storage_config: Optional[StorageConfig] = None
 
     def model_dict(self):
-        if isinstance(self.storage_config, StorageConfig):
-            self.storage_config = self.storage_config.model_dict()
-        model_dict = self.dict()
-        model_dict['storage_config'] = self.storage_config
-        return model_dict
+        return self.model_dump(mode="json", serialize_as_any=True)
 
 class KBConfig(BaseModel):
     config_name: Optional[str] = None
@@ -97,11 +94,7 @@ class KBConfig(BaseModel):
     storage_config: Optional[StorageConfig] = None
 
     def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.storage_config, StorageConfig):
-            self.storage_config = self.storage_config.model_dict()
-        model_dict['storage_config'] = self.storage_config
-        return model_dict
+        return self.model_dump(mode="json", serialize_as_any=True)
 
 class MemoryConfig(BaseModel):
     config_name: Optional[str] = None
@@ -109,11 +102,7 @@ class MemoryConfig(BaseModel):
     storage_config: Optional[StorageConfig] = None
 
     def model_dict(self):
-        if isinstance(self.storage_config, StorageConfig):
-            self.storage_config = self.storage_config.model_dict()
-        model_dict = self.dict()
-        model_dict['storage_config'] = self.storage_config
-        return model_dict
+        return self.model_dump(mode="json", serialize_as_any=True)
 
 class DataGenerationConfig(BaseModel):
     save_outputs: Optional[bool] = None
@@ -137,10 +126,7 @@ class KBDeployment(BaseModel):
     config: Optional[KBConfig] = None
 
     def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.config, KBConfig):
-            model_dict['config'] = self.config.model_dict()
-        return model_dict
+        return self.model_dump(mode="json", serialize_as_any=True)
 
 class MemoryDeployment(BaseModel):
     node: Union[NodeConfig, NodeConfigUser, Dict]
@@ -149,10 +135,7 @@ class MemoryDeployment(BaseModel):
     config: Optional[MemoryConfig] = None
 
     def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.config, MemoryConfig):
-            model_dict['config'] = self.config.model_dict()
-        return model_dict
+        return self.model_dump(mode="json", serialize_as_any=True)
 
 class EnvironmentDeployment(BaseModel):
     node: Union[NodeConfig, NodeConfigUser, Dict]
@@ -193,12 +176,72 @@ class DockerParams(BaseModel):
     save_location: str = "node"
 
     def model_dict(self):
-        model_dict = self.dict()
-        for key, value in model_dict.items():
-            if isinstance(value, datetime):
-                model_dict[key] = value.isoformat()
+        return self.model_dump(mode="json", serialize_as_any=True)
+
+DEPLOYMENT_CACHE_SIZE = 128
+_deployment_cache: "OrderedDict[int, Tuple[BaseModel, Dict[bool, Union[Dict, str]]]]" = OrderedDict()
+
+def serialize_deployment(deployment: BaseModel, cache: bool = False, as_json: bool = False) -> Union[Dict, str]:
+    """Serialize a deployment tree in a single pass, to a JSON-compatible dict or a JSON string.
+
+    With cache=True the result is kept per deployment object and reused on the next
+    call, so only use it for deployments that are not modified after the first run.
+    A cached dict is shared and must not be mutated.
+    """
+    def serialize():
+        if as_json:
+            return deployment.model_dump_json(serialize_as_any=True)
+        return deployment.model_dump(mode="json", serialize_as_any=True)
+
+    if not cache:
+        return serialize()
+    cached = _deployment_cache.get(id(deployment))
+    if cached is None or cached[0] is not deployment:
+        cached = (deployment, {})
+        _deployment_cache[id(deployment)] = cached
+        if len(_deployment_cache) > DEPLOYMENT_CACHE_SIZE:
+            _deployment_cache.popitem(last=False)
+    _deployment_cache.move_to_end(id(deployment))
+    if as_json not in cached[1]:
+        cached[1][as_json] = serialize()
+    return cached[1][as_json]
+
+def deployment_hash(deployment: BaseModel, cache: bool = False, deployment_json: Optional[str] = None) -> str:
+    """Content hash of a deployment, used to refer to a deployment a node already holds.
+
+    Pass deployment_json when the deployment has already been serialized for a request body.
+    """
+    if deployment_json is None:
+        deployment_json = serialize_deployment(deployment, cache=cache, as_json=True)
+    return hashlib.sha256(deployment_json.encode()).hexdigest()
+
+class BaseRunInput(BaseModel):
+    def model_dict(self, cache_deployment: bool = False) -> Dict:
+        """Serialize the run input to a JSON-compatible dict for sending to a node.
+
+        Args:
+            cache_deployment: Reuse the serialized deployment from a previous call with the same deployment object
+        """
+        model_dict = self.model_dump(mode="json", serialize_as_any=True, exclude={"deployment"})
+        model_dict["deployment"] = serialize_deployment(self.deployment, cache=cache_deployment)
         return model_dict
 
+    def model_json(self, cache_deployment: bool = False, include_deployment: bool = True, deployment_json: Optional[str] = None) -> str:
+        """Serialize the run input straight to a JSON string, skipping the intermediate dict.
+
+        Args:
+            cache_deployment: Reuse the serialized deployment from a previous call with the same deployment object
+            include_deployment: Whether to embed the deployment, or leave it out when the node holds it by hash
+            deployment_json: The deployment already serialized with serialize_deployment, to avoid doing it twice
+        """
+        model_json = self.model_dump_json(serialize_as_any=True, exclude={"deployment"})
+        if not include_deployment:
+            return model_json
+        if deployment_json is None:
+            deployment_json = serialize_deployment(self.deployment, cache=cache_deployment, as_json=True)
+        separator = "," if model_json != "{}" else ""
+        return f'{model_json[:-1]}{separator}"deployment":{deployment_json}}}'
+
 class AgentRun(BaseModel):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
@@ -219,17 +262,9 @@ class AgentRun(BaseModel):
     signature: str
 
     def model_dict(self):
-        model_dict = self.dict()
-        for key, value in model_dict.items():
-            if isinstance(value, datetime):
-                model_dict[key] = value.isoformat()
-        for i, orchestrator_run in enumerate(model_dict['orchestrator_runs']):
-            for key, value in orchestrator_run.items():
-                if isinstance(value, datetime):
-                    model_dict['orchestrator_runs'][i][key] = value.isoformat()
-        return model_dict
+        return self.model_dump(mode="json", serialize_as_any=True)
 
-class AgentRunInput(BaseModel):
+class AgentRunInput(BaseRunInput):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
     deployment: AgentDeployment
@@ -239,28 +274,14 @@ class AgentRunInput(BaseModel):
     orchestrator_runs: List['OrchestratorRun'] = []
     signature: str
 
-    def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.deployment.config, BaseModel):
-            config = self.deployment.config.model_dump()
-            model_dict['deployment']['config'] = config
-        return model_dict
-
 
-class ToolRunInput(BaseModel):
+class ToolRunInput(BaseRunInput):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
     deployment: ToolDeployment
     agent_run: Optional[AgentRun] = None
     signature: str
 
-    def model_dict(self):
-        if isinstance(self.inputs, BaseModel):
-            self.inputs = self.inputs.model_dump()
-        model_dict = self.dict()
-        model_dict['inputs'] = self.inputs
-        return model_dict
-
 class ToolRun(BaseModel):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
@@ -277,16 +298,12 @@ class ToolRun(BaseModel):
     duration: Optional[float] = None
     signature: str
 
-class OrchestratorRunInput(BaseModel):
+class OrchestratorRunInput(BaseRunInput):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
     deployment: OrchestratorDeployment
     signature: str
 
-    def model_dict(self):
-        model_dict = self.dict()
-        return model_dict
-
 class OrchestratorRun(BaseModel):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
@@ -304,17 +321,13 @@ class OrchestratorRun(BaseModel):
     input_schema_ipfs_hash: Optional[str] = None
     signature: str
 
-class EnvironmentRunInput(BaseModel):
+class EnvironmentRunInput(BaseRunInput):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
     deployment: EnvironmentDeployment
     orchestrator_runs: List['OrchestratorRun'] = []
     signature: str
 
-    def model_dict(self):
-        model_dict = self.dict()
-        return model_dict
-
 class EnvironmentRun(BaseModel):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
@@ -332,19 +345,13 @@ class EnvironmentRun(BaseModel):
     input_schema_ipfs_hash: Optional[str] = None
     signature: str
 
-class KBRunInput(BaseModel):
+class KBRunInput(BaseRunInput):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
     deployment: KBDeployment
     orchestrator_runs: List['OrchestratorRun'] = []
     signature: str
 
-    def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.deployment, KBDeployment):
-            model_dict['deployment'] = self.deployment.model_dict()
-        return model_dict
-
 class KBRun(BaseModel):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
@@ -361,19 +368,13 @@ class KBRun(BaseModel):
     duration: Optional[float] = None
     signature: str
 
-class MemoryRunInput(BaseModel):
+class MemoryRunInput(BaseRunInput):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
     deployment: MemoryDeployment
     orchestrator_runs: List['OrchestratorRun'] = []
     signature: str
 
-    def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.deployment, MemoryDeployment):
-            model_dict['deployment'] = self.deployment.model_dict()
-        return model_dict
-
 class MemoryRun(BaseModel):
     consumer_id: str
     inputs: Optional[Union[Dict, BaseModel, DockerParams]] = None
@@ -390,6 +391,39 @@ class MemoryRun(BaseModel):
     duration: Optional[float] = None
     signature: str
 
+class ModuleRunDelta(BaseModel):
+    """Incremental update to a module run pushed or returned by a node"""
+    id: str
+    status: Optional[str] = None
+    error: Optional[bool] = None
+    error_message: Optional[str] = None
+    results: list[Optional[str]] = []
+    results_offset: Optional[int] = None
+    start_processing_time: Optional[str] = None
+    completed_time: Optional[str] = None
+    duration: Optional[float] = None
+
+    def apply(self, module_run):
+        """Return a copy of module_run with this delta applied.
+
+        New results are appended, or written from results_offset onwards when the
+        node sends an offset.
+        """
+        update = self.model_dump(exclude={"id", "results", "results_offset"}, exclude_none=True)
+        if self.results:
+            offset = len(module_run.results) if self.results_offset is None else self.results_offset
+            update["results"] = module_run.results[:offset] + self.results
+        return module_run.model_copy(update=update)
+
+class ModuleRunResult(BaseModel):
+    """Outcome of a single run submitted through UserClient.run_many"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    run_input: Any = None
+    run: Optional[Any] = None
+    error: Optional[Exception] = None
+
 class ChatMessage(BaseModel):
     role: str
     content: str
@@ -417,12 +451,43 @@ class Choices(BaseModel):
     finish_reason: str
     index: int
 
+class Usage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
 class ModelResponse(BaseModel):
     id: str
     choices: List[Choices]
     created: int
     model: str
     object: str
+    usage: Optional[Usage] = None
+
+class BestOfKResult(BaseModel):
+    response: ModelResponse
+    index: int
+    confidence: float
+    responses: List[Optional[ModelResponse]]
+    completed: int
+    errors: int = 0
+
+class ChoiceDelta(BaseModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+class ChunkChoices(BaseModel):
+    delta: ChoiceDelta
+    finish_reason: Optional[str] = None
+    index: int = 0
+
+class ChatCompletionChunk(BaseModel):
+    id: str
+    choices: List[ChunkChoices] = []
+    created: int
+    model: str
+    object: str = "chat.completion.chunk"
+    usage: Optional[Usage] = None
 
 class SecretInput(BaseModel):
     user_id: str
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+import copy
+import json
+import time
+from typing import Any, Dict, Optional
+
+from naptha_sdk.storage.schemas import StorageLocation, StorageType
+from naptha_sdk.utils import get_logger
+
+logger = get_logger(__name__)
+
+STORAGE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def value_size(value: Any) -> int:
+    """Approximate memory cost of a cached read result, in bytes"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+
+def is_immutable(location: StorageLocation) -> bool:
+    """Whether a location is content addressed, so its content can never change"""
+    return location.storage_type == StorageType.IPFS and not location.path.lstrip("/").startswith("ipns")
+
+
+class StorageCacheEntry:
+    def __init__(self, value: Any, size: int, etag: Optional[str], immutable: bool):
+        self.value = value
+        self.size = size
+        self.etag = etag
+        self.immutable = immutable
+        self.stored_at = time.monotonic()
+
+
+class StorageCache:
+    """Read-through cache of storage reads, bounded by bytes with LRU eviction.
+
+    Entries are keyed by the location URI and the read options. IPFS objects are
+    content addressed and kept until evicted. Filesystem and database reads are
+    served for ttl seconds and then revalidated with the node's ETag, so an
+    unchanged object costs a 304 with no body. StorageClient drops the entries of
+    a location whenever it writes to or deletes from it.
+    """
+
+    def __init__(self, max_bytes: int = STORAGE_CACHE_BYTES, ttl: float = 30.0):
+        """
+        Args:
+            max_bytes: Approximate total size of cached results before the least recently used are evicted
+            ttl: Seconds a filesystem or database read is served before it is revalidated
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: "OrderedDict[str, StorageCacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(location: StorageLocation, options: Dict[str, Any]) -> str:
+        return f"{location.uri}?{json.dumps(options, sort_keys=True, default=str)}"
+
+    def get(self, key: str) -> Optional[StorageCacheEntry]:
+        """Cached entry for key, fresh or stale, or None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def is_fresh(self, entry: StorageCacheEntry) -> bool:
+        return entry.immutable or time.monotonic() - entry.stored_at <= self.ttl
+
+    def hit(self, entry: StorageCacheEntry, revalidated: bool = False) -> Any:
+        """Count a hit and return a copy of the cached value, so callers cannot change the cache"""
+        self.hits += 1
+        if revalidated:
+            self.revalidations += 1
+            entry.stored_at = time.monotonic()
+        return entry.value if isinstance(entry.value, bytes) else copy.deepcopy(entry.value)
+
+    def set(self, key: str, location: StorageLocation, value: Any, etag: Optional[str] = None):
+        self._remove(key)
+        size = value_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = StorageCacheEntry(copy.deepcopy(value), size, etag, is_immutable(location))
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def invalidate(self, location: StorageLocation):
+        """Drop every cached read of a location and of the paths below it"""
+        prefix = location.uri.rstrip("/")
+        stale = [key for key in self._entries if key.startswith(prefix) and key[len(prefix)] in "?/"]
+        for key in stale:
+            self._remove(key)
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached reads of {location.uri}")
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.size,
+        }
@@ -97,10 +97,7 @@ class BaseStorageRequest(BaseModel):
     options: Union[Dict[str, Any], DatabaseReadOptions] = Field(default_factory=dict)
 
     def model_dict(self):
-        model_dict = self.dict()
-        if isinstance(self.options, BaseModel):
-            options = self.options.model_dump()
-            model_dict['options'] = options
+        model_dict = self.model_dump()
         model_dict['storage_type'] = self.storage_type.value
         model_dict['request_type'] = self.request_type.value
         return model_dict
@@ -133,6 +130,21 @@ class SearchStorageRequest(BaseStorageRequest):
     query_type: str = "text"
     limit: Optional[int] = None
 
+class BulkOperation(str, Enum):
+    CREATE = "bulk_create"
+    UPDATE = "bulk_update"
+    DELETE = "bulk_delete"
+
+class BulkRowError(BaseModel):
+    index: int
+    error: str
+
+class BulkOperationResult(BaseModel):
+    """Outcome of a bulk database operation. Row indexes count from the first row sent"""
+    succeeded: int = 0
+    failed: int = 0
+    errors: List[BulkRowError] = Field(default_factory=list)
+
 class StorageConfig(BaseModel):
     storage_type: StorageType
     path: str
@@ -140,6 +152,4 @@ class StorageConfig(BaseModel):
     options: Dict[str, Any] = Field(default_factory=dict)
 
     def model_dict(self):
-        model_dict = self.dict()
-        model_dict['storage_type'] = self.storage_type.value
-        return model_dict
\ No newline at end of file
+        return self.model_dump(mode="json")
\ No newline at end of file
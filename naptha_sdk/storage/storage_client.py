@@ -1,13 +1,25 @@
+import asyncio
+from contextlib import asynccontextmanager
+import hashlib
 import httpx
+import importlib.util
+import io
 import json
+import os
+import re
 from pydantic import BaseModel
-from typing import Union, Dict, Any, Optional, List, BinaryIO
+from typing import AsyncIterable, AsyncIterator, Iterable, Tuple, Union, Dict, Any, Optional, List, BinaryIO
+from naptha_sdk.client.transport import HTTPTransport
 from naptha_sdk.schemas import NodeConfigUser
+from naptha_sdk.storage.cache import StorageCache
 from naptha_sdk.storage.schemas import (
     StorageLocation,
     StorageType,
     StorageObject,
     BaseStorageRequest,
+    BulkOperation,
+    BulkOperationResult,
+    BulkRowError,
     CreateStorageRequest,
     ReadStorageRequest,
     UpdateStorageRequest,
@@ -18,16 +30,48 @@ from naptha_sdk.storage.schemas import (
 from naptha_sdk.utils import get_logger, node_to_url
 
 HTTP_TIMEOUT = 300
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+# Files larger than this are sent with the chunked upload protocol by execute()
+CHUNKED_UPLOAD_THRESHOLD = 64 * 1024 * 1024
+CHECKSUM_HEADER = "X-Checksum-SHA256"
+UNSUPPORTED_STATUSES = (404, 405, 501)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_SEGMENT_SIZE = 16 * 1024 * 1024
+BULK_BATCH_SIZE = 1000
+PAGE_SIZE = 500
+BULK_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "arrow": "application/vnd.apache.arrow.stream"}
 
 logger = get_logger(__name__)
 
 class StorageClient:
-    def __init__(self, node: NodeConfigUser):
+    def __init__(
+        self,
+        node: NodeConfigUser,
+        transport: Optional[HTTPTransport] = None,
+        chunked_upload_threshold: int = CHUNKED_UPLOAD_THRESHOLD,
+        cache: Optional[StorageCache] = None,
+    ):
+        """
+        Args:
+            node: Node to send storage requests to
+            transport: HTTP transport to use. A new one is created if not given
+            chunked_upload_threshold: File size from which execute() uses the chunked upload protocol
+            cache: Read-through cache for read requests, or None to always read from the node
+        """
         self.node = node
         self.node_url = node_to_url(node)
-        self.client = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+        self.transport = transport if transport is not None else HTTPTransport()
+        self._owns_transport = transport is None
+        self.chunked_upload_threshold = chunked_upload_threshold
+        self._chunked_uploads_supported = None
+        self._bulk_supported = None
+        self.cache = cache
         logger.info(f"Storage Provider URL: {self.node_url}")
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.transport.client
+
 
     async def _make_request(
         self,
@@ -93,6 +137,8 @@ class StorageClient:
                         "query_type": request.query_type,
                         "limit": request.limit
                     }
+                    if request.options:
+                        search_data["options"] = _options_dict(request.options)
                     response = await self.client.post(endpoint, json=search_data)
             
             if response:
@@ -111,11 +157,29 @@ class StorageClient:
 
     async def execute(self, request: BaseStorageRequest) -> Union[StorageObject, List[StorageObject], bool]:
         """Execute storage request and return appropriate response"""
+        if self.cache is not None and isinstance(request, (CreateStorageRequest, UpdateStorageRequest, DeleteStorageRequest)):
+            try:
+                return await self._execute(request)
+            finally:
+                self._invalidate(request.storage_type, request.path)
+        return await self._execute(request)
+
+    async def _execute(self, request: BaseStorageRequest) -> Union[StorageObject, List[StorageObject], bool]:
         files = None
         if isinstance(request, CreateStorageRequest) and request.file:
+            if self._use_chunked_upload(request):
+                try:
+                    return await self.upload_file(
+                        request.storage_type, request.path, request.file, data={**(request.data or {}), **(request.options or {})}
+                    )
+                except ChunkedUploadUnsupported:
+                    request.file.seek(0)
             files = {"file": request.file}
             
-        result = await self._make_request(request, files=files)
+        if self.cache is not None and isinstance(request, ReadStorageRequest):
+            result = await self._cached_read(request)
+        else:
+            result = await self._make_request(request, files=files)
 
         match request:
             case DeleteStorageRequest():
@@ -162,15 +226,649 @@ class StorageClient:
                     data=result
                 )
 
+    async def _cached_read(self, request: ReadStorageRequest) -> Any:
+        """Serve a read from the cache, revalidating stale entries with the node's ETag"""
+        location = StorageLocation(storage_type=request.storage_type, path=request.path)
+        options = _options_dict(request.options)
+        key = self.cache.key(location, options)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            return self.cache.hit(entry)
+
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+        params = {"options": json.dumps(options)} if options and request.storage_type == StorageType.DATABASE else None
+        try:
+            response = await self.client.get(self._read_endpoint(request), params=params, headers=headers)
+            if response.status_code == 304 and entry is not None:
+                return self.cache.hit(entry, revalidated=True)
+            response.raise_for_status()
+            result = response.json() if 'json' in response.headers.get('content-type', '') else response.content
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTP error occurred: {e.response.text}")
+            raise StorageError(f"HTTP error occurred: {str(e)}", status_code=e.response.status_code)
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Storage operation failed: {str(e)}")
+            raise StorageError(f"Storage operation failed: {str(e)}")
+        self.cache.misses += 1
+        self.cache.set(key, location, result, etag=response.headers.get("ETag"))
+        return result
+
+    def _invalidate(self, storage_type: StorageType, path: str):
+        if self.cache is not None:
+            self.cache.invalidate(StorageLocation(storage_type=storage_type, path=path))
+
+    def _read_endpoint(self, request: ReadStorageRequest) -> str:
+        return f"{self.node_url}/storage/{request.storage_type.value}/{request.request_type.value}/{request.path}"
+
+    async def read_stream(
+        self,
+        request: ReadStorageRequest,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Stream the bytes of a file or IPFS object without holding it in memory.
+
+        Args:
+            request: Read request for fs or ipfs storage
+            start: First byte to read, for a Range request
+            end: Last byte to read (inclusive), for a Range request
+            chunk_size: Size of the chunks yielded
+        """
+        headers = {}
+        if start is not None or end is not None:
+            headers["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+        async with self._open_stream(request, headers) as response:
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    @asynccontextmanager
+    async def _open_stream(
+        self, request: ReadStorageRequest, headers: Dict[str, str], accept_statuses: Tuple[int, ...] = ()
+    ) -> AsyncIterator[httpx.Response]:
+        try:
+            async with self.client.stream("GET", self._read_endpoint(request), headers=headers) as response:
+                if response.status_code >= 400 and response.status_code not in accept_statuses:
+                    await response.aread()
+                    logger.error(f"HTTP error occurred: {response.text}")
+                    raise StorageError(f"HTTP error occurred: {response.status_code} for {response.url}", status_code=response.status_code)
+                yield response
+        except httpx.TransportError as e:
+            logger.error(f"Storage operation failed: {str(e)}")
+            raise StorageError(f"Storage operation failed: {str(e)}")
+
+    async def read_to_file(
+        self,
+        request: ReadStorageRequest,
+        file_path: Union[str, os.PathLike],
+        segment_size: int = DOWNLOAD_SEGMENT_SIZE,
+        concurrency: int = 4,
+        chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    ) -> int:
+        """Download a file or IPFS object straight to disk and return its size in bytes.
+
+        The first segment is requested with a Range header. If the node answers with
+        206 Partial Content, the remaining segments are downloaded in parallel and
+        written at their offsets; otherwise the whole object is streamed in order.
+        When the node does not report the total size, segments are read one after
+        another until a short segment or a 416 response. A 416 for the first segment
+        with Content-Range 'bytes */0' means the object is empty. A segment that
+        arrives shorter than requested raises StorageError.
+
+        Args:
+            request: Read request for fs or ipfs storage
+            file_path: Path of the file to write
+            segment_size: Size of each segment downloaded in parallel
+            concurrency: Number of segments downloaded at once
+            chunk_size: Size of the chunks written to disk
+        """
+        with open(file_path, "wb") as file:
+            async with self._open_stream(request, {"Range": f"bytes=0-{segment_size - 1}"}, accept_statuses=(416,)) as response:
+                if response.status_code == 416:
+                    if response.headers.get("content-range", "").strip() != "bytes */0":
+                        raise StorageError(f"HTTP error occurred: 416 for {response.url}", status_code=416)
+                    await asyncio.to_thread(file.truncate, 0)
+                    return 0
+                partial = response.status_code == 206
+                total = content_range_total(response) if partial else None
+                written = await _write_stream(response, file, chunk_size)
+            if not partial:
+                return written
+            if total is None:
+                if written < segment_size:
+                    return written
+                return await self._read_ranges_in_order(request, file, written, segment_size, chunk_size)
+            _check_segment(written, 0, min(segment_size, total) - 1)
+            await asyncio.to_thread(file.truncate, total)
+
+        segments = iter(range(segment_size, total, segment_size))
+
+        async def worker():
+            with open(file_path, "r+b") as segment_file:
+                for start in segments:
+                    end = min(start + segment_size, total) - 1
+                    await asyncio.to_thread(segment_file.seek, start)
+                    async with self._open_stream(request, {"Range": f"bytes={start}-{end}"}) as segment:
+                        if segment.status_code != 206:
+                            raise StorageError(f"Node ignored the Range header for bytes {start}-{end}")
+                        _check_segment(await _write_stream(segment, segment_file, chunk_size), start, end)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return total
+
+    async def _read_ranges_in_order(
+        self, request: ReadStorageRequest, file: BinaryIO, start: int, segment_size: int, chunk_size: int
+    ) -> int:
+        """Read segments from start until the object ends, for nodes that do not report its size"""
+        while True:
+            end = start + segment_size - 1
+            try:
+                async with self._open_stream(request, {"Range": f"bytes={start}-{end}"}) as segment:
+                    if segment.status_code != 206:
+                        raise StorageError(f"Node ignored the Range header for bytes {start}-{end}")
+                    written = await _write_stream(segment, file, chunk_size)
+            except StorageError as e:
+                if e.status_code == 416:
+                    return start
+                raise
+            start += written
+            if written < segment_size:
+                return start
+
+    async def paginate(
+        self,
+        request: Union[ListStorageRequest, SearchStorageRequest],
+        page_size: int = PAGE_SIZE,
+        prefetch: bool = True,
+    ) -> AsyncIterator[StorageObject]:
+        """Iterate over the results of a list or search request one page at a time.
+
+        Only one page is held in memory, plus the next one while it is prefetched, so
+        large tables can be scanned with bounded memory and the first rows arrive
+        after a single page. Pages follow the node's next_cursor when it returns one.
+        Otherwise, with order_by set, each page starts after the last order_by value
+        seen (keyset pagination, so order_by should be unique); nodes that ignore the
+        bound are detected and paged with limit/offset instead, as are requests
+        without order_by. The limit and offset of the request options bound the whole
+        scan, not each page.
+
+        Searches are only paged when the node returns a next_cursor. Nodes that ignore
+        the paging options, by returning more rows than asked for or the same page
+        twice, are read once without paging instead, skipping the rows already yielded.
+
+        Args:
+            request: List or search request
+            page_size: Number of rows requested per page
+            prefetch: Whether to request the next page while the current one is consumed
+        """
+        if not isinstance(request, (ListStorageRequest, SearchStorageRequest)):
+            raise ValueError("Invalid request type. Request type must be either list or search.")
+        options = _options_dict(request.options)
+        remaining = options.pop("limit", None)
+        if isinstance(request, SearchStorageRequest) and request.limit is not None:
+            remaining = request.limit
+        offset = options.pop("offset", None) or 0
+        order_by = options.get("order_by")
+        descending = options.get("order_direction") == "desc"
+        keyset = order_by is not None
+        after = cursor = None
+        limit = remaining
+        yielded = 0
+        previous_first = None
+
+        def page_options() -> Dict[str, Any]:
+            page = {**options, "limit": page_size if remaining is None else min(page_size, remaining)}
+            if cursor is not None:
+                page["cursor"] = cursor
+            elif keyset and after is not None:
+                page["after"] = after
+            else:
+                page["offset"] = offset
+            return page
+
+        async def fetch(page: Dict[str, Any]) -> Tuple[List[Any], bool, Optional[Any]]:
+            update = {"options": page}
+            if isinstance(request, SearchStorageRequest):
+                update["limit"] = page["limit"]
+            result = await self._make_request(request.model_copy(update=update))
+            if isinstance(result, dict):
+                return result.get("items", []), "next_cursor" in result, result.get("next_cursor")
+            return result or [], False, None
+
+        current = page_options()
+        task = asyncio.create_task(fetch(current))
+        try:
+            while task is not None:
+                items, paged_by_cursor, next_cursor = await task
+                task = None
+                if "after" in current and items and not _follows(items[0], order_by, after, descending):
+                    logger.info(f"Node at {self.node_url} ignored the keyset bound on {order_by}. Paging with offsets.")
+                    keyset = False
+                    current = page_options()
+                    task = asyncio.create_task(fetch(current))
+                    continue
+                if len(items) > current["limit"] and yielded == 0:
+                    logger.info(f"Node at {self.node_url} ignored the page size. Using its whole response.")
+                    for storage_object in _storage_objects(request, items[:limit]):
+                        yield storage_object
+                    return
+                unpaged = (
+                    len(items) > current["limit"]
+                    or (items and yielded and items[0] == previous_first)
+                    or (paged_by_cursor and next_cursor is not None and next_cursor == current.get("cursor"))
+                    or (isinstance(request, SearchStorageRequest) and not paged_by_cursor and len(items) >= current["limit"])
+                )
+                if unpaged:
+                    logger.info(f"Node at {self.node_url} does not page {request.request_type.value} results. Reading them in one response.")
+                    async for storage_object in self._read_unpaginated(request, skip=yielded, limit=limit):
+                        yield storage_object
+                    return
+                previous_first = items[0] if items else None
+                offset += len(items)
+                if remaining is not None:
+                    remaining -= len(items)
+                cursor = next_cursor
+                if keyset and items and isinstance(items[-1], dict):
+                    after = items[-1].get(order_by)
+                more = next_cursor is not None if paged_by_cursor else len(items) >= current["limit"]
+                if more and (remaining is None or remaining > 0):
+                    current = page_options()
+                    if prefetch:
+                        task = asyncio.create_task(fetch(current))
+                for storage_object in _storage_objects(request, items):
+                    yield storage_object
+                yielded += len(items)
+                if task is None and more and not prefetch and (remaining is None or remaining > 0):
+                    task = asyncio.create_task(fetch(current))
+        finally:
+            if task is not None:
+                task.cancel()
+
+    async def _read_unpaginated(
+        self, request: Union[ListStorageRequest, SearchStorageRequest], skip: int, limit: Optional[int]
+    ) -> AsyncIterator[StorageObject]:
+        result = await self._make_request(request)
+        items = result.get("items", []) if isinstance(result, dict) else (result or [])
+        for storage_object in _storage_objects(request, items[skip:limit]):
+            yield storage_object
+
+    async def bulk_create(self, path: str, rows: Union[Iterable[Dict], AsyncIterable[Dict]], **kwargs) -> BulkOperationResult:
+        """Insert rows into a database table in batches. See bulk_operation for the options"""
+        return await self.bulk_operation(BulkOperation.CREATE, path, rows, **kwargs)
+
+    async def bulk_update(self, path: str, updates: Union[Iterable[Dict], AsyncIterable[Dict]], **kwargs) -> BulkOperationResult:
+        """Update rows in batches. Each update is {"condition": {...}, "data": {...}}. See bulk_operation for the options"""
+        return await self.bulk_operation(BulkOperation.UPDATE, path, updates, **kwargs)
+
+    async def bulk_delete(self, path: str, conditions: Union[Iterable[Dict], AsyncIterable[Dict]], **kwargs) -> BulkOperationResult:
+        """Delete the rows matching each condition in batches. See bulk_operation for the options"""
+        return await self.bulk_operation(BulkOperation.DELETE, path, conditions, **kwargs)
+
+    async def bulk_operation(
+        self,
+        operation: BulkOperation,
+        path: str,
+        rows: Union[Iterable[Dict], AsyncIterable[Dict]],
+        batch_size: int = BULK_BATCH_SIZE,
+        concurrency: int = 4,
+        format: str = "ndjson",
+        row_concurrency: int = 16,
+    ) -> BulkOperationResult:
+        """Send rows to a database table in batches, several batches at a time.
+
+        Rows are consumed lazily, so at most concurrency batches are in memory. Each
+        batch is one request to /storage/db/{operation}/{path} with the rows encoded
+        as NDJSON or as an Arrow IPC stream, and the node reports errors per row.
+        Rows of a batch that fails as a whole are all reported as failed. Nodes
+        without bulk endpoints get one request per row instead.
+
+        Args:
+            operation: Bulk create, update or delete
+            path: Table to write to
+            rows: Rows to create, updates to apply or delete conditions, as a sync or async iterable
+            batch_size: Rows per request
+            concurrency: Number of batches in flight at once
+            format: Either 'ndjson' or 'arrow'. Arrow needs pyarrow installed
+            row_concurrency: Number of single-row requests in flight at once on nodes without bulk endpoints
+        """
+        if format not in BULK_CONTENT_TYPES:
+            raise ValueError("Invalid bulk format. Format must be either 'ndjson' or 'arrow'.")
+        if format == "arrow" and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("The arrow bulk format needs pyarrow. Install it with `pip install pyarrow`.")
+
+        result = BulkOperationResult()
+        pending = set()
+        row_slots = asyncio.Semaphore(row_concurrency)
+        try:
+            async for offset, batch in _batches(rows, batch_size):
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    _merge_bulk_results(result, done)
+                pending.add(asyncio.create_task(self._send_bulk_batch(operation, path, offset, batch, format, row_slots)))
+            if pending:
+                done, pending = await asyncio.wait(pending)
+                _merge_bulk_results(result, done)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+        finally:
+            self._invalidate(StorageType.DATABASE, path)
+        result.errors.sort(key=lambda error: error.index)
+        return result
+
+    async def _send_bulk_batch(
+        self, operation: BulkOperation, path: str, offset: int, batch: List[Dict], format: str, row_slots: asyncio.Semaphore
+    ) -> BulkOperationResult:
+        if self._bulk_supported is not False:
+            endpoint = f"{self.node_url}/storage/{StorageType.DATABASE.value}/{operation.value}/{path}"
+            try:
+                response = await self.client.post(
+                    endpoint,
+                    content=encode_rows(batch, format),
+                    headers={"Content-Type": BULK_CONTENT_TYPES[format]}
+                )
+                if response.status_code not in UNSUPPORTED_STATUSES:
+                    response.raise_for_status()
+                    self._bulk_supported = True
+                    body = response.json()
+                    errors = [BulkRowError(index=offset + error["index"], error=error["error"]) for error in body.get("errors", [])]
+                    return BulkOperationResult(succeeded=len(batch) - len(errors), failed=len(errors), errors=errors)
+                logger.info(f"Node at {self.node_url} does not support bulk operations. Sending one request per row.")
+                self._bulk_supported = False
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                logger.error(f"Bulk batch at row {offset} failed: {str(e)}")
+                errors = [BulkRowError(index=offset + index, error=str(e)) for index in range(len(batch))]
+                return BulkOperationResult(failed=len(batch), errors=errors)
+        return await self._send_rows(operation, path, offset, batch, row_slots)
+
+    async def _send_rows(
+        self, operation: BulkOperation, path: str, offset: int, batch: List[Dict], row_slots: asyncio.Semaphore
+    ) -> BulkOperationResult:
+        def row_request(row: Dict) -> BaseStorageRequest:
+            if operation == BulkOperation.CREATE:
+                return CreateStorageRequest(storage_type=StorageType.DATABASE, path=path, data=row)
+            if operation == BulkOperation.UPDATE:
+                return UpdateStorageRequest(storage_type=StorageType.DATABASE, path=path, data=row["data"], options={"condition": row.get("condition")})
+            return DeleteStorageRequest(storage_type=StorageType.DATABASE, path=path, condition=row)
+
+        async def send(row: Dict):
+            async with row_slots:
+                # Built inside the task so a malformed row fails only itself
+                return await self.execute(row_request(row))
+
+        outcomes = await asyncio.gather(*[send(row) for row in batch], return_exceptions=True)
+        errors = [
+            BulkRowError(index=offset + index, error=str(outcome))
+            for index, outcome in enumerate(outcomes)
+            if isinstance(outcome, Exception)
+        ]
+        return BulkOperationResult(succeeded=len(batch) - len(errors), failed=len(errors), errors=errors)
+
+    def _use_chunked_upload(self, request: CreateStorageRequest) -> bool:
+        if self._chunked_uploads_supported is False or request.storage_type == StorageType.DATABASE:
+            return False
+        try:
+            return file_size(request.file) > self.chunked_upload_threshold
+        except (OSError, ValueError):
+            return False
+
+    async def upload_file(
+        self,
+        storage_type: StorageType,
+        path: str,
+        file: Union[str, os.PathLike, BinaryIO],
+        data: Optional[Dict[str, Any]] = None,
+        part_size: int = UPLOAD_PART_SIZE,
+        concurrency: int = 4,
+        upload_id: Optional[str] = None,
+        max_part_retries: int = 3,
+    ) -> StorageObject:
+        """Upload a file in fixed-size parts that are sent in parallel and can be resumed.
+
+        The node is asked for an upload session, each part is sent with its SHA-256
+        checksum, and the session is completed once every part is stored. Only
+        concurrency parts are held in memory at a time. If a part keeps failing,
+        UploadInterrupted is raised with the session ID; pass it back as upload_id
+        to resume, and parts the node already holds are skipped.
+
+        Args:
+            storage_type: Either fs or ipfs
+            path: Path to store the file at
+            file: Path of the file or a seekable binary file object
+            data: Extra fields sent along with the file, as for CreateStorageRequest.data
+            part_size: Size of each part in bytes
+            concurrency: Number of parts uploaded at once
+            upload_id: Session ID of an interrupted upload to resume
+            max_part_retries: Attempts per part before the upload is interrupted
+        """
+        owns_file = isinstance(file, (str, os.PathLike))
+        file_obj = open(file, "rb") if owns_file else file
+        try:
+            size = file_size(file_obj)
+            num_parts = max((size + part_size - 1) // part_size, 1)
+            filename = os.path.basename(file if owns_file else getattr(file_obj, "name", path))
+            if upload_id is None:
+                upload_id = await self._start_upload(storage_type, path, size, part_size, filename, data or {})
+                stored = {}
+            else:
+                stored = await self.upload_status(upload_id)
+
+            read_lock = asyncio.Lock()
+            next_part = iter(range(num_parts))
+            checksums: Dict[int, str] = {}
+
+            async def read_part(part: int) -> bytes:
+                async with read_lock:
+                    def read():
+                        file_obj.seek(part * part_size)
+                        return file_obj.read(part_size)
+                    return await asyncio.to_thread(read)
+
+            async def worker():
+                for part in next_part:
+                    chunk = await read_part(part)
+                    checksum = hashlib.sha256(chunk).hexdigest()
+                    checksums[part] = checksum
+                    if stored.get(part) != checksum:
+                        await self._upload_part(upload_id, part, chunk, checksum, max_part_retries)
+
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, num_parts))]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                raise
+            result = await self._complete_upload(upload_id, [checksums[part] for part in range(num_parts)])
+        finally:
+            if owns_file:
+                file_obj.close()
+            self._invalidate(storage_type, path)
+
+        return StorageObject(location=StorageLocation(storage_type=storage_type, path=path), data=result)
+
+    async def _start_upload(self, storage_type: StorageType, path: str, size: int, part_size: int, filename: str, data: Dict) -> str:
+        endpoint = f"{self.node_url}/storage/{storage_type.value}/upload/{path}"
+        body = {"size": size, "part_size": part_size, "filename": filename, "data": json.dumps(data)}
+        try:
+            response = await self.client.post(endpoint, json=body)
+            if response.status_code in UNSUPPORTED_STATUSES:
+                self._chunked_uploads_supported = False
+                raise ChunkedUploadUnsupported(f"Node at {self.node_url} does not support chunked uploads")
+            response.raise_for_status()
+            self._chunked_uploads_supported = True
+            return response.json()["upload_id"]
+        except httpx.HTTPStatusError as e:
+            raise StorageError(f"Failed to start upload: {str(e)}", status_code=e.response.status_code)
+        except httpx.TransportError as e:
+            logger.error(f"Failed to start upload: {str(e)}")
+            raise StorageError(f"Failed to start upload: {str(e)}")
+
+    async def upload_status(self, upload_id: str) -> Dict[int, str]:
+        """Checksums of the parts the node holds for an upload session, by part number"""
+        try:
+            response = await self.client.get(f"{self.node_url}/storage/uploads/{upload_id}")
+            response.raise_for_status()
+            return {int(part): checksum for part, checksum in response.json()["parts"].items()}
+        except httpx.HTTPStatusError as e:
+            raise StorageError(f"Failed to get upload status: {str(e)}", status_code=e.response.status_code)
+        except httpx.TransportError as e:
+            logger.error(f"Failed to get upload status: {str(e)}")
+            raise StorageError(f"Failed to get upload status: {str(e)}")
+
+    async def _upload_part(self, upload_id: str, part: int, chunk: bytes, checksum: str, max_retries: int):
+        endpoint = f"{self.node_url}/storage/uploads/{upload_id}/parts/{part}"
+        delay = 0.5
+        for attempt in range(1, max_retries + 1):
+            try:
+                response = await self.client.put(
+                    endpoint,
+                    content=chunk,
+                    headers={CHECKSUM_HEADER: checksum, "Content-Type": "application/octet-stream"}
+                )
+                response.raise_for_status()
+                return
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and 400 <= e.response.status_code < 500 and e.response.status_code not in (408, 422, 429):
+                    raise StorageError(f"Upload of part {part} rejected: {str(e)}", status_code=e.response.status_code)
+                if attempt == max_retries:
+                    raise UploadInterrupted(upload_id, f"Upload of part {part} failed after {max_retries} attempts: {str(e)}")
+                logger.info(f"Upload of part {part} failed, retrying: {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def _complete_upload(self, upload_id: str, checksums: List[str]) -> Any:
+        try:
+            response = await self.client.post(
+                f"{self.node_url}/storage/uploads/{upload_id}/complete",
+                json={"parts": [{"part": part, "checksum": checksum} for part, checksum in enumerate(checksums)]}
+            )
+            response.raise_for_status()
+            return response.json() if 'json' in response.headers.get('content-type', '') else response.content
+        except httpx.HTTPStatusError as e:
+            raise StorageError(f"Failed to complete upload: {str(e)}", status_code=e.response.status_code)
+        except httpx.TransportError as e:
+            logger.error(f"Failed to complete upload: {str(e)}")
+            raise StorageError(f"Failed to complete upload: {str(e)}")
+
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        await self.close()
+
+    async def close(self):
+        """Close the HTTP transport if it is owned by this client"""
+        if self._owns_transport:
+            await self.transport.aclose()
 
 class StorageError(Exception):
     """Custom exception for storage operations"""
     def __init__(self, message: str, status_code: Optional[int] = None):
         self.message = message
         self.status_code = status_code
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class UploadInterrupted(StorageError):
+    """Raised when a chunked upload stops part way. Resume it by passing upload_id to upload_file"""
+    def __init__(self, upload_id: str, message: str):
+        self.upload_id = upload_id
+        super().__init__(message)
+
+class ChunkedUploadUnsupported(StorageError):
+    """Raised when a node has no chunked upload endpoint"""
+
+def file_size(file: BinaryIO) -> int:
+    """Size in bytes of a seekable file object, leaving its position unchanged"""
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END)
+    file.seek(position)
+    return size
+
+def content_range_total(response: httpx.Response) -> Optional[int]:
+    """Total object size from a Content-Range header such as 'bytes 0-99/1234'"""
+    match = re.fullmatch(r"bytes \d+-\d+/(\d+)", response.headers.get("content-range", ""))
+    return int(match.group(1)) if match else None
+
+async def _batches(rows: Union[Iterable[Dict], AsyncIterable[Dict]], batch_size: int) -> AsyncIterator[Tuple[int, List[Dict]]]:
+    """Group rows into lists of batch_size, yielding each with the index of its first row"""
+    batch, offset = [], 0
+    if not hasattr(rows, "__aiter__"):
+        rows = _aiter(rows)
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield offset, batch
+            offset += len(batch)
+            batch = []
+    if batch:
+        yield offset, batch
+
+async def _aiter(rows: Iterable[Dict]) -> AsyncIterator[Dict]:
+    for row in rows:
+        yield row
+
+def _merge_bulk_results(result: BulkOperationResult, tasks):
+    for task in tasks:
+        batch_result = task.result()
+        result.succeeded += batch_result.succeeded
+        result.failed += batch_result.failed
+        result.errors.extend(batch_result.errors)
+
+def encode_rows(rows: List[Dict], format: str = "ndjson") -> bytes:
+    """Encode rows as newline-delimited JSON or as an Arrow IPC stream"""
+    if format == "arrow":
+        import pyarrow as pa
+        table = pa.Table.from_pylist(rows)
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    return "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+
+def _options_dict(options: Union[Dict[str, Any], BaseModel, None]) -> Dict[str, Any]:
+    if isinstance(options, BaseModel):
+        return options.model_dump(exclude_none=True)
+    return dict(options or {})
+
+def _follows(row: Any, order_by: str, after: Any, descending: bool) -> bool:
+    """Whether row comes after the keyset bound, i.e. the node applied it"""
+    if not isinstance(row, dict) or order_by not in row:
+        return False
+    try:
+        return row[order_by] < after if descending else row[order_by] > after
+    except TypeError:
+        return False
+
+def _storage_objects(request: Union[ListStorageRequest, SearchStorageRequest], items: List[Any]) -> List[StorageObject]:
+    if isinstance(request, SearchStorageRequest):
+        return [
+            StorageObject(
+                location=StorageLocation(storage_type=request.storage_type, path=item.get("path", "")),
+                data=item.get("data"),
+                metadata=item.get("metadata") or {}
+            )
+            for item in items
+        ]
+    return [
+        StorageObject(location=StorageLocation(storage_type=request.storage_type, path=request.path), data=item)
+        for item in items
+    ]
+
+async def _write_stream(response: httpx.Response, file: BinaryIO, chunk_size: int) -> int:
+    written = 0
+    async for chunk in response.aiter_bytes(chunk_size):
+        await asyncio.to_thread(file.write, chunk)
+        written += len(chunk)
+    return written
+
+def _check_segment(written: int, start: int, end: int):
+    if written != end - start + 1:
+        raise StorageError(f"Expected {end - start + 1} bytes for bytes {start}-{end}, received {written}")
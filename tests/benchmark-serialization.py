@@ -0,0 +1,42 @@
+"""Micro-benchmark of run input serialization on large orchestrator deployment trees.
+
+The first two cases add the deep copy and the second JSON encoding that run_module_ws
+and the HTTP run requests used to do on top of model_dict, for comparison.
+
+Run from the repository root:
+
+    python tests/benchmark-serialization.py --agents 20 --runs 50
+"""
+import argparse
+from copy import deepcopy
+import json
+import timeit
+
+from naptha_sdk.schemas import serialize_deployment
+from test_schemas import orchestrator_run_input
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time run input serialization for an orchestrator deployment tree")
+    parser.add_argument("--agents", type=int, default=20, help="Number of agent sub-deployments")
+    parser.add_argument("--runs", type=int, default=50, help="Runs averaged per measurement")
+    args = parser.parse_args()
+
+    run_input = orchestrator_run_input(args.agents)
+    serialize_deployment(run_input.deployment, cache=True, as_json=True)
+
+    cases = {
+        "deepcopy + model_dict": lambda: deepcopy(run_input).model_dict(),
+        "model_dict + json.dumps": lambda: json.dumps(run_input.model_dict()),
+        "model_dict": lambda: run_input.model_dict(),
+        "model_json (http wire body)": lambda: run_input.model_json(),
+        "model_json, cached deployment": lambda: run_input.model_json(cache_deployment=True),
+    }
+    print(f"OrchestratorRunInput with {args.agents} agent sub-deployments, mean of {args.runs} runs")
+    for name, case in cases.items():
+        seconds = timeit.timeit(case, number=args.runs) / args.runs
+        print(f"  {name:<46} {seconds * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import asyncio
+
+import grpc
+import pytest
+
+from naptha_sdk.client.balancer import PortBalancer, is_connection_error
+
+
+def test_failing_port_is_ejected():
+    balancer = PortBalancer([7002, 7003], failure_threshold=2, ejection_time=60)
+
+    async def fail_on(port):
+        with pytest.raises(ConnectionRefusedError):
+            async with balancer.acquire(port):
+                raise ConnectionRefusedError()
+
+    asyncio.run(fail_on(7002))
+    asyncio.run(fail_on(7002))
+
+    assert balancer.healthy_ports() == [7003]
+    assert all(balancer.select() == 7003 for _ in range(20))
+
+
+def test_application_errors_do_not_eject():
+    balancer = PortBalancer([7002, 7003], failure_threshold=1)
+
+    async def fail_on(port):
+        with pytest.raises(ValueError):
+            async with balancer.acquire(port):
+                raise ValueError("bad input")
+
+    asyncio.run(fail_on(7002))
+
+    assert balancer.healthy_ports() == [7002, 7003]
+
+
+def test_prefers_port_with_fewer_outstanding_requests():
+    balancer = PortBalancer([7002, 7003], strategy="least_outstanding")
+    balancer.record_success(7002, 0.1)
+    balancer.record_success(7003, 0.1)
+    balancer.stats[7002].outstanding = 5
+
+    assert balancer.select() == 7003
+
+
+def test_only_unavailable_grpc_errors_count_as_connection_errors():
+    def rpc_error(code):
+        return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata())
+
+    assert is_connection_error(rpc_error(grpc.StatusCode.UNAVAILABLE))
+    assert is_connection_error(ConnectionRefusedError())
+    assert not is_connection_error(rpc_error(grpc.StatusCode.DEADLINE_EXCEEDED))
+    assert not is_connection_error(asyncio.TimeoutError())
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from naptha_sdk.client.best_of_k import best_of_k, majority_vote
+from naptha_sdk.client.inference_router import InferenceRouter
+from naptha_sdk.client.model_catalogue import ModelCatalogue
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.schemas import ModelResponse
+from naptha_sdk.utils import url_to_node
+
+
+def completion(content: str, model: str = "test-model") -> dict:
+    return {
+        "id": "1", "created": 1, "model": model, "object": "chat.completion",
+        "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": "stop", "index": 0}],
+    }
+
+
+REQUEST = {"model": "test-model", "messages": [{"role": "user", "content": "2+2?"}], "temperature": 0.7, "seed": 1}
+
+
+def test_majority_vote_confidence_counts_all_candidates():
+    responses = [ModelResponse(**completion("4")), None, ModelResponse(**completion(" 4 ")), ModelResponse(**completion("5"))]
+
+    assert majority_vote(responses) == (0, 0.5)
+
+
+def test_best_of_k_returns_early_and_cancels_slow_candidates():
+    answers = iter(["4", "4", "5", "4", "4"])
+    delays = iter([0.0, 0.0, 0.0, 1.0, 1.0])
+    cancelled = []
+
+    async def handler(request):
+        answer, delay = next(answers), next(delays)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(answer)
+            raise
+        return httpx.Response(200, json=completion(answer))
+
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=HTTPTransport(transport=httpx.MockTransport(handler)))
+
+    result = asyncio.run(client.best_of_k(REQUEST, k=5, threshold=0.4))
+
+    assert result.response.choices[0].message.content == "4"
+    assert result.confidence == 0.4
+    assert result.completed == 3
+    assert len(cancelled) == 2
+    assert client.metrics["coalesced"] == 0
+
+
+@pytest.mark.parametrize("candidates, k", [([], None), (REQUEST, 0)])
+def test_best_of_k_rejects_no_candidates(candidates, k):
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=HTTPTransport(transport=httpx.MockTransport(lambda request: None)))
+
+    with pytest.raises(ValueError):
+        asyncio.run(client.best_of_k(candidates, k=k))
+    with pytest.raises(ValueError):
+        asyncio.run(best_of_k(client.run_inference, []))
+
+
+def test_best_of_k_raises_the_error_when_every_candidate_fails():
+    client = InferenceClient(
+        url_to_node("http://localhost:7001"),
+        transport=HTTPTransport(transport=httpx.MockTransport(lambda request: httpx.Response(500, json={"detail": "boom"})))
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.best_of_k(REQUEST, k=3))
+
+
+def test_router_spreads_candidates_across_nodes():
+    hosts = []
+
+    async def handler(request):
+        if request.url.path == "/inference/models":
+            return httpx.Response(200, json={"data": [{"id": "test-model"}]})
+        hosts.append(request.url.host)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=completion("4"))
+
+    catalogue = ModelCatalogue(transport=HTTPTransport(transport=httpx.MockTransport(handler)))
+    for host in ("node-a", "node-b", "node-c"):
+        catalogue.add_node(url_to_node(f"http://{host}:7001"))
+    router = InferenceRouter(catalogue)
+
+    result = asyncio.run(router.best_of_k(REQUEST, k=6))
+
+    assert result.completed == 6
+    assert sorted(hosts.count(host) for host in ("node-a", "node-b", "node-c")) == [2, 2, 2]
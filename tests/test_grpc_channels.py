@@ -0,0 +1,87 @@
+import asyncio
+import socket
+
+import grpc
+
+from naptha_sdk.client.grpc_channels import GrpcChannelRegistry, grpc_channels
+from naptha_sdk.client.naptha import close_all
+from naptha_sdk.client.node import NodeClient
+from naptha_sdk.schemas import NodeConfig
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def test_channels_and_stubs_are_reused_per_address():
+    registry = GrpcChannelRegistry()
+
+    async def run():
+        first = registry.get_channel("localhost:7002"), registry.get_stub("localhost:7002")
+        again = registry.get_channel("localhost:7002"), registry.get_stub("localhost:7002")
+        other = registry.get_channel("localhost:7003")
+        await registry.close_all()
+        return first, again, other
+
+    first, again, other = asyncio.run(run())
+    assert first[0] is again[0] and first[1] is again[1]
+    assert other is not first[0]
+
+
+def test_channels_use_keepalive_options():
+    options = dict(GrpcChannelRegistry(keepalive_time_ms=5000, keepalive_timeout_ms=2000).options)
+
+    assert options["grpc.keepalive_time_ms"] == 5000
+    assert options["grpc.keepalive_timeout_ms"] == 2000
+    assert options["grpc.keepalive_permit_without_calls"] == 1
+
+
+def test_health_check_reports_whether_the_server_is_reachable():
+    registry = GrpcChannelRegistry()
+
+    async def run():
+        server = grpc.aio.server()
+        port = server.add_insecure_port("localhost:0")
+        await server.start()
+        try:
+            healthy = await registry.check_health(f"localhost:{port}", timeout=5)
+            unreachable = await registry.check_health(f"localhost:{unused_port()}", timeout=0.2)
+        finally:
+            await registry.close_all()
+            await server.stop(None)
+        return healthy, unreachable
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_close_shuts_down_channels_of_the_node_client():
+    port = unused_port()
+    config = NodeConfig(
+        id="node:test", owner="test", public_key="key", servers=[], models=[], docker_jobs=False,
+        node_communication_protocol="grpc", ports=[port]
+    )
+
+    async def run():
+        client = NodeClient(config)
+        channel = grpc_channels.get_channel(f"localhost:{port}")
+        await client.close()
+        reused = grpc_channels.get_channel(f"localhost:{port}") is channel
+        await client.close()
+        return channel.get_state(), reused
+
+    state, reused = asyncio.run(run())
+    assert state == grpc.ChannelConnectivity.SHUTDOWN
+    assert not reused
+
+
+def test_close_all_shuts_down_shared_channels():
+    port = unused_port()
+
+    async def run():
+        channel = grpc_channels.get_channel(f"localhost:{port}")
+        await close_all()
+        return channel.get_state()
+
+    assert asyncio.run(run()) == grpc.ChannelConnectivity.SHUTDOWN
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+
+from naptha_sdk.client.inference_batcher import InferenceBatcher
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.utils import url_to_node
+
+
+def completion(request: dict) -> dict:
+    prompt = request["messages"][-1]["content"]
+    return {
+        "id": f"chatcmpl-{prompt}", "created": 1, "model": request["model"], "object": "chat.completion",
+        "choices": [{"message": {"role": "assistant", "content": prompt.upper()}, "finish_reason": "stop", "index": 0}],
+    }
+
+
+class StandInInferenceNode:
+    """Minimal stand-in for the node inference routes, with or without the batch endpoint"""
+
+    def __init__(self, batch_endpoint: bool = True):
+        self.batch_endpoint = batch_endpoint
+        self.batches = []
+        self.singles = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path.endswith("/batch"):
+            if not self.batch_endpoint:
+                return httpx.Response(404)
+            self.batches.append([item["model"] for item in body["requests"]])
+            responses = [
+                {"error": "bad prompt"} if item["messages"][-1]["content"] == "fail" else {"response": completion(item)}
+                for item in body["requests"]
+            ]
+            return httpx.Response(200, json={"responses": responses})
+        self.singles += 1
+        return httpx.Response(200, json=completion(body))
+
+
+def make_batcher(node: StandInInferenceNode, **kwargs) -> InferenceBatcher:
+    transport = HTTPTransport(transport=httpx.MockTransport(node.handler))
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=transport)
+    return InferenceBatcher(client, **kwargs)
+
+
+def request(model: str, prompt: str) -> dict:
+    return {"model": model, "messages": [{"role": "user", "content": prompt}]}
+
+
+def test_requests_are_batched_per_model_and_routed_to_callers():
+    node = StandInInferenceNode()
+    batcher = make_batcher(node, max_batch_size=4, max_wait=0.05)
+    prompts = [("a", f"p{i}") for i in range(6)] + [("b", "q0"), ("b", "fail")]
+
+    async def run_all():
+        return await asyncio.gather(
+            *[batcher.run_inference(request(model, prompt)) for model, prompt in prompts],
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run_all())
+
+    assert [result.choices[0].message.content for result in results[:7]] == ["P0", "P1", "P2", "P3", "P4", "P5", "Q0"]
+    assert isinstance(results[7], Exception)
+    assert sorted(node.batches) == sorted([["a"] * 4, ["a"] * 2, ["b"] * 2])
+    assert node.singles == 0
+
+
+def test_batches_are_pipelined_when_node_has_no_batch_endpoint():
+    node = StandInInferenceNode(batch_endpoint=False)
+    batcher = make_batcher(node, max_batch_size=8, max_wait=0.01)
+
+    async def run_all():
+        return await asyncio.gather(*[batcher.run_inference(request("a", f"p{i}")) for i in range(5)])
+
+    results = asyncio.run(run_all())
+
+    assert [result.choices[0].message.content for result in results] == ["P0", "P1", "P2", "P3", "P4"]
+    assert node.singles == 5
+    assert batcher._batch_supported is False
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import httpx
+
+from naptha_sdk.client.inference_cache import InMemoryCache, ResponseCache, SemanticCache, SQLiteCache, request_cache_key
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.schemas import ChatCompletionRequest
+from naptha_sdk.utils import url_to_node
+
+
+def completion(request: dict) -> dict:
+    return {
+        "id": "chatcmpl-1", "created": 1, "model": request["model"], "object": "chat.completion",
+        "choices": [{"message": {"role": "assistant", "content": request["messages"][-1]["content"]}, "finish_reason": "stop", "index": 0}],
+    }
+
+
+def make_client(cache: ResponseCache):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=completion(json.loads(request.content)))
+
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    return InferenceClient(url_to_node("http://localhost:7001"), transport=transport, cache=cache), calls
+
+
+def request(prompt: str, **kwargs) -> dict:
+    return {"model": "test-model", "messages": [{"role": "user", "content": prompt}], **kwargs}
+
+
+def test_request_cache_key_ignores_unset_fields_and_streaming():
+    a = ChatCompletionRequest(**request("hi", temperature=0))
+    b = ChatCompletionRequest(**request("hi", temperature=0, stream=False, stream_options={"include_usage": True}))
+
+    assert request_cache_key(a) == request_cache_key(b)
+    assert request_cache_key(a) != request_cache_key(ChatCompletionRequest(**request("hi", temperature=0, seed=1)))
+
+
+def test_only_deterministic_requests_are_cached():
+    client, calls = make_client(ResponseCache())
+
+    async def run():
+        for _ in range(3):
+            await client.run_inference(request("hi", temperature=0))
+        for _ in range(2):
+            await client.run_inference(request("hi", temperature=0.7))
+
+    asyncio.run(run())
+
+    assert len(calls) == 3
+    assert client.cache.hits == 2
+
+
+def test_sqlite_cache_persists_and_expires(tmp_path):
+    path = str(tmp_path / "responses.db")
+    client, calls = make_client(ResponseCache(SQLiteCache(path)))
+    asyncio.run(client.run_inference(request("hi", seed=7)))
+
+    reopened, reopened_calls = make_client(ResponseCache(SQLiteCache(path)))
+    response = asyncio.run(reopened.run_inference(request("hi", seed=7)))
+    expired, expired_calls = make_client(ResponseCache(SQLiteCache(path, ttl=-1)))
+    asyncio.run(expired.run_inference(request("hi", seed=7)))
+
+    assert response.choices[0].message.content == "hi"
+    assert (len(calls), len(reopened_calls), len(expired_calls)) == (1, 0, 1)
+
+
+def test_semantic_tier_serves_near_duplicate_prompts():
+    def embed(text):
+        return [text.count("capital"), text.count("France"), text.count("Germany")]
+
+    cache = ResponseCache(InMemoryCache(ttl=60), semantic=SemanticCache(embed, threshold=0.99))
+    client, calls = make_client(cache)
+
+    async def run():
+        await client.run_inference(request("What is the capital of France?", temperature=0))
+        await client.run_inference(request("Capital of France? The capital.", temperature=0))
+        await client.run_inference(request("What is the capital of Germany?", temperature=0))
+
+    asyncio.run(run())
+
+    assert len(calls) == 2
+    assert cache.semantic_hits == 1
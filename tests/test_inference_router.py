@@ -0,0 +1,170 @@
+import asyncio
+import json
+
+import httpx
+
+from naptha_sdk.client.inference_cache import ResponseCache
+from naptha_sdk.client.inference_router import InferenceRouter
+from naptha_sdk.client.model_catalogue import ModelCatalogue
+from naptha_sdk.client.prefix_affinity import prefix_depths, prefix_hashes
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.schemas import ChatMessage
+from naptha_sdk.utils import url_to_node
+
+
+class StandInFleet:
+    """Stand-in for several nodes serving the same model with different latencies and failures"""
+
+    def __init__(self, delays, failing=()):
+        self.delays = delays
+        self.failing = set(failing)
+        self.calls = []
+        self.cancelled = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if request.url.path == "/inference/models":
+            return httpx.Response(200, json={"data": [{"id": "test-model"}]})
+        self.calls.append(host)
+        if host in self.failing:
+            return httpx.Response(503, json={"detail": "overloaded"})
+        try:
+            await asyncio.sleep(self.delays[host])
+        except asyncio.CancelledError:
+            self.cancelled.append(host)
+            raise
+        model = json.loads(request.content)["model"]
+        return httpx.Response(200, json={
+            "id": host, "created": 1, "model": model, "object": "chat.completion",
+            "choices": [{"message": {"role": "assistant", "content": host}, "finish_reason": "stop", "index": 0}],
+        })
+
+
+def make_router(fleet: StandInFleet, **kwargs) -> InferenceRouter:
+    catalogue = ModelCatalogue(transport=HTTPTransport(transport=httpx.MockTransport(fleet.handler)))
+    for host in fleet.delays:
+        catalogue.add_node(url_to_node(f"http://{host}:7001"))
+    return InferenceRouter(catalogue, **kwargs)
+
+
+def request(prompt: str) -> dict:
+    return {"model": "test-model", "messages": [{"role": "user", "content": prompt}], "temperature": 0.5}
+
+
+def test_requests_prefer_the_fastest_node():
+    fleet = StandInFleet({"fast": 0.001, "slow": 0.03})
+    router = make_router(fleet)
+
+    async def run():
+        for i in range(20):
+            await router.run_inference(request(str(i)))
+
+    asyncio.run(run())
+
+    assert fleet.calls.count("fast") > fleet.calls.count("slow")
+    assert router.stats()["http://fast:7001"]["p50"] < router.stats()["http://slow:7001"]["p50"]
+
+
+def test_hedged_request_wins_and_cancels_the_slow_node():
+    fleet = StandInFleet({"slow": 1.0, "fast": 0.001})
+    router = make_router(fleet, hedge_after=0.02)
+    router._node("http://fast:7001").outstanding = 100
+
+    response = asyncio.run(router.run_inference(request("hi")))
+
+    assert response.id == "fast"
+    assert fleet.calls == ["slow", "fast"]
+    assert fleet.cancelled == ["slow"]
+    assert (router.hedges, router.hedge_wins) == (1, 1)
+
+
+def test_hedged_coalesced_request_cancels_the_slow_node():
+    fleet = StandInFleet({"slow": 1.0, "fast": 0.001})
+    router = make_router(fleet, hedge_after=0.02)
+    router._node("http://fast:7001").outstanding = 100
+
+    response = asyncio.run(router.run_inference({**request("hi"), "temperature": 0}))
+
+    assert response.id == "fast"
+    assert fleet.cancelled == ["slow"]
+
+
+def test_cache_hits_are_not_latency_samples():
+    fleet = StandInFleet({"node": 0.01})
+    router = make_router(fleet)
+    router.catalogue.clients["http://node:7001"].cache = ResponseCache()
+
+    async def run():
+        for _ in range(5):
+            await router.run_inference({**request("hi"), "temperature": 0})
+
+    asyncio.run(run())
+
+    assert fleet.calls == ["node"]
+    assert router.stats()["http://node:7001"]["samples"] == 1
+    assert router.stats()["http://node:7001"]["p50"] >= 0.01
+
+
+def test_errors_fail_over_to_another_node():
+    fleet = StandInFleet({"down": 0.0, "up": 0.001}, failing={"down"})
+    router = make_router(fleet)
+    router._node("http://up:7001").outstanding = 100
+
+    response = asyncio.run(router.run_inference(request("hi")))
+
+    assert response.id == "up"
+    assert router.failovers == 1
+
+
+def test_shared_prefixes_stick_to_the_node_that_served_them():
+    fleet = StandInFleet({"node-a": 0.001, "node-b": 0.001, "node-c": 0.001})
+    router = make_router(fleet)
+    system = {"role": "system", "content": "You are a long-lived agent. " * 100}
+
+    async def run():
+        conversation = [system, {"role": "user", "content": "first"}]
+        first = await router.run_inference({"model": "test-model", "messages": conversation})
+        follow_ups = []
+        for i in range(5):
+            messages = conversation + [{"role": "assistant", "content": "ok"}, {"role": "user", "content": str(i)}]
+            follow_ups.append(await router.run_inference({"model": "test-model", "messages": messages}))
+        return first, follow_ups
+
+    first, follow_ups = asyncio.run(run())
+
+    assert {response.id for response in follow_ups} == {first.id}
+    assert router.affinity.hits == 5
+
+
+def test_prefix_hashes_are_sent_as_hints():
+    headers = []
+
+    def handler(request):
+        headers.append(request.headers.get("X-Prefix-Hash"))
+        return httpx.Response(200, json={
+            "id": "1", "created": 1, "model": "test-model", "object": "chat.completion",
+            "choices": [{"message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop", "index": 0}],
+        })
+
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=HTTPTransport(transport=httpx.MockTransport(handler)))
+    messages = [{"role": "system", "content": "shared"}, {"role": "user", "content": "a"}]
+    asyncio.run(client.run_inference({"model": "test-model", "messages": messages}))
+    asyncio.run(client.run_inference({"model": "test-model", "messages": messages[:1] + [{"role": "user", "content": "b"}]}))
+
+    first, second = [header.split(",") for header in headers]
+    assert len(first) == 2
+    assert first[0] == second[0]
+    assert first[1] != second[1]
+
+
+def test_prefix_hashes_are_capped_for_long_conversations():
+    messages = [ChatMessage(role="user", content=str(i)) for i in range(1000)]
+
+    hashes = prefix_hashes(messages)
+    follow_up = prefix_hashes(messages + [ChatMessage(role="assistant", content="ok"), ChatMessage(role="user", content="more")])
+
+    assert prefix_depths(1000) == [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 993, 994, 995, 996, 997, 998, 999, 1000]
+    assert len(",".join(hashes)) < 400
+    assert hashes[-1] in follow_up
+    assert hashes[0] == follow_up[0]
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import httpx
+
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.utils import url_to_node
+
+CHAT_REQUEST = {"model": "test-model", "messages": [{"role": "user", "content": "Hi"}]}
+
+
+def make_chunk(content=None, role=None, finish_reason=None, usage=None):
+    choices = [] if usage else [{"delta": {"role": role, "content": content}, "finish_reason": finish_reason, "index": 0}]
+    return {"id": "chatcmpl-1", "created": 1, "model": "test-model", "choices": choices, "usage": usage}
+
+
+def make_client(handler) -> InferenceClient:
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    return InferenceClient(url_to_node("http://localhost:7001"), transport=transport)
+
+
+def test_stream_yields_deltas_and_assembles_response():
+    requests = []
+    chunks = [
+        make_chunk(role="assistant", content="Hel"),
+        make_chunk(content="lo"),
+        make_chunk(finish_reason="stop"),
+        make_chunk(usage={"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}),
+    ]
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    client = make_client(handler)
+
+    async def consume():
+        stream = client.stream_inference(CHAT_REQUEST)
+        deltas = [choice.delta.content async for chunk in stream for choice in chunk.choices]
+        return deltas, stream
+
+    deltas, stream = asyncio.run(consume())
+
+    assert deltas == ["Hel", "lo", None]
+    assert requests[0]["stream"] is True
+    assert requests[0]["stream_options"] == {"include_usage": True}
+    assert stream.response.choices[0].message.content == "Hello"
+    assert stream.response.choices[0].finish_reason == "stop"
+    assert stream.response.usage.total_tokens == 5
+    assert stream.time_to_first_token is not None
+
+
+def test_stream_accepts_non_streaming_node_response():
+    response = {
+        "id": "chatcmpl-1", "created": 1, "model": "test-model", "object": "chat.completion",
+        "choices": [{"message": {"role": "assistant", "content": "Hello"}, "finish_reason": "stop", "index": 0}],
+    }
+    client = make_client(lambda request: httpx.Response(200, json=response))
+
+    result = asyncio.run(client.stream_inference(CHAT_REQUEST).collect())
+
+    assert result.choices[0].message.content == "Hello"
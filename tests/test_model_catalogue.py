@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+
+from naptha_sdk.client.model_catalogue import ModelCatalogue
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.utils import url_to_node
+
+
+class StandInModelNodes:
+    """Stand-in for the /inference/models route of several nodes, with ETag support"""
+
+    def __init__(self, models):
+        self.models = models
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.requests.append((host, request.headers.get("If-None-Match")))
+        etag = f'"{host}-{len(self.models[host])}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        data = [{"id": model, "object": "model"} for model in self.models[host]]
+        return httpx.Response(200, json={"data": data, "object": "list"}, headers={"ETag": etag})
+
+
+def make_catalogue(nodes: StandInModelNodes, **kwargs) -> ModelCatalogue:
+    catalogue = ModelCatalogue(transport=HTTPTransport(transport=httpx.MockTransport(nodes.handler)), **kwargs)
+    for host in nodes.models:
+        catalogue.add_node(url_to_node(f"http://{host}:7001"))
+    return catalogue
+
+
+def test_models_are_merged_across_nodes_and_cached():
+    nodes = StandInModelNodes({"node-a": ["llama", "phi3"], "node-b": ["llama"]})
+    catalogue = make_catalogue(nodes)
+
+    async def lookups():
+        return [await catalogue.nodes_for_model(model) for model in ("llama", "phi3", "llama", "gpt")]
+
+    llama, phi3, llama_again, gpt = asyncio.run(lookups())
+
+    assert llama == llama_again == ["http://node-a:7001", "http://node-b:7001"]
+    assert phi3 == ["http://node-a:7001"]
+    assert gpt == []
+    assert len(nodes.requests) == 2
+
+
+def test_stale_lists_are_revalidated_with_etag():
+    nodes = StandInModelNodes({"node-a": ["llama"]})
+    catalogue = make_catalogue(nodes, ttl=0)
+
+    async def run():
+        await catalogue.refresh()
+        await catalogue.refresh()
+        nodes.models["node-a"].append("phi3")
+        await catalogue.refresh()
+        return await catalogue.models()
+
+    models = asyncio.run(run())
+
+    assert nodes.requests[1] == ("node-a", '"node-a-1"')
+    assert models == {"http://node-a:7001": ["llama", "phi3"]}
+
+
+def test_hub_nodes_seed_the_catalogue_without_a_fetch():
+    nodes = StandInModelNodes({"node-a": ["llama"]})
+    catalogue = ModelCatalogue(transport=HTTPTransport(transport=httpx.MockTransport(nodes.handler)))
+    catalogue.add_hub_nodes([{"ip": "node-a", "user_communication_port": 7001, "models": ["llama"]}])
+
+    assert catalogue.cached_nodes_for_model("llama") == ["http://node-a:7001"]
+    assert nodes.requests == []
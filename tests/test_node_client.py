@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+from naptha_sdk.client.grpc_channels import grpc_channels
+from naptha_sdk.client.node import NodeClient
+from naptha_sdk.schemas import AgentDeployment, AgentRunInput, NodeConfig, NodeConfigUser
+
+
+class FakeCall:
+    """Stands in for a server streaming gRPC call, with a delay before each update"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.cancelled = False
+
+    async def __aiter__(self):
+        for i, delay in enumerate(self.delays):
+            await asyncio.sleep(delay)
+            yield SimpleNamespace(
+                status="completed" if i == len(self.delays) - 1 else "running",
+                error=False,
+                id="agent_run:1",
+                results=[f"result {i}"],
+                error_message="",
+                created_time="",
+                start_processing_time="",
+                completed_time="",
+                duration=0.0,
+                signature="signature",
+            )
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+
+class FakeStub:
+    """Stands in for GrpcServerStub, recording the calls it starts"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+
+    def RunModule(self, request, timeout=None):
+        self.calls.append(FakeCall(self.delays))
+        return self.calls[-1]
+
+
+def make_client(port: int) -> NodeClient:
+    node = NodeConfig(
+        id="node:test", owner="test", public_key="key", servers=[], models=[], docker_jobs=False,
+        node_communication_protocol="grpc", ports=[port]
+    )
+    return NodeClient(node)
+
+
+RUN_INPUT = AgentRunInput(
+    consumer_id="user:test",
+    deployment=AgentDeployment(node=NodeConfigUser(ip="localhost"), module={"name": "hello_world_agent"}),
+    signature="signature",
+)
+
+
+def test_stream_module_holds_the_port_for_the_run_and_samples_the_first_update(monkeypatch):
+    monkeypatch.setattr(grpc_channels, "get_stub", lambda address: FakeStub([0.02, 0.2, 0.2]))
+    client = make_client(59001)
+    stats = client.balancer.stats[59001]
+
+    async def consume():
+        outstanding = []
+        async for run in client.stream_module("agent", RUN_INPUT):
+            outstanding.append(stats.outstanding)
+            await asyncio.sleep(0.1)
+        return run, outstanding
+
+    run, outstanding = asyncio.run(consume())
+
+    assert run.status == "completed" and run.results == ["result 2"]
+    assert outstanding == [1, 1, 1]
+    assert stats.outstanding == 0
+    assert stats.latency_ewma < 0.15
+
+
+def test_stream_module_cancels_the_call_when_the_caller_stops_early(monkeypatch):
+    stub = FakeStub([0.0, 0.0, 10.0])
+    monkeypatch.setattr(grpc_channels, "get_stub", lambda address: stub)
+    client = make_client(59002)
+
+    async def consume():
+        stream = client.stream_module("agent", RUN_INPUT)
+        async for run in stream:
+            break
+        await stream.aclose()
+
+    asyncio.run(consume())
+
+    assert stub.calls[0].cancelled
+    assert client.balancer.stats[59002].outstanding == 0
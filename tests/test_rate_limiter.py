@@ -0,0 +1,125 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from naptha_sdk.client.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, InferenceRateLimiter, TokenBucket, parse_retry_after
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.utils import url_to_node
+
+
+def completion(model: str) -> dict:
+    return {
+        "id": "chatcmpl-1", "created": 1, "model": model, "object": "chat.completion",
+        "choices": [{"message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop", "index": 0}],
+    }
+
+
+def request(prompt: str) -> dict:
+    return {"model": "test-model", "messages": [{"role": "user", "content": prompt}]}
+
+
+def test_token_bucket_charges_large_requests_as_debt():
+    bucket = TokenBucket(rate=10, capacity=10)
+    now = time.monotonic()
+
+    assert bucket.wait_time(50, now) == 0
+    bucket.take(50, now)
+    assert bucket.wait_time(1, now) > 4
+
+
+def test_interactive_requests_are_admitted_before_batch_traffic():
+    limiter = InferenceRateLimiter(requests_per_minute=600, burst_seconds=0.1)
+    admitted = []
+
+    async def call(name, priority):
+        await limiter.acquire("test-model", 10, priority)
+        admitted.append(name)
+
+    async def run():
+        await call("warmup", PRIORITY_BATCH)
+        tasks = [asyncio.create_task(call(f"batch{i}", PRIORITY_BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert admitted[1] == "interactive"
+
+
+def test_throttled_requests_back_off_and_retry():
+    statuses = [429, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        if status == 429:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        return httpx.Response(200, json=completion(json.loads(request.content)["model"]))
+
+    limiter = InferenceRateLimiter(requests_per_minute=6000, model_limits={"test-model": (None, 60000)})
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=transport, rate_limiter=limiter)
+
+    start = time.monotonic()
+    response = asyncio.run(client.run_inference(request("hi")))
+
+    assert response.choices[0].message.content == "ok"
+    assert time.monotonic() - start >= 0.05
+    assert limiter.throttled == 1
+    assert limiter.node_buckets["requests"].rate < limiter.node_buckets["requests"].max_rate
+    assert limiter.model_buckets["test-model"]["tokens"].rate < limiter.model_buckets["test-model"]["tokens"].max_rate
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after(None) is None
+
+
+def test_batches_are_admitted_per_request_and_retried_after_429():
+    statuses = [429, 200]
+
+    def handler(request):
+        if statuses.pop(0) == 429:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        requests = json.loads(request.content)["requests"]
+        return httpx.Response(200, json={"responses": [{"response": completion(r["model"])} for r in requests]})
+
+    limiter = InferenceRateLimiter(tokens_per_minute=60000)
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=transport, rate_limiter=limiter)
+    tokens = limiter.node_buckets["tokens"].tokens
+
+    start = time.monotonic()
+    responses = asyncio.run(client.run_inference_batch([request("a"), request("b")]))
+
+    assert [response.choices[0].message.content for response in responses] == ["ok", "ok"]
+    assert time.monotonic() - start >= 0.05
+    assert limiter.throttled == 1
+    assert limiter.node_buckets["tokens"].tokens < tokens
+
+
+def test_streams_report_throttling_and_success_to_the_limiter():
+    statuses = [429, 200]
+
+    def handler(request):
+        if statuses.pop(0) == 429:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        chunk = {"id": "chatcmpl-1", "created": 1, "model": "test-model",
+                 "choices": [{"delta": {"role": "assistant", "content": "ok"}, "finish_reason": "stop", "index": 0}]}
+        body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    limiter = InferenceRateLimiter(requests_per_minute=6000, decrease_factor=0.5, increase_fraction=0.2)
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    client = InferenceClient(url_to_node("http://localhost:7001"), transport=transport, rate_limiter=limiter)
+
+    response = asyncio.run(client.stream_inference(request("hi")).collect())
+
+    bucket = limiter.node_buckets["requests"]
+    assert response.choices[0].message.content == "ok"
+    assert limiter.throttled == 1
+    assert bucket.rate == 0.7 * bucket.max_rate
@@ -0,0 +1,60 @@
+import json
+
+from pydantic import BaseModel
+
+from naptha_sdk.schemas import OrchestratorRunInput, ToolRunInput, serialize_deployment
+
+NODE = {"ip": "localhost", "user_communication_port": 7001, "user_communication_protocol": "http"}
+LLM_CONFIG = {"client": "openai", "model": "gpt-4o-mini", "max_tokens": 1000, "temperature": 0.7}
+STORAGE_CONFIG = {"storage_type": "db", "path": "table", "storage_schema": {"text": {"type": "TEXT"}}}
+
+
+class ToolInputs(BaseModel):
+    question: str
+
+
+def orchestrator_run_input(num_agents: int = 10) -> OrchestratorRunInput:
+    kb_deployment = {"node": NODE, "name": "kb", "config": {"llm_config": LLM_CONFIG, "storage_config": STORAGE_CONFIG}}
+    agent_deployments = [
+        {
+            "node": NODE,
+            "name": f"agent_{i}",
+            "module": {"name": f"agent_{i}"},
+            "config": {"llm_config": LLM_CONFIG, "system_prompt": {"role": "You are a helpful assistant."}},
+            "tool_deployments": [{"node": NODE, "module": {"name": "tool"}, "config": {"llm_config": LLM_CONFIG}}],
+            "kb_deployments": [kb_deployment],
+        }
+        for i in range(num_agents)
+    ]
+    return OrchestratorRunInput(
+        consumer_id="user:test",
+        inputs=ToolInputs(question="What is the capital of France?"),
+        deployment={"node": NODE, "name": "orchestrator", "agent_deployments": agent_deployments, "kb_deployments": [kb_deployment]},
+        signature="signature",
+    )
+
+
+def test_model_json_matches_model_dict():
+    run_input = orchestrator_run_input()
+
+    model_dict = run_input.model_dict()
+
+    assert json.loads(run_input.model_json()) == model_dict
+    assert json.loads(run_input.model_json(cache_deployment=True)) == model_dict
+    assert model_dict["inputs"] == {"question": "What is the capital of France?"}
+    assert model_dict["deployment"]["kb_deployments"][0]["config"]["storage_config"]["storage_type"] == "db"
+
+
+def test_model_dict_does_not_mutate_run_input():
+    run_input = ToolRunInput(consumer_id="user:test", inputs=ToolInputs(question="q"), deployment={"node": NODE}, signature="signature")
+
+    run_input.model_dict()
+
+    assert isinstance(run_input.inputs, ToolInputs)
+
+
+def test_cached_deployment_is_reused_per_object():
+    first, second = orchestrator_run_input(), orchestrator_run_input()
+
+    assert serialize_deployment(first.deployment, cache=True) is serialize_deployment(first.deployment, cache=True)
+    assert serialize_deployment(second.deployment, cache=True) is not serialize_deployment(first.deployment, cache=True)
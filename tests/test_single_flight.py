@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import httpx
+
+from naptha_sdk.client.single_flight import SingleFlight
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.utils import url_to_node
+
+
+def make_client(**kwargs):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        body = json.loads(request.content)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-1", "created": 1, "model": body["model"], "object": "chat.completion",
+            "choices": [{"message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop", "index": 0}],
+        })
+
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    return InferenceClient(url_to_node("http://localhost:7001"), transport=transport, **kwargs), calls
+
+
+def request(prompt: str, **kwargs) -> dict:
+    return {"model": "test-model", "messages": [{"role": "user", "content": prompt}], **kwargs}
+
+
+def test_identical_concurrent_requests_share_one_call():
+    client, calls = make_client()
+
+    async def run():
+        return await asyncio.gather(
+            *[client.run_inference(request("same", temperature=0)) for _ in range(10)],
+            client.run_inference(request("other", temperature=0)),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(results) == 11
+    assert len(calls) == 2
+    assert client.metrics == {"calls": 2, "coalesced": 9, "in_flight": 0}
+
+
+def test_sampled_requests_are_only_coalesced_when_enabled():
+    default_client, default_calls = make_client()
+    all_client, all_calls = make_client(coalesce="all")
+
+    async def run(client):
+        await asyncio.gather(*[client.run_inference(request("same", temperature=0.8)) for _ in range(5)])
+
+    asyncio.run(run(default_client))
+    asyncio.run(run(all_client))
+
+    assert (len(default_calls), len(all_calls)) == (5, 1)
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    single_flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(single_flight.do("key", call))
+        second = asyncio.ensure_future(single_flight.do("key", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    assert single_flight.metrics == {"calls": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_call_is_cancelled_once_every_caller_is():
+    single_flight = SingleFlight()
+    cancelled = []
+
+    async def call():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        callers = [asyncio.ensure_future(single_flight.do("key", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert cancelled == [True]
+    assert single_flight.metrics["in_flight"] == 0
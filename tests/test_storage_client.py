@@ -0,0 +1,431 @@
+import asyncio
+import hashlib
+import io
+import json
+import re
+
+import httpx
+import pytest
+
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.storage.cache import StorageCache
+from naptha_sdk.storage.schemas import CreateStorageRequest, DeleteStorageRequest, ListStorageRequest, ReadStorageRequest, SearchStorageRequest, StorageLocation, StorageType
+from naptha_sdk.storage.storage_client import StorageClient, StorageError, UploadInterrupted
+from naptha_sdk.utils import url_to_node
+
+
+class StandInStorageNode:
+    """Minimal stand-in for the node storage routes used by StorageClient"""
+
+    def __init__(
+        self,
+        chunked_uploads: bool = True,
+        failing_parts=None,
+        ranges: bool = True,
+        bulk: bool = True,
+        paging=None,
+        range_total: str = "known",
+    ):
+        self.chunked_uploads = chunked_uploads
+        self.ranges = ranges
+        # "known", "unknown" to send Content-Range totals as *, or "short" to drop the last byte of each range
+        self.range_total = range_total
+        self.bulk = bulk
+        # How list pages are cut: "cursor", "keyset", "ignore" to always send every row, or None to honour limit/offset only
+        self.paging = paging
+        # Part number to the number of times uploading it fails before it succeeds
+        self.failing_parts = dict(failing_parts or {})
+        self.sessions = {}
+        self.files = {}
+        self.requests = []
+        self.rows = []
+        self.page_requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append((request.method, path))
+        if match := re.fullmatch(r"/storage/(\w+)/upload/(.+)", path):
+            if not self.chunked_uploads:
+                return httpx.Response(404)
+            upload_id = f"upload-{len(self.sessions) + 1}"
+            self.sessions[upload_id] = {"path": match.group(2), "parts": {}, **json.loads(request.content)}
+            return httpx.Response(200, json={"upload_id": upload_id})
+        if match := re.fullmatch(r"/storage/uploads/([\w-]+)/parts/(\d+)", path):
+            part = int(match.group(2))
+            if self.failing_parts.get(part, 0) > 0:
+                self.failing_parts[part] -= 1
+                return httpx.Response(503)
+            if hashlib.sha256(request.content).hexdigest() != request.headers["X-Checksum-SHA256"]:
+                return httpx.Response(422)
+            self.sessions[match.group(1)]["parts"][part] = request.content
+            return httpx.Response(200, json={"part": part})
+        if match := re.fullmatch(r"/storage/uploads/([\w-]+)/complete", path):
+            session = self.sessions[match.group(1)]
+            expected = [item["checksum"] for item in json.loads(request.content)["parts"]]
+            parts = [session["parts"][part] for part in range(len(expected))]
+            assert [hashlib.sha256(part).hexdigest() for part in parts] == expected
+            self.files[session["path"]] = b"".join(parts)
+            return httpx.Response(200, json={"path": session["path"], "size": session["size"]})
+        if match := re.fullmatch(r"/storage/uploads/([\w-]+)", path):
+            parts = self.sessions[match.group(1)]["parts"]
+            return httpx.Response(200, json={"parts": {str(part): hashlib.sha256(chunk).hexdigest() for part, chunk in parts.items()}})
+        if match := re.fullmatch(r"/storage/(\w+)/read/(.+)", path):
+            if match.group(2) not in self.files:
+                return httpx.Response(404, json={"detail": "Not found"})
+            content = self.files[match.group(2)]
+            etag = f'"{hashlib.sha256(content).hexdigest()}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            range_header = request.headers.get("Range")
+            if range_header is None or not self.ranges:
+                return httpx.Response(200, content=content, headers={"content-type": "application/octet-stream", "ETag": etag})
+            start, end = (int(value) for value in range_header.removeprefix("bytes=").split("-"))
+            if start >= len(content):
+                return httpx.Response(416, headers={"content-range": f"bytes */{len(content)}"})
+            end = min(end, len(content) - 1)
+            body = content[start:end + 1] if self.range_total != "short" else content[start:end]
+            return httpx.Response(206, content=body, headers={
+                "content-type": "application/octet-stream",
+                "content-range": f"bytes {start}-{end}/{len(content) if self.range_total != 'unknown' else '*'}",
+            })
+        if match := re.fullmatch(r"/storage/db/bulk_create/(.+)", path):
+            if not self.bulk:
+                return httpx.Response(404)
+            assert request.headers["Content-Type"] == "application/x-ndjson"
+            rows = [json.loads(line) for line in request.content.decode().splitlines()]
+            self.rows.extend(row for row in rows if "id" in row)
+            errors = [{"index": index, "error": "missing id"} for index, row in enumerate(rows) if "id" not in row]
+            return httpx.Response(200, json={"succeeded": len(rows) - len(errors), "errors": errors})
+        if match := re.fullmatch(r"/storage/db/create/(.+)", path):
+            row = json.loads(httpx.QueryParams(request.content.decode())["data"])
+            if "id" not in row:
+                return httpx.Response(400, json={"detail": "missing id"})
+            self.rows.append(row)
+            return httpx.Response(200, json={"path": match.group(1)})
+        if match := re.fullmatch(r"/storage/db/list/(.+)", path):
+            options = json.loads(request.url.params.get("options", "{}"))
+            self.page_requests.append(options)
+            if self.paging == "ignore":
+                return httpx.Response(200, json=self.rows)
+            if self.paging == "cursor" and "cursor" in options:
+                start = int(options["cursor"])
+            elif self.paging == "keyset" and "after" in options:
+                start = next((i for i, row in enumerate(self.rows) if row["id"] > options["after"]), len(self.rows))
+            else:
+                start = options.get("offset", 0)
+            page = self.rows[start:start + options["limit"]]
+            if self.paging == "cursor":
+                next_cursor = str(start + len(page)) if start + len(page) < len(self.rows) else None
+                return httpx.Response(200, json={"items": page, "next_cursor": next_cursor})
+            return httpx.Response(200, json=page)
+        if match := re.fullmatch(r"/storage/db/search/(.+)", path):
+            # Honours only the limit, like nodes that predate paging
+            body = json.loads(request.content)
+            self.page_requests.append(body)
+            return httpx.Response(200, json=[{"path": match.group(1), "data": row} for row in self.rows[:body["limit"]]])
+        if match := re.fullmatch(r"/storage/(\w+)/delete/(.+)", path):
+            self.files.pop(match.group(2), None)
+            return httpx.Response(200, json={"deleted": match.group(2)})
+        if match := re.fullmatch(r"/storage/(\w+)/create/(.+)", path):
+            self.files[match.group(2)] = request.content
+            return httpx.Response(200, json={"path": match.group(2)})
+        return httpx.Response(404)
+
+
+def make_client(node: StandInStorageNode, **kwargs) -> StorageClient:
+    transport = HTTPTransport(transport=httpx.MockTransport(node.handler))
+    return StorageClient(url_to_node("http://localhost:7001"), transport=transport, **kwargs)
+
+
+CONTENT = bytes(range(256)) * 400
+
+
+def test_chunked_upload_sends_parts_and_retries_failures():
+    node = StandInStorageNode(failing_parts={2: 1})
+    client = make_client(node)
+
+    result = asyncio.run(client.upload_file(StorageType.FILESYSTEM, "data/file.bin", io.BytesIO(CONTENT), part_size=10000))
+
+    assert node.files["data/file.bin"] == CONTENT
+    assert result.data["size"] == len(CONTENT)
+    assert node.requests.count(("PUT", "/storage/uploads/upload-1/parts/2")) == 2
+
+
+def test_interrupted_upload_resumes_with_only_missing_parts():
+    node = StandInStorageNode(failing_parts={5: 1})
+    client = make_client(node)
+
+    with pytest.raises(UploadInterrupted) as interrupted:
+        asyncio.run(client.upload_file(
+            StorageType.FILESYSTEM, "data/file.bin", io.BytesIO(CONTENT), part_size=10000, concurrency=1, max_part_retries=1
+        ))
+    node.requests = []
+    asyncio.run(client.upload_file(
+        StorageType.FILESYSTEM, "data/file.bin", io.BytesIO(CONTENT), part_size=10000, upload_id=interrupted.value.upload_id
+    ))
+
+    uploaded = [path for method, path in node.requests if method == "PUT"]
+    assert node.files["data/file.bin"] == CONTENT
+    assert uploaded[0] == "/storage/uploads/upload-1/parts/5"
+    assert "/storage/uploads/upload-1/parts/0" not in uploaded
+
+
+@pytest.mark.parametrize("failing_path", [
+    "/storage/fs/upload/data/file.bin", "/storage/uploads/upload-1", "/storage/uploads/upload-1/complete"
+])
+def test_upload_connection_errors_are_storage_errors(failing_path):
+    node = StandInStorageNode()
+
+    def handler(request):
+        if request.url.path == failing_path:
+            raise httpx.ConnectError("connection refused", request=request)
+        return node.handler(request)
+
+    transport = HTTPTransport(transport=httpx.MockTransport(handler))
+    client = StorageClient(url_to_node("http://localhost:7001"), transport=transport)
+
+    with pytest.raises(StorageError):
+        if failing_path == "/storage/uploads/upload-1":
+            asyncio.run(client.upload_status("upload-1"))
+        else:
+            asyncio.run(client.upload_file(StorageType.FILESYSTEM, "data/file.bin", io.BytesIO(CONTENT), part_size=10000))
+
+
+def test_large_create_falls_back_to_multipart_on_nodes_without_chunked_uploads():
+    node = StandInStorageNode(chunked_uploads=False)
+    client = make_client(node, chunked_upload_threshold=1000)
+    request = CreateStorageRequest(storage_type=StorageType.FILESYSTEM, path="data/file.bin", file=io.BytesIO(CONTENT))
+
+    asyncio.run(client.execute(request))
+
+    assert CONTENT in node.files["data/file.bin"]
+    assert [method for method, _ in node.requests] == ["POST", "POST"]
+
+
+def test_read_stream_yields_chunks_and_ranges():
+    node = StandInStorageNode()
+    node.files["data/file.bin"] = CONTENT
+    client = make_client(node)
+    request = ReadStorageRequest(storage_type=StorageType.FILESYSTEM, path="data/file.bin")
+
+    async def read(**kwargs):
+        return [chunk async for chunk in client.read_stream(request, chunk_size=4096, **kwargs)]
+
+    chunks = asyncio.run(read())
+    ranged = asyncio.run(read(start=100, end=199))
+
+    assert b"".join(chunks) == CONTENT
+    assert max(len(chunk) for chunk in chunks) <= 4096
+    assert b"".join(ranged) == CONTENT[100:200]
+
+
+@pytest.mark.parametrize("ranges", [True, False])
+def test_read_to_file_downloads_segments_in_parallel(tmp_path, ranges):
+    node = StandInStorageNode(ranges=ranges)
+    node.files["data/file.bin"] = CONTENT
+    client = make_client(node)
+    request = ReadStorageRequest(storage_type=StorageType.FILESYSTEM, path="data/file.bin")
+    target = tmp_path / "file.bin"
+
+    size = asyncio.run(client.read_to_file(request, target, segment_size=7000, concurrency=3))
+
+    assert size == len(CONTENT)
+    assert target.read_bytes() == CONTENT
+    assert len(node.requests) == (-(-len(CONTENT) // 7000) if ranges else 1)
+
+
+@pytest.mark.parametrize("size", [len(CONTENT), 7000 * 5])
+def test_read_to_file_reads_ranges_in_order_when_the_size_is_unknown(tmp_path, size):
+    node = StandInStorageNode(range_total="unknown")
+    node.files["data/file.bin"] = CONTENT[:size]
+    client = make_client(node)
+    request = ReadStorageRequest(storage_type=StorageType.FILESYSTEM, path="data/file.bin")
+    target = tmp_path / "file.bin"
+
+    assert asyncio.run(client.read_to_file(request, target, segment_size=7000)) == size
+    assert target.read_bytes() == CONTENT[:size]
+
+
+@pytest.mark.parametrize("range_total", ["known", "unknown"])
+def test_read_to_file_writes_empty_objects(tmp_path, range_total):
+    node = StandInStorageNode(range_total=range_total)
+    node.files["data/empty.bin"] = b""
+    client = make_client(node)
+    request = ReadStorageRequest(storage_type=StorageType.FILESYSTEM, path="data/empty.bin")
+    target = tmp_path / "empty.bin"
+    target.write_bytes(b"stale")
+
+    assert asyncio.run(client.read_to_file(request, target)) == 0
+    assert target.read_bytes() == b""
+
+
+def test_read_to_file_raises_on_short_segments(tmp_path):
+    node = StandInStorageNode(range_total="short")
+    node.files["data/file.bin"] = CONTENT
+    client = make_client(node)
+    request = ReadStorageRequest(storage_type=StorageType.FILESYSTEM, path="data/file.bin")
+
+    with pytest.raises(StorageError):
+        asyncio.run(client.read_to_file(request, tmp_path / "file.bin", segment_size=7000))
+
+
+def test_read_stream_raises_storage_error_for_missing_objects():
+    client = make_client(StandInStorageNode())
+    request = ReadStorageRequest(storage_type=StorageType.IPFS, path="missing")
+
+    async def read():
+        return [chunk async for chunk in client.read_stream(request)]
+
+    with pytest.raises(StorageError) as error:
+        asyncio.run(read())
+    assert error.value.status_code == 404
+
+
+@pytest.mark.parametrize("bulk", [True, False])
+def test_bulk_create_batches_rows_and_reports_failed_rows(bulk):
+    node = StandInStorageNode(bulk=bulk)
+    client = make_client(node)
+    rows = [{"id": i} if i % 4 else {"name": "no id"} for i in range(10)]
+
+    result = asyncio.run(client.bulk_create("users", iter(rows), batch_size=3, concurrency=2))
+
+    assert result.succeeded == 7
+    assert [error.index for error in result.errors] == [0, 4, 8]
+    assert sorted(row["id"] for row in node.rows) == [i for i in range(10) if i % 4]
+    if bulk:
+        assert len(node.requests) == 4
+    else:
+        assert node.requests.count(("POST", "/storage/db/create/users")) == 10
+
+
+@pytest.mark.parametrize("paging", ["cursor", "keyset", None])
+def test_paginate_lists_every_row_once_in_pages(paging):
+    node = StandInStorageNode(paging=paging)
+    node.rows = [{"id": i} for i in range(25)]
+    client = make_client(node)
+    request = ListStorageRequest(storage_type=StorageType.DATABASE, path="users", options={"order_by": "id", "offset": 2, "limit": 20})
+
+    async def scan():
+        return [storage_object.data["id"] async for storage_object in client.paginate(request, page_size=7)]
+
+    assert asyncio.run(scan()) == list(range(2, 22))
+    assert all(page["limit"] <= 7 for page in node.page_requests)
+    if paging == "keyset":
+        assert node.page_requests[-1]["after"] == 15
+
+
+def test_cached_reads_revalidate_fs_skip_ipfs_and_are_invalidated_by_writes():
+    node = StandInStorageNode()
+    node.files["config.json"] = b"{}"
+    node.files["QmObject"] = CONTENT
+    cache = StorageCache(ttl=0)
+    client = make_client(node, cache=cache)
+    fs_read = ReadStorageRequest(storage_type=StorageType.FILESYSTEM, path="config.json")
+    ipfs_read = ReadStorageRequest(storage_type=StorageType.IPFS, path="QmObject")
+
+    async def run():
+        results = [await client.execute(request) for request in (fs_read, fs_read, ipfs_read, ipfs_read)]
+        await client.execute(DeleteStorageRequest(storage_type=StorageType.FILESYSTEM, path="config.json"))
+        with pytest.raises(StorageError):
+            await client.execute(fs_read)
+        return results
+
+    results = asyncio.run(run())
+
+    assert [result.data for result in results] == [b"{}", b"{}", CONTENT, CONTENT]
+    assert node.requests.count(("GET", "/storage/ipfs/read/QmObject")) == 1
+    assert node.requests.count(("GET", "/storage/fs/read/config.json")) == 3
+    assert (cache.hits, cache.revalidations, cache.misses) == (2, 1, 2)
+
+
+def test_storage_cache_evicts_least_recently_used_by_bytes():
+    cache = StorageCache(max_bytes=100)
+    locations = [StorageLocation(storage_type=StorageType.IPFS, path=f"Qm{i}") for i in range(3)]
+    keys = [cache.key(location, {}) for location in locations]
+
+    cache.set(keys[0], locations[0], b"a" * 40)
+    cache.set(keys[1], locations[1], b"b" * 40)
+    cache.get(keys[0])
+    cache.set(keys[2], locations[2], b"c" * 40)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert (cache.size, cache.evictions) == (80, 1)
+
+
+@pytest.mark.parametrize("page_size", [7, 10])
+def test_paginate_reads_once_from_nodes_that_ignore_paging(page_size):
+    node = StandInStorageNode(paging="ignore")
+    node.rows = [{"id": i} for i in range(10)]
+    client = make_client(node)
+    request = ListStorageRequest(storage_type=StorageType.DATABASE, path="users")
+
+    async def scan():
+        return [storage_object.data["id"] async for storage_object in client.paginate(request, page_size=page_size)]
+
+    assert asyncio.run(scan()) == list(range(10))
+    assert len(node.page_requests) <= 3
+
+
+def test_paginate_does_not_page_searches_without_a_cursor():
+    node = StandInStorageNode()
+    node.rows = [{"id": i} for i in range(50)]
+    client = make_client(node)
+    request = SearchStorageRequest(storage_type=StorageType.DATABASE, path="users", query="all", limit=30)
+
+    async def scan():
+        return [storage_object.data["id"] async for storage_object in client.paginate(request, page_size=10)]
+
+    assert asyncio.run(scan()) == list(range(30))
+    assert node.page_requests[-1]["limit"] == 30
+
+
+def test_bulk_fallback_bounds_row_requests_and_reports_malformed_rows():
+    client = make_client(StandInStorageNode(bulk=False))
+    active = peak = 0
+
+    async def execute(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001)
+        active -= 1
+        return True
+
+    client.execute = execute
+    updates = [{"condition": {"id": i}, "data": {"n": i}} for i in range(50)] + [{"condition": {"id": 50}}]
+
+    result = asyncio.run(client.bulk_update("users", updates, batch_size=10, concurrency=4, row_concurrency=8))
+
+    assert result.succeeded == 50
+    assert [error.index for error in result.errors] == [50]
+    assert peak <= 8
+
+
+def test_bulk_operation_cancels_batches_in_flight_when_rows_fail():
+    client = make_client(StandInStorageNode(bulk=False))
+    cancelled = 0
+
+    async def execute(request):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+
+    async def rows():
+        for i in range(5):
+            yield {"id": i}
+        await asyncio.sleep(0.05)
+        raise RuntimeError("source failed")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await client.bulk_create("users", rows(), batch_size=2)
+        await asyncio.sleep(0.01)
+        return cancelled
+
+    client.execute = execute
+
+    assert asyncio.run(run()) == 4
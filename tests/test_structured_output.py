@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from pydantic import BaseModel, Field
+
+from naptha_sdk.client.structured_output import IncrementalJSONObjectParser, StructuredOutputError, StructuredOutputValidator
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.inference import InferenceClient
+from naptha_sdk.utils import url_to_node
+
+
+class User(BaseModel):
+    id: str
+    name: str
+    age: int
+    tags: list[str] = []
+
+
+def test_parser_returns_members_as_soon_as_they_complete():
+    parser = IncrementalJSONObjectParser()
+    pieces = ['```json\n{"id": "u', '1", "tags": ["a", "b}"]', ', "age": 4', '2 }', "\n```"]
+
+    members = [parser.feed(piece) for piece in pieces]
+
+    assert members == [[], [("id", "u1"), ("tags", ["a", "b}"])], [], [("age", 42)], []]
+    assert parser.done
+
+
+def test_parser_rejects_non_json_immediately():
+    parser = IncrementalJSONObjectParser()
+
+    with pytest.raises(StructuredOutputError):
+        parser.feed("Sure! Here is")
+
+
+def make_client(pieces, sent):
+    chunks = [{"id": "c", "created": 1, "model": "m", "choices": [{"delta": {"content": piece}, "index": 0}]} for piece in pieces]
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+
+    return InferenceClient(url_to_node("http://localhost:7001"), transport=HTTPTransport(transport=httpx.MockTransport(handler)))
+
+
+REQUEST = {"model": "m", "messages": [{"role": "user", "content": "Who is u1?"}]}
+
+
+def test_structured_stream_yields_validated_fields_and_result():
+    sent = []
+    client = make_client(['{"id": "u1", "na', 'me": "Sam", "age": "3', '0"}'], sent)
+
+    async def consume():
+        stream = client.stream_structured(REQUEST, User)
+        fields = [field async for field in stream]
+        return fields, stream.result
+
+    fields, result = asyncio.run(consume())
+
+    assert fields == [("id", "u1"), ("name", "Sam"), ("age", 30)]
+    assert result == User(id="u1", name="Sam", age=30)
+    assert sent[0]["response_format"]["json_schema"]["name"] == "User"
+
+
+def test_structured_stream_aborts_on_schema_violation():
+    client = make_client(['{"id": "u1", "age": "old", ', '"name": "Sam"}'], [])
+
+    async def consume():
+        stream = client.stream_structured(REQUEST, User)
+        fields = []
+        with pytest.raises(StructuredOutputError):
+            async for field in stream:
+                fields.append(field)
+        return fields
+
+    assert asyncio.run(consume()) == [("id", "u1")]
+
+
+class Rating(BaseModel):
+    score: int = Field(ge=1, le=5)
+    summary: str = Field(max_length=10)
+    code: str = Field(pattern=r"^[A-Z]{3}$")
+
+
+@pytest.mark.parametrize("key, value", [("score", 9), ("summary", "far too long a summary"), ("code", "abc")])
+def test_validator_enforces_field_constraints(key, value):
+    validator = StructuredOutputValidator(Rating)
+
+    assert validator.validate_field("score", 4) == ("score", 4)
+    with pytest.raises(StructuredOutputError):
+        validator.validate_field(key, value)
@@ -0,0 +1,300 @@
+import asyncio
+import json
+
+import httpx
+
+from naptha_sdk.client.node import UserClient
+from naptha_sdk.client.transport import HTTPTransport
+from naptha_sdk.utils import url_to_node
+
+TOOL_RUN = {
+    "consumer_id": "user:test",
+    "deployment": {"node": {"ip": "localhost"}, "module": {"name": "test_tool", "module_type": "tool"}},
+    "signature": "signature",
+    "id": "tool_run:1",
+    "status": "pending",
+}
+
+
+class StandInNode:
+    """Minimal stand-in for the node HTTP server routes used by UserClient"""
+
+    def __init__(self, stream_events: bool = True, batch_checks: bool = True, checks_until_complete: int = 3, dedupe: bool = True):
+        self.stream_events = stream_events
+        self.dedupe = dedupe
+        self.batch_checks = batch_checks
+        self.checks_until_complete = checks_until_complete
+        self.requests = []
+        self.checks = {}
+        self.deployments = {}
+        self.run_bodies = []
+        self.run_hashes = []
+        # Run IDs left out of batch check responses, as if the node had dropped them
+        self.forgotten = set()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        module_type, action = request.url.path.strip("/").split("/")[:2]
+        if action == "run" and request.url.path.endswith("/events"):
+            if not self.stream_events:
+                return httpx.Response(404)
+            run_id = request.url.path.split("/")[3]
+            events = [
+                {"id": run_id, "status": "running"},
+                {"id": run_id, "status": "completed", "results": ["streamed"]},
+            ]
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+            return httpx.Response(200, content=body.encode(), headers={"content-type": "text/event-stream"})
+        if action == "run":
+            self.run_bodies.append(request.content)
+            run_input = json.loads(request.content)[f"{module_type}_run_input"]
+            ref = request.headers.get("X-Deployment-Hash")
+            self.run_hashes.append(ref)
+            if not self.dedupe:
+                ref = None
+            if ref is not None and "deployment" in run_input:
+                self.deployments[ref] = run_input["deployment"]
+            elif ref is not None and ref not in self.deployments:
+                return httpx.Response(412, json={"detail": "Unknown deployment"})
+            run_id = f"{module_type}_run:{len(self.checks) + 1}"
+            self.checks[run_id] = 0
+            run = {**TOOL_RUN, "inputs": run_input["inputs"], "id": run_id}
+            headers = {}
+            if ref is not None:
+                run.pop("deployment")
+                headers["X-Deployment-Hash"] = ref
+            return httpx.Response(200, json=run, headers=headers)
+        if action == "check" and request.url.path.endswith("/batch"):
+            if not self.batch_checks:
+                return httpx.Response(404)
+            deltas = []
+            for run in json.loads(request.content)["runs"]:
+                if run["id"] in self.forgotten:
+                    continue
+                self.checks[run["id"]] += 1
+                delta = {"id": run["id"], "status": "running"}
+                if self.checks[run["id"]] >= self.checks_until_complete:
+                    delta.update(status="completed", results=[run["id"]], results_offset=run["results_offset"])
+                deltas.append(delta)
+            return httpx.Response(200, json={"runs": deltas})
+        if action == "check":
+            run = json.loads(request.content)
+            self.checks[run["id"]] += 1
+            if self.checks[run["id"]] >= self.checks_until_complete:
+                run.update(status="completed", results=[json.dumps(run["inputs"])])
+            return httpx.Response(200, json=run)
+        return httpx.Response(404)
+
+
+def make_client(node: StandInNode, **kwargs) -> UserClient:
+    transport = HTTPTransport(transport=httpx.MockTransport(node.handler))
+    return UserClient(url_to_node("http://localhost:7001"), transport=transport, **kwargs)
+
+
+def test_run_completes_from_streamed_events():
+    node = StandInNode(stream_events=True)
+    client = make_client(node)
+
+    run = asyncio.run(client.run_tool_and_poll({**TOOL_RUN, "inputs": {"x": 1}}))
+
+    assert run.status == "completed"
+    assert run.results == ["streamed"]
+    assert not any(path.endswith("/check") for path in node.requests)
+
+
+def test_run_falls_back_to_polling():
+    node = StandInNode(stream_events=False, batch_checks=False)
+    client = make_client(node, poll_interval=0.01)
+
+    run = asyncio.run(client.run_tool_and_poll({**TOOL_RUN, "inputs": {"x": 1}}))
+
+    assert run.status == "completed"
+    assert client._stream_supported is False
+    assert node.requests.count("/tool/check") == node.checks_until_complete
+
+
+def test_run_many_yields_every_result_with_per_item_errors():
+    class FailingNode(StandInNode):
+        def handler(self, request):
+            if request.url.path == "/tool/run" and json.loads(request.content)["tool_run_input"]["inputs"]["x"] == 3:
+                return httpx.Response(500, json={"detail": "boom"})
+            return super().handler(request)
+
+    node = FailingNode(stream_events=False, batch_checks=False, checks_until_complete=1)
+    client = make_client(node, poll_interval=0.01)
+    run_inputs = [{**TOOL_RUN, "inputs": {"x": i}} for i in range(10)]
+
+    async def collect():
+        return [result async for result in client.run_many("tool", run_inputs, concurrency=4)]
+
+    results = asyncio.run(collect())
+
+    assert sorted(result.index for result in results) == list(range(10))
+    failed = [result for result in results if result.error is not None]
+    assert [result.index for result in failed] == [3]
+    assert all(result.run.status == "completed" for result in results if result.error is None)
+
+
+def test_run_many_gives_up_on_runs_the_node_stops_reporting():
+    node = StandInNode(stream_events=False, checks_until_complete=50)
+    node.forgotten.add("tool_run:2")
+    client = make_client(node, completion_mode="poll", poll_interval=0.001, max_poll_interval=0.002)
+    run_inputs = [{**TOOL_RUN, "inputs": {"x": i}} for i in range(3)]
+
+    async def collect():
+        return [result async for result in client.run_many("tool", run_inputs)]
+
+    results = asyncio.run(asyncio.wait_for(collect(), 5))
+
+    failed = [result for result in results if result.error is not None]
+    assert [type(result.error) for result in failed] == [LookupError]
+    assert sum(result.run is not None and result.run.status == "completed" for result in results) == 2
+
+
+def test_failed_individual_checks_fail_only_their_run():
+    class FailingCheckNode(StandInNode):
+        def handler(self, request):
+            if request.url.path == "/tool/check" and json.loads(request.content)["inputs"]["x"] == 1:
+                return httpx.Response(500, json={"detail": "boom"})
+            return super().handler(request)
+
+    node = FailingCheckNode(stream_events=False, batch_checks=False, checks_until_complete=2)
+    client = make_client(node, completion_mode="poll", poll_interval=0.01)
+    run_inputs = [{**TOOL_RUN, "inputs": {"x": i}} for i in range(3)]
+
+    async def collect():
+        return [result async for result in client.run_many("tool", run_inputs)]
+
+    results = sorted(asyncio.run(collect()), key=lambda result: result.index)
+
+    assert [result.error is not None for result in results] == [False, True, False]
+
+
+def test_run_many_retries_a_poll_tick_that_fails_transiently():
+    class FlakyBatchNode(StandInNode):
+        failures = 1
+
+        def handler(self, request):
+            if request.url.path == "/tool/check/batch" and self.failures:
+                self.failures -= 1
+                self.requests.append(request.url.path)
+                return httpx.Response(503, json={"detail": "unavailable"})
+            return super().handler(request)
+
+    node = FlakyBatchNode(stream_events=False, checks_until_complete=3)
+    client = make_client(node, completion_mode="poll", poll_interval=0.01)
+    run_inputs = [{**TOOL_RUN, "inputs": {"x": i}} for i in range(20)]
+
+    async def collect():
+        return [result async for result in client.run_many("tool", run_inputs, concurrency=20)]
+
+    results = asyncio.run(collect())
+
+    assert node.failures == 0
+    assert all(result.error is None and result.run.status == "completed" for result in results)
+
+
+def test_run_many_fails_runs_after_repeated_failed_poll_ticks():
+    class DownBatchNode(StandInNode):
+        def handler(self, request):
+            if request.url.path == "/tool/check/batch":
+                return httpx.Response(503, json={"detail": "unavailable"})
+            return super().handler(request)
+
+    node = DownBatchNode(stream_events=False)
+    client = make_client(node, completion_mode="poll", poll_interval=0.001, max_poll_interval=0.002)
+    run_inputs = [{**TOOL_RUN, "inputs": {"x": i}} for i in range(3)]
+
+    async def collect():
+        return [result async for result in client.run_many("tool", run_inputs)]
+
+    results = asyncio.run(asyncio.wait_for(collect(), 5))
+
+    assert all(isinstance(result.error, httpx.HTTPStatusError) for result in results)
+
+
+def test_check_runs_returns_deltas_by_id():
+    node = StandInNode(checks_until_complete=1)
+    node.checks = {"tool_run:1": 0, "tool_run:2": 0}
+    client = make_client(node)
+
+    deltas = asyncio.run(client.check_runs(["tool_run:1", "tool_run:2"], "tool", results_offsets={"tool_run:2": 0}))
+
+    assert set(deltas) == {"tool_run:1", "tool_run:2"}
+    assert deltas["tool_run:1"].status == "completed"
+    assert node.requests == ["/tool/check/batch"]
+
+
+def test_run_many_polls_all_runs_in_one_request_per_tick():
+    node = StandInNode(stream_events=False, checks_until_complete=3)
+    client = make_client(node, completion_mode="poll", poll_interval=0.01)
+    run_inputs = [{**TOOL_RUN, "inputs": {"x": i}} for i in range(20)]
+
+    async def collect():
+        return [result async for result in client.run_many("tool", run_inputs, concurrency=20)]
+
+    results = asyncio.run(collect())
+
+    assert all(result.run.status == "completed" for result in results)
+    assert all(result.run.results == [result.run.id] for result in results)
+    assert "/tool/check" not in node.requests
+    assert node.requests.count("/tool/check/batch") < len(run_inputs)
+
+
+def test_deployment_sent_by_reference_after_acknowledgement():
+    node = StandInNode(checks_until_complete=1)
+    client = make_client(node)
+
+    async def run_three_times():
+        return [await client.run_tool({**TOOL_RUN, "inputs": {"x": i}}) for i in range(3)]
+
+    runs = asyncio.run(run_three_times())
+
+    assert all(run.deployment.module["name"] == "test_tool" for run in runs)
+    assert [b'"deployment"' in body for body in node.run_bodies] == [True, False, False]
+    assert len(node.run_bodies[1]) < len(node.run_bodies[0])
+
+
+def test_deployment_resent_in_full_when_node_does_not_hold_it():
+    node = StandInNode(checks_until_complete=1)
+    client = make_client(node)
+    asyncio.run(client.run_tool({**TOOL_RUN, "inputs": {"x": 1}}))
+    node.deployments.clear()
+
+    run = asyncio.run(client.run_tool({**TOOL_RUN, "inputs": {"x": 2}}))
+
+    assert run.inputs == {"x": 2}
+    assert [b'"deployment"' in body for body in node.run_bodies] == [True, False, True]
+
+
+def test_deployments_are_not_hashed_for_nodes_that_ignore_hashes():
+    node = StandInNode(checks_until_complete=1, dedupe=False)
+    client = make_client(node)
+
+    async def run_three_times():
+        return [await client.run_tool({**TOOL_RUN, "inputs": {"x": i}}) for i in range(3)]
+
+    asyncio.run(run_three_times())
+
+    assert [ref is not None for ref in node.run_hashes] == [True, False, False]
+    assert all(b'"deployment"' in body for body in node.run_bodies)
+
+
+def test_owned_transport_is_closed_on_exit():
+    async def use(client: UserClient):
+        async with client:
+            http_client = client.transport.client
+        return http_client
+
+    owned = UserClient(url_to_node("http://localhost:7001"))
+    shared = HTTPTransport()
+    borrowed = UserClient(url_to_node("http://localhost:7001"), transport=shared)
+
+    async def run():
+        owned_client = await use(owned)
+        borrowed_client = await use(borrowed)
+        still_open = not borrowed_client.is_closed
+        await shared.aclose()
+        return owned_client.is_closed, still_open
+
+    assert asyncio.run(run()) == (True, True)
@@ -0,0 +1,132 @@
+import asyncio
+from http import HTTPStatus
+import json
+
+import pytest
+import websockets
+
+from naptha_sdk.client import ws_session
+from naptha_sdk.client.node import NodeClient
+from naptha_sdk.client.ws_session import WebSocketSession, WebSocketSessionUnsupported
+from naptha_sdk.schemas import NodeConfig
+
+
+class StandInWebSocketNode:
+    """Local WebSocket server standing in for a node's session and per-message endpoints"""
+
+    def __init__(self, reply_in_reverse: int = 0, close_after_reply: bool = False, session_statuses=(), reply: bool = True):
+        self.reply_in_reverse = reply_in_reverse
+        self.close_after_reply = close_after_reply
+        # Statuses returned to session handshakes, one per attempt, before accepting them
+        self.session_statuses = list(session_statuses)
+        self.reply = reply
+        self.connections = []
+
+    async def process_request(self, path, request_headers):
+        if path.startswith("/ws/session/") and self.session_statuses:
+            return HTTPStatus(self.session_statuses.pop(0)), [], b""
+        return None
+
+    async def handler(self, ws, path=None):
+        self.connections.append(ws.path)
+        if not ws.path.startswith("/ws/session/"):
+            message = json.loads(await ws.recv())
+            await ws.send(json.dumps({"echo": message}))
+            return
+        held = []
+        async for message in ws:
+            envelope = json.loads(message)
+            if not self.reply:
+                continue
+            held.append(envelope)
+            if len(held) < self.reply_in_reverse:
+                continue
+            for request in reversed(held):
+                await ws.send(json.dumps({"id": request["id"], "data": request["data"]}))
+            held = []
+            if self.close_after_reply:
+                await ws.close()
+                return
+
+    async def __aenter__(self):
+        self.server = await websockets.serve(self.handler, "localhost", 0, process_request=self.process_request)
+        self.url = f"ws://localhost:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def test_replies_are_matched_to_requests_by_id():
+    async def run():
+        async with StandInWebSocketNode(reply_in_reverse=2) as node:
+            session = WebSocketSession(node.url)
+            replies = await asyncio.gather(session.request("echo", "first"), session.request("echo", "second"))
+            await session.close()
+            return replies, node.connections
+
+    replies, connections = asyncio.run(run())
+    assert replies == ["first", "second"]
+    assert len(connections) == 1
+
+
+def test_session_reconnects_after_the_connection_drops():
+    async def run():
+        async with StandInWebSocketNode(close_after_reply=True) as node:
+            session = WebSocketSession(node.url)
+            replies = [await session.request("echo", i) for i in range(2)]
+            await session.close()
+            return replies, node.connections
+
+    replies, connections = asyncio.run(run())
+    assert replies == [0, 1]
+    assert len(connections) == 2
+
+
+@pytest.mark.parametrize("status, supported", [(503, True), (404, False)])
+def test_only_404_or_403_handshakes_mark_sessions_unsupported(status, supported):
+    async def run():
+        async with StandInWebSocketNode(session_statuses=[status]) as node:
+            session = WebSocketSession(node.url)
+            try:
+                return await session.request("echo", "hello")
+            finally:
+                await session.close()
+
+    if supported:
+        assert asyncio.run(run()) == "hello"
+    else:
+        with pytest.raises(WebSocketSessionUnsupported):
+            asyncio.run(run())
+
+
+def test_request_times_out_and_forgets_the_reply():
+    async def run():
+        async with StandInWebSocketNode(reply=False) as node:
+            session = WebSocketSession(node.url, request_timeout=0.1)
+            with pytest.raises(asyncio.TimeoutError):
+                await session.request("echo", "hello")
+            pending = dict(session._pending)
+            await session.close()
+            return pending
+
+    assert asyncio.run(run()) == {}
+
+
+def test_node_client_falls_back_to_one_connection_per_message():
+    async def run():
+        async with StandInWebSocketNode(session_statuses=[404]) as node:
+            port = int(node.url.rsplit(":", 1)[1])
+            config = NodeConfig(id="node:test", owner="test", public_key="key", servers=[], models=[], docker_jobs=False, ports=[port])
+            client = NodeClient(config)
+            replies = [await client.send_receive_ws({"n": i}, "user/check") for i in range(2)]
+            await ws_session.close_ws_sessions()
+            return replies, node.connections
+
+    try:
+        replies, connections = asyncio.run(run())
+    finally:
+        ws_session._unsupported_urls.clear()
+    assert replies == [{"echo": {"n": 0}}, {"echo": {"n": 1}}]
+    assert [path.split("/")[2] for path in connections] == ["user", "user"]